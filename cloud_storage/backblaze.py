@@ -1,13 +1,7 @@
-import boto3
-from django.conf import settings
+from storage_app.b2_client import get_s3_client
 
 def get_b2_client():
-    return boto3.client(
-        's3',
-        endpoint_url=settings.AWS_S3_ENDPOINT_URL,
-        aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
-        aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY
-    )
+    return get_s3_client()
 
 def test_connection():
     """Test if Backblaze B2 connection works"""
@@ -53,6 +53,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'storage_app.middleware.StorageUnavailableMiddleware',
 ]
 
 ROOT_URLCONF = 'cloud_storage.urls'
@@ -84,8 +85,16 @@ from pathlib import Path
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 
+# A shared database (render.yaml), so the web and scheduler services see the same rows
+if os.environ.get("DATABASE_URL"):
+    import dj_database_url
+
+    DATABASES = {
+        "default": dj_database_url.config(conn_max_age=600),
+    }
+
 # Detect Render or PythonAnywhere Deploy Environment
-if os.environ.get("RENDER") or os.environ.get("PYTHONANYWHERE_DOMAIN"):
+elif os.environ.get("RENDER") or os.environ.get("PYTHONANYWHERE_DOMAIN"):
     DATABASES = {
         "default": {
             "ENGINE": "django.db.backends.sqlite3",
@@ -174,6 +183,22 @@ AWS_SECRET_ACCESS_KEY = os.getenv("AWS_SECRET_ACCESS_KEY")  # From B2 dashboard
 AWS_STORAGE_BUCKET_NAME = os.getenv("AWS_STORAGE_BUCKET_NAME")  #your-bucket-name
 AWS_S3_ENDPOINT_URL = os.getenv("AWS_S3_ENDPOINT_URL")  # Your region endpoint
 
+# Local B2 stand-in (storage_app/local_b2.py): objects are kept on disk and
+# presigned URLs are served by this app, so uploads, downloads and shares can
+# be load-tested offline. Latency, bandwidth and failures are simulated.
+B2_LOCAL_STANDIN = os.getenv("B2_LOCAL_STANDIN") == "True"
+B2_LOCAL_ROOT = os.getenv("B2_LOCAL_ROOT", str(BASE_DIR / 'local_b2'))
+B2_LOCAL_LATENCY = float(os.getenv("B2_LOCAL_LATENCY", "0"))  # seconds per request
+B2_LOCAL_JITTER = float(os.getenv("B2_LOCAL_JITTER", "0"))  # extra random seconds per request
+B2_LOCAL_BANDWIDTH = int(os.getenv("B2_LOCAL_BANDWIDTH", "0")) or None  # bytes per second
+B2_LOCAL_ERROR_RATE = float(os.getenv("B2_LOCAL_ERROR_RATE", "0"))  # share of requests failing with 503
+B2_LOCAL_SEED = int(os.getenv("B2_LOCAL_SEED")) if os.getenv("B2_LOCAL_SEED") else None
+if B2_LOCAL_STANDIN:
+    AWS_ACCESS_KEY_ID = AWS_ACCESS_KEY_ID or 'local'
+    AWS_SECRET_ACCESS_KEY = AWS_SECRET_ACCESS_KEY or 'local'
+    AWS_STORAGE_BUCKET_NAME = AWS_STORAGE_BUCKET_NAME or 'local'
+    AWS_S3_ENDPOINT_URL = os.getenv("B2_LOCAL_ENDPOINT_URL", "http://127.0.0.1:8000/local-b2")
+
 # Django Storages settings
 DEFAULT_FILE_STORAGE = 'storage_app.storage_backends.BackblazeB2Storage'
 AWS_S3_FILE_OVERWRITE = False
@@ -181,8 +206,53 @@ AWS_DEFAULT_ACL = 'private'
 AWS_QUERYSTRING_AUTH = True
 AWS_LOCATION = 'media'
 
+# Shared B2 client pool (storage_app/b2_client.py)
+B2_MAX_POOL_CONNECTIONS = 50  # keep-alive connections per process
+B2_CONNECT_TIMEOUT = 5  # seconds
+B2_READ_TIMEOUT = 60  # seconds
+B2_MAX_ATTEMPTS = 4  # adaptive retry mode
+
+# Resilience for B2 calls (storage_app/resilience.py)
+B2_BREAKER_FAILURE_THRESHOLD = 5  # failures in a row that open the circuit
+B2_BREAKER_RESET_SECONDS = 30  # fail fast this long before a trial call
+B2_CALL_BUDGET = 20  # seconds per call, retries included
+B2_OPERATION_BUDGETS = {'HeadObject': 5, 'ListParts': 10, 'DeleteObject': 10}
+
+# Presigned URLs (storage_app/presign.py)
+PRESIGN_WINDOW_SECONDS = 3600  # URLs are identical within a window
+PRESIGN_CACHE_SIZE = 10000  # max cached URLs per process
+PUBLIC_PAGE_MAX_AGE = 300  # Cache-Control max-age of public and share pages
+
+# File list filter counts (storage_app/facets.py), cached per user and folder
+FACET_CACHE_SECONDS = 60
+
+# Local-disk read cache for public and share downloads (storage_app/read_cache.py)
+READ_CACHE_DIR = os.getenv("READ_CACHE_DIR")  # unset disables the cache
+READ_CACHE_MAX_BYTES = int(os.getenv("READ_CACHE_MAX_BYTES", str(1024 * 1024 * 1024)))  # 1GB
+READ_CACHE_MAX_OBJECT_SIZE = 100 * 1024 * 1024  # larger files redirect to B2
+READ_CACHE_REVALIDATE_SECONDS = 300  # ETag check interval for cached copies
+
+# Maintenance run by the scheduler worker (python manage.py run_scheduler), a
+# process of its own next to the web service, on the shared database; times are UTC
+SCHEDULED_COMMANDS = [
+    {'command': 'purge_expired_trash', 'args': ['--sleep', '1'], 'at': '03:00'},
+    {'command': 'abort_stale_multipart_uploads', 'args': ['--scan-bucket'], 'at': '03:30'},
+    {'command': 'reconcile_quota', 'at': '04:00'},
+    {'command': 'reconcile_usage', 'at': '04:30', 'weekday': 6},
+]
+
+# Direct browser uploads (the bucket needs a CORS rule allowing PUT from
+# the site origin and exposing the ETag header)
+DIRECT_UPLOAD_EXPIRES = 3600  # seconds
+MULTIPART_PART_SIZE = 16 * 1024 * 1024  # resumable upload part size (min 5MB)
+DEDUP_VERIFY_MAX_SIZE = 256 * 1024 * 1024  # largest direct upload whose browser hash is checked and deduplicated
+
 # Optional: File upload settings
-FILE_UPLOAD_MAX_MEMORY_SIZE = 100 * 1024 * 1024  # 100MB
+# upload_file streams the file field straight to B2 in parts of
+# STREAMING_UPLOAD_PART_SIZE, so no upload is ever held whole in memory;
+# anything else larger than 2.5MB spools to a temporary file.
+FILE_UPLOAD_MAX_MEMORY_SIZE = int(2.5 * 1024 * 1024)  # 2.5MB
+STREAMING_UPLOAD_PART_SIZE = 5 * 1024 * 1024  # B2 minimum part size
 DATA_UPLAOD_MAX_MEMORY_SIZE = 100 * 1024 * 1024  # 100MB
 
 
@@ -100,7 +100,7 @@ class ShareLinkAdmin(admin.ModelAdmin):
     token_short.short_description = 'Token'
 
 class FolderAdmin(admin.ModelAdmin):
-    list_display = ['name', 'owner', 'created_at', 'files_count', 'subfolders_count']
+    list_display = ['name', 'owner', 'created_at', 'files_count', 'subfolders_count', 'total_file_count', 'total_bytes']
     list_filter = ['created_at']
     search_fields = ['name', 'owner__username']
     
@@ -116,11 +116,11 @@ class FolderAdmin(admin.ModelAdmin):
     
     # Custom display methods
     def files_count(self, obj):
-        return obj.files.count()
+        return obj.file_count
     files_count.short_description = 'Files Count'
     
     def subfolders_count(self, obj):
-        return obj.subfolders.count()
+        return obj.subfolder_count
     subfolders_count.short_description = 'Subfolders Count'
 
 class SubscriptionAdmin(admin.ModelAdmin):
@@ -0,0 +1,160 @@
+import io
+import os
+import zipfile
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+
+from .b2_client import get_s3_client
+from .models import File, Folder
+
+# Objects up to this size are downloaded whole, ahead of time, by the
+# prefetch pool; larger ones are streamed in chunks when their turn comes.
+# Peak memory per download is about ZIP_PREFETCH_DEPTH * ZIP_PREFETCH_MAX_SIZE.
+ZIP_PREFETCH_DEPTH = getattr(settings, 'ZIP_PREFETCH_DEPTH', 4)
+ZIP_PREFETCH_MAX_SIZE = getattr(settings, 'ZIP_PREFETCH_MAX_SIZE', 8 * 1024 * 1024)
+ZIP_READ_CHUNK_SIZE = 1024 * 1024
+
+# Already compressed formats are stored as-is; deflating them costs CPU for nothing
+STORED_TYPES = {
+    '.jpg', '.jpeg', '.png', '.gif', '.webp', '.heic',
+    '.mp4', '.avi', '.mov', '.mkv', '.webm',
+    '.mp3', '.aac', '.ogg', '.flac', '.m4a',
+    '.zip', '.rar', '.7z', '.gz', '.bz2', '.xz',
+    '.docx', '.xlsx', '.pptx',
+}
+
+
+class ArchiveAborted(Exception):
+    """A member could not be read in full, so the archive is left unfinished"""
+
+
+class _StreamBuffer(io.RawIOBase):
+    """Write-only, non-seekable sink that hands out what was written so far"""
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def collect_folder_files(folder):
+    """
+    Every non-deleted file under ``folder`` as ``(archive_path, file)``
+    pairs, walking the tree one query per level
+    """
+    entries = []
+    level = {folder.pk: folder.name}
+    while level:
+        files = File.objects.filter(folder_id__in=list(level), is_deleted=False).order_by('name')
+        for file_obj in files:
+            entries.append((f'{level[file_obj.folder_id]}/{file_obj.name}', file_obj))
+        subfolders = Folder.objects.filter(parent_folder_id__in=list(level)).only('pk', 'name', 'parent_folder_id')
+        level = {sub.pk: f'{level[sub.parent_folder_id]}/{sub.name}' for sub in subfolders}
+    return entries
+
+
+def _unique_path(path, used):
+    # Two files may share a name; later ones get " (1)", " (2)", ...
+    if path not in used:
+        used.add(path)
+        return path
+    root, ext = os.path.splitext(path)
+    counter = 1
+    while f'{root} ({counter}){ext}' in used:
+        counter += 1
+    path = f'{root} ({counter}){ext}'
+    used.add(path)
+    return path
+
+
+def _fetch(client, file_obj):
+    # Runs in the prefetch pool; small objects come back fully read
+    body = client.get_object(Bucket=settings.AWS_STORAGE_BUCKET_NAME, Key=file_obj.storage_key)['Body']
+    if file_obj.size <= ZIP_PREFETCH_MAX_SIZE:
+        try:
+            return body.read()
+        finally:
+            body.close()
+    return body
+
+
+def stream_zip(entries):
+    """
+    Yield a ZIP64 archive of ``entries`` (``(archive_path, file)`` pairs)
+    chunk by chunk, without temp files. Objects are fetched from B2 a few
+    entries ahead so the next download overlaps with the current one.
+
+    Raises ArchiveAborted if a member fails or comes back short. The
+    central directory is then never sent, so the server drops the
+    connection mid-download instead of ending a valid but truncated ZIP.
+    """
+    client = get_s3_client()
+    sink = _StreamBuffer()
+    used_paths = set()
+
+    with ThreadPoolExecutor(max_workers=ZIP_PREFETCH_DEPTH) as pool:
+        pending = deque()
+        upcoming = iter(entries)
+
+        def schedule():
+            # Large objects are only opened when reached, so an idle
+            # connection never waits behind a long transfer
+            while len(pending) < ZIP_PREFETCH_DEPTH:
+                entry = next(upcoming, None)
+                if entry is None:
+                    return
+                file_obj = entry[1]
+                future = pool.submit(_fetch, client, file_obj) if file_obj.size <= ZIP_PREFETCH_MAX_SIZE else None
+                pending.append((entry, future))
+
+        with zipfile.ZipFile(sink, mode='w', compression=zipfile.ZIP_DEFLATED, allowZip64=True) as archive:
+            schedule()
+            while pending:
+                (path, file_obj), future = pending.popleft()
+                schedule()
+
+                info = zipfile.ZipInfo(_unique_path(path, used_paths), file_obj.uploaded_at.timetuple()[:6])
+                info.compress_type = (
+                    zipfile.ZIP_STORED if file_obj.file_type.lower() in STORED_TYPES else zipfile.ZIP_DEFLATED
+                )
+                info.file_size = file_obj.size
+
+                try:
+                    content = future.result() if future is not None else _fetch(client, file_obj)
+                    # zipfile switches the entry to ZIP64 itself from file_size
+                    with archive.open(info, mode='w') as dest:
+                        if isinstance(content, bytes):
+                            written = dest.write(content)
+                        else:
+                            written = 0
+                            try:
+                                for chunk in content.iter_chunks(ZIP_READ_CHUNK_SIZE):
+                                    written += dest.write(chunk)
+                                    yield sink.drain()
+                            finally:
+                                content.close()
+                except Exception as exc:
+                    raise ArchiveAborted(f'Could not read {path} from storage') from exc
+                if written != file_obj.size:
+                    raise ArchiveAborted(f'{path} is {written} bytes in storage, expected {file_obj.size}')
+                yield sink.drain()
+
+        # Central directory (and ZIP64 end records when needed)
+        yield sink.drain()
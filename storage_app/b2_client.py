@@ -0,0 +1,98 @@
+import os
+import threading
+
+import boto3
+from botocore.config import Config
+from django.conf import settings
+
+from .resilience import instrument
+
+# Connection tuning for the shared Backblaze B2 clients. Every value can be
+# overridden from settings.py without touching the code.
+B2_MAX_POOL_CONNECTIONS = getattr(settings, 'B2_MAX_POOL_CONNECTIONS', 50)
+B2_CONNECT_TIMEOUT = getattr(settings, 'B2_CONNECT_TIMEOUT', 5)
+B2_READ_TIMEOUT = getattr(settings, 'B2_READ_TIMEOUT', 60)
+B2_MAX_ATTEMPTS = getattr(settings, 'B2_MAX_ATTEMPTS', 4)
+
+_lock = threading.Lock()
+_clients = {}
+_owner_pid = os.getpid()
+
+
+def build_client_config(**overrides):
+    """Botocore config shared by every B2 client and the storage backend"""
+    options = {
+        'signature_version': 's3v4',
+        'max_pool_connections': B2_MAX_POOL_CONNECTIONS,
+        'connect_timeout': B2_CONNECT_TIMEOUT,
+        'read_timeout': B2_READ_TIMEOUT,
+        'tcp_keepalive': True,
+        'retries': {'mode': 'adaptive', 'max_attempts': B2_MAX_ATTEMPTS},
+        # B2 does not accept the flexible (CRC) checksums newer botocore
+        # sends by default; uploads carry Content-MD5 instead
+        'request_checksum_calculation': 'when_required',
+        'response_checksum_validation': 'when_required',
+    }
+    options.update(overrides)
+    return Config(**options)
+
+
+def _create_client(**config_overrides):
+    if getattr(settings, 'B2_LOCAL_STANDIN', False):
+        from .local_b2 import FakeS3Client
+        return FakeS3Client()
+
+    # boto3 sessions are not thread-safe, so every client gets its own
+    session = boto3.session.Session(
+        aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
+        aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
+    )
+    client = session.client(
+        's3',
+        endpoint_url=settings.AWS_S3_ENDPOINT_URL,
+        config=build_client_config(**config_overrides),
+    )
+    return instrument(client)
+
+
+def get_s3_client(name='default', **config_overrides):
+    """
+    Return the process-wide S3 client registered under ``name``.
+
+    Clients are created lazily on first use and then shared by every thread
+    in the process, so requests reuse pooled keep-alive connections instead
+    of paying for endpoint resolution and a TLS handshake each time.
+    ``config_overrides`` only apply when the client is first created.
+    """
+    global _owner_pid
+
+    pid = os.getpid()
+    client = _clients.get(name) if pid == _owner_pid else None
+    if client is not None:
+        return client
+
+    with _lock:
+        if pid != _owner_pid:
+            # Inherited from the parent before a fork; its sockets are shared
+            # with the parent and must not be reused here.
+            _clients.clear()
+            _owner_pid = pid
+        client = _clients.get(name)
+        if client is None:
+            client = _create_client(**config_overrides)
+            _clients[name] = client
+        return client
+
+
+def reset_clients():
+    """Drop every cached client (called automatically after a fork)"""
+    global _owner_pid, _lock
+
+    # The lock may have been held by another thread at fork time
+    _lock = threading.Lock()
+    _clients.clear()
+    _owner_pid = os.getpid()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=reset_clients)
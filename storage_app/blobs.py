@@ -0,0 +1,105 @@
+import hashlib
+
+from django.conf import settings
+from django.db.models import F
+
+from .b2_client import get_s3_client
+from .models import Blob
+
+# Whether a hash claim may reuse content first uploaded by another user.
+# Off by default: knowing a file's hash is not proof of having the file.
+DEDUP_CROSS_USER_CLAIMS = getattr(settings, 'DEDUP_CROSS_USER_CLAIMS', False)
+# Largest object whose client-sent hash is checked by reading it back from
+# B2; the browser does not hash files larger than this either
+DEDUP_VERIFY_MAX_SIZE = getattr(settings, 'DEDUP_VERIFY_MAX_SIZE', 256 * 1024 * 1024)
+
+# Bytes read per chunk when hashing a stored object
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+class ContentMismatch(Exception):
+    """A directly uploaded object does not have the SHA-256 its client sent"""
+
+
+def hash_file(f):
+    """SHA-256 hex digest of an uploaded file, leaving it rewound"""
+    sha256 = hashlib.sha256()
+    for chunk in f.chunks():
+        sha256.update(chunk)
+    f.seek(0)
+    return sha256.hexdigest()
+
+
+def hash_object(object_key):
+    """SHA-256 hex digest of a stored object, streamed from the bucket"""
+    body = get_s3_client().get_object(Bucket=settings.AWS_STORAGE_BUCKET_NAME, Key=object_key)['Body']
+    sha256 = hashlib.sha256()
+    try:
+        for chunk in body.iter_chunks(HASH_CHUNK_SIZE):
+            sha256.update(chunk)
+    finally:
+        body.close()
+    return sha256.hexdigest()
+
+
+def verified_upload_hash(sha256, object_key, size):
+    """
+    The hash a client sent for an object it uploaded straight to B2, once
+    the stored bytes are known to match it, or None when there is nothing
+    usable to check (the file is then simply not deduplicated). Raises
+    ContentMismatch when the object holds different content.
+    """
+    if not isinstance(sha256, str) or len(sha256) != 64 or size > DEDUP_VERIFY_MAX_SIZE:
+        return None
+    sha256 = sha256.lower()
+    try:
+        int(sha256, 16)
+    except ValueError:
+        return None
+    if hash_object(object_key) != sha256:
+        raise ContentMismatch()
+    return sha256
+
+
+def register_blob(sha256, storage_name, object_key, size):
+    """
+    Add a reference to the blob for ``sha256``, creating it from the given
+    object when the content is new. Returns ``(blob, created)``; when
+    ``created`` is false the caller's object is a duplicate and can go.
+    Must run inside a transaction.
+    """
+    blob, created = Blob.objects.select_for_update().get_or_create(
+        sha256=sha256,
+        defaults={'storage_name': storage_name, 'object_key': object_key, 'size': size},
+    )
+    Blob.objects.filter(pk=blob.pk).update(ref_count=F('ref_count') + 1)
+    return blob, created
+
+
+def find_claimable_blob(sha256, size, user):
+    """
+    Locked blob with this content that ``user`` may reference without
+    uploading, or None. Must run inside a transaction.
+    """
+    blobs = Blob.objects.select_for_update().filter(sha256=sha256, size=size)
+    if not DEDUP_CROSS_USER_CLAIMS:
+        blobs = blobs.filter(pk__in=Blob.objects.filter(files__owner=user).values('pk'))
+    return blobs.first()
+
+
+def release_blobs(counts):
+    """
+    Drop ``counts[blob_id]`` references from each blob and delete the blobs
+    nobody references any more. Returns their ``(object_key, size)``, which
+    the caller deletes from the bucket after committing. Must run inside a
+    transaction.
+    """
+    dead = []
+    for blob in Blob.objects.select_for_update().filter(pk__in=list(counts)).order_by('pk'):
+        blob.ref_count = max(blob.ref_count - counts[blob.pk], 0)
+        if blob.ref_count == 0 and not blob.files.exists():
+            dead.append((blob.object_key, blob.size))
+            blob.delete()
+        else:
+            blob.save(update_fields=['ref_count'])
+    return dead
@@ -0,0 +1,76 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from .file_types import CATEGORY_NAMES
+from .models import File
+
+# Filter counts are cached per user and folder for this long; any change to
+# the user's files also drops them straight away (see invalidate_facets)
+FACET_CACHE_SECONDS = getattr(settings, 'FACET_CACHE_SECONDS', 60)
+
+# Any folder, as opposed to folder=None meaning the root
+ALL_FOLDERS = object()
+
+
+def count_facets(files):
+    """Every filter count for ``files`` from a single aggregate query"""
+    now = timezone.now()
+    date_starts = {
+        'today': now.replace(hour=0, minute=0, second=0, microsecond=0),
+        'week': now - timedelta(days=7),
+        'month': now - timedelta(days=30),
+        'year': now - timedelta(days=365),
+    }
+
+    aggregates = {'all': Count('pk'), 'starred': Count('pk', filter=Q(is_starred=True))}
+    for bucket, start in date_starts.items():
+        aggregates[f'date_{bucket}'] = Count('pk', filter=Q(uploaded_at__gte=start))
+    for category in CATEGORY_NAMES:
+        aggregates[f'type_{category}'] = Count('pk', filter=Q(category=category))
+
+    counts = files.order_by().aggregate(**aggregates)
+    return {
+        'date': {**{bucket: counts[f'date_{bucket}'] for bucket in date_starts}, 'all': counts['all']},
+        'file_type': {category: counts[f'type_{category}'] for category in CATEGORY_NAMES},
+        'starred': counts['starred'],
+    }
+
+
+def _version_key(user_id):
+    return f'facets:version:{user_id}'
+
+
+def facet_counts(user, folder=ALL_FOLDERS):
+    """
+    Cached filter counts for ``user``'s files in ``folder`` (None is the
+    root, ALL_FOLDERS every folder). A cache hit costs no query at all.
+    """
+    version = cache.get_or_set(_version_key(user.pk), 1, None)
+    scope = 'all' if folder is ALL_FOLDERS else (folder.pk if folder else 'root')
+    key = f'facets:{user.pk}:{version}:{scope}'
+
+    counts = cache.get(key)
+    if counts is None:
+        files = File.objects.filter(owner=user)
+        if folder is not ALL_FOLDERS:
+            files = files.filter(folder=folder)
+        counts = count_facets(files)
+        cache.set(key, counts, FACET_CACHE_SECONDS)
+    return counts
+
+
+def invalidate_facets(user_id):
+    """Drop every cached count of ``user_id`` once the current transaction commits"""
+    def bump():
+        try:
+            cache.incr(_version_key(user_id))
+        except ValueError:
+            # Never read yet, so nothing cached under it either
+            pass
+
+    transaction.on_commit(bump)
@@ -0,0 +1,72 @@
+import mimetypes
+import os
+
+# The one map from extensions to the categories used by filters, facet counts
+# and File.category. Extensions are lower case with the leading dot.
+CATEGORIES = {
+    'image': ['.jpg', '.jpeg', '.png', '.gif', '.bmp', '.svg', '.webp'],
+    'document': ['.doc', '.docx', '.txt', '.rtf', '.odt'],
+    'pdf': ['.pdf'],
+    'spreadsheet': ['.xls', '.xlsx', '.csv', '.ods'],
+    'presentation': ['.ppt', '.pptx', '.odp'],
+    'video': ['.mp4', '.avi', '.mov', '.wmv', '.flv', '.webm', '.mkv'],
+    'audio': ['.mp3', '.wav', '.ogg', '.m4a', '.flac'],
+    'archive': ['.zip', '.rar', '.7z', '.tar', '.gz'],
+    'code': ['.html', '.css', '.js', '.py', '.java', '.cpp', '.c', '.php', '.xml', '.json'],
+}
+OTHER = 'other'
+CATEGORY_NAMES = [*CATEGORIES, OTHER]
+
+EXTENSION_CATEGORIES = {ext: category for category, extensions in CATEGORIES.items() for ext in extensions}
+
+# For extensions missing above, the MIME type guessed from the name (or sent
+# by the browser) decides; most specific match first
+MIME_CATEGORIES = [
+    ('application/pdf', 'pdf'),
+    ('image/', 'image'),
+    ('video/', 'video'),
+    ('audio/', 'audio'),
+    ('text/x-', 'code'),
+    ('text/', 'document'),
+    ('application/vnd.ms-excel', 'spreadsheet'),
+    ('application/vnd.openxmlformats-officedocument.spreadsheetml', 'spreadsheet'),
+    ('application/vnd.ms-powerpoint', 'presentation'),
+    ('application/vnd.openxmlformats-officedocument.presentationml', 'presentation'),
+    ('application/msword', 'document'),
+    ('application/vnd.openxmlformats-officedocument.wordprocessingml', 'document'),
+    ('application/x-tar', 'archive'),
+    ('application/x-bzip', 'archive'),
+    ('application/x-xz', 'archive'),
+    ('application/zip', 'archive'),
+]
+
+# What preview_file can show inline; anything else is offered as a download
+PREVIEW_TEXT_EXTENSIONS = {'.txt', '.csv', '.log'}
+PREVIEW_CATEGORIES = {'image', 'pdf', 'code'}
+
+
+def extension(name):
+    return os.path.splitext(name)[1].lower()
+
+
+def categorize(name, content_type=None):
+    """Category of a file called ``name``, with ``content_type`` as a hint"""
+    category = EXTENSION_CATEGORIES.get(extension(name))
+    if category:
+        return category
+
+    guessed = content_type if content_type and content_type != 'application/octet-stream' else None
+    guessed = guessed or mimetypes.guess_type(name)[0]
+    if guessed:
+        for prefix, category in MIME_CATEGORIES:
+            if guessed.startswith(prefix):
+                return category
+    return OTHER
+
+
+def preview_category(file_obj):
+    """How preview_file should display ``file_obj``"""
+    if file_obj.file_type.lower() in PREVIEW_TEXT_EXTENSIONS:
+        return 'text'
+    category = file_obj.category or categorize(file_obj.name)
+    return category if category in PREVIEW_CATEGORIES else OTHER
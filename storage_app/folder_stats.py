@@ -0,0 +1,92 @@
+from collections import defaultdict
+
+from django.db.models import Count, F, Sum
+from django.db.models.functions import Greatest
+
+from .models import File, Folder
+
+# Counter fields on Folder; "total_" ones include every descendant folder.
+# Only live files count, trashed ones are left out like in the listings.
+STAT_FIELDS = ['file_count', 'subfolder_count', 'size_bytes', 'total_file_count', 'total_bytes']
+
+
+def ancestor_ids(folder_id):
+    """``folder_id`` followed by the ids of every folder above it"""
+    ids = []
+    while folder_id is not None and folder_id not in ids:
+        ids.append(folder_id)
+        folder_id = Folder.objects.filter(pk=folder_id).values_list('parent_folder_id', flat=True).first()
+    return ids
+
+
+def record_files(folder_id, count, size):
+    """Add ``count`` live files of ``size`` bytes to a folder (negative to remove)"""
+    if folder_id is None or not (count or size):
+        return
+    # Floored at zero so drifted counters never fail the request; the
+    # repair command sets them straight
+    Folder.objects.filter(pk=folder_id).update(
+        file_count=Greatest(F('file_count') + count, 0),
+        size_bytes=Greatest(F('size_bytes') + size, 0),
+    )
+    Folder.objects.filter(pk__in=ancestor_ids(folder_id)).update(
+        total_file_count=Greatest(F('total_file_count') + count, 0),
+        total_bytes=Greatest(F('total_bytes') + size, 0),
+    )
+
+
+def record_move(file_obj, old_folder_id):
+    """Move a live file's counts from ``old_folder_id`` to its current folder"""
+    if file_obj.is_deleted or old_folder_id == file_obj.folder_id:
+        return
+    record_files(old_folder_id, -1, -file_obj.size)
+    record_files(file_obj.folder_id, 1, file_obj.size)
+
+
+def record_subfolder(parent_id, count):
+    """Add (or with a negative ``count``, remove) direct subfolders of ``parent_id``"""
+    if parent_id is None:
+        return
+    Folder.objects.filter(pk=parent_id).update(subfolder_count=Greatest(F('subfolder_count') + count, 0))
+
+
+def repair_folder_stats(dry_run=False):
+    """
+    Recompute every counter from one GROUP BY over files and one read of
+    the folder tree, rolling the totals up in memory. Returns the number
+    of folders whose stored counters were wrong.
+    """
+    direct = {
+        row['folder_id']: (row['count'], row['size'] or 0)
+        for row in File.objects.filter(is_deleted=False, folder__isnull=False)
+        .order_by().values('folder_id').annotate(count=Count('pk'), size=Sum('size'))
+    }
+    folders = {row['pk']: row for row in Folder.objects.values('pk', 'parent_folder_id', *STAT_FIELDS)}
+
+    actual = {pk: dict.fromkeys(STAT_FIELDS, 0) for pk in folders}
+    for pk, row in folders.items():
+        count, size = direct.get(pk, (0, 0))
+        actual[pk]['file_count'] = count
+        actual[pk]['size_bytes'] = size
+        if row['parent_folder_id'] in actual:
+            actual[row['parent_folder_id']]['subfolder_count'] += 1
+
+        # Every file counts towards its folder and all of its ancestors
+        seen = set()
+        ancestor = pk
+        while ancestor in folders and ancestor not in seen:
+            seen.add(ancestor)
+            actual[ancestor]['total_file_count'] += count
+            actual[ancestor]['total_bytes'] += size
+            ancestor = folders[ancestor]['parent_folder_id']
+
+    wrong = defaultdict(dict)
+    for pk, stats in actual.items():
+        for field, value in stats.items():
+            if folders[pk][field] != value:
+                wrong[pk][field] = value
+
+    if not dry_run:
+        for pk, changes in wrong.items():
+            Folder.objects.filter(pk=pk).update(**changes)
+    return len(wrong)
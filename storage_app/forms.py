@@ -16,6 +16,12 @@ class FileUploadForm(forms.ModelForm):
     class Meta:
         model = File
         fields = ['file', 'is_public']
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # File.file's max_length bounds the generated storage name
+        # (new_object_name), not what the uploader called the file
+        self.fields['file'].max_length = None
         
     def clean_file(self):
         file = self.cleaned_data.get('file')
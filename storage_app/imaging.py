@@ -0,0 +1,89 @@
+# Image derivatives built with Pillow alone. Nothing here imports Django, so
+# these functions are cheap to run in spawned worker processes.
+import base64
+from io import BytesIO
+
+from PIL import Image, ImageOps
+
+WEBP_QUALITY = 80
+
+# Longest edge of the inline placeholder; a few hundred bytes as base64
+PLACEHOLDER_SIZE = 16
+PLACEHOLDER_QUALITY = 40
+
+# EXIF orientations that rotate the image by 90 degrees
+_TRANSPOSED_ORIENTATIONS = {5, 6, 7, 8}
+
+
+def _normalize_mode(image):
+    # WebP stores RGB or RGBA; palette and greyscale images keep any transparency
+    if image.mode in ('RGB', 'RGBA'):
+        return image
+    if image.mode in ('P', 'LA', 'PA') or 'transparency' in image.info:
+        return image.convert('RGBA')
+    return image.convert('RGB')
+
+
+def _display_size(image):
+    # Dimensions as shown, i.e. after applying the EXIF orientation
+    width, height = image.size
+    if image.getexif().get(0x0112) in _TRANSPOSED_ORIENTATIONS:
+        return height, width
+    return width, height
+
+
+def _placeholder(image):
+    tiny = image.copy()
+    tiny.thumbnail((PLACEHOLDER_SIZE, PLACEHOLDER_SIZE), Image.BILINEAR)
+    buffer = BytesIO()
+    tiny.save(buffer, 'WEBP', quality=PLACEHOLDER_QUALITY)
+    return 'data:image/webp;base64,' + base64.b64encode(buffer.getvalue()).decode('ascii')
+
+
+def image_dimensions(data):
+    """Displayed (width, height) read from the image header, or None if ``data`` is too short"""
+    try:
+        with Image.open(BytesIO(data)) as image:
+            return _display_size(image)
+    except Exception:
+        return None
+
+
+def make_placeholder(data):
+    """Inline data URI of a tiny preview of the image in ``data``"""
+    with Image.open(BytesIO(data)) as image:
+        image.draft('RGB', (PLACEHOLDER_SIZE * 4, PLACEHOLDER_SIZE * 4))
+        return _placeholder(_normalize_mode(ImageOps.exif_transpose(image)))
+
+
+def make_derivatives(data, sizes):
+    """
+    Decode the image in ``data`` once and return its displayed dimensions,
+    an inline placeholder and ``{size: webp_bytes}`` thumbnails that fit a
+    ``size`` x ``size`` box (never upscaled).
+    """
+    largest = max(sizes)
+    with Image.open(BytesIO(data)) as image:
+        width, height = _display_size(image)
+
+        # Let the JPEG decoder downscale by powers of two while decoding
+        image.draft('RGB', (largest, largest))
+        image = ImageOps.exif_transpose(image)
+        image = _normalize_mode(image)
+
+        thumbnails = {}
+        # Each size is resized from the previous (larger) one, not the original
+        current = image
+        for size in sorted(sizes, reverse=True):
+            current = current.copy()
+            current.thumbnail((size, size), Image.LANCZOS)
+            buffer = BytesIO()
+            current.save(buffer, 'WEBP', quality=WEBP_QUALITY, method=4)
+            thumbnails[size] = buffer.getvalue()
+
+        return {
+            'width': width,
+            'height': height,
+            'placeholder': _placeholder(current),
+            'thumbnails': thumbnails,
+        }
@@ -0,0 +1,486 @@
+# Offline stand-in for Backblaze B2, enabled with B2_LOCAL_STANDIN = True.
+#
+# Objects live under B2_LOCAL_ROOT/<key>, so the Django storage, the fake
+# boto3 client and the presigned-URL view below all see the same bytes.
+# Latency, bandwidth and error injection make load tests and benchmarks
+# reproducible without a network or a real bucket.
+import hashlib
+import hmac
+import mimetypes
+import os
+import random
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from datetime import datetime, timezone as dt_timezone
+from types import SimpleNamespace
+
+from botocore.exceptions import ClientError
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+from django.http import FileResponse, Http404, HttpResponse
+from django.utils.deconstruct import deconstructible
+from django.views.decorators.csrf import csrf_exempt
+
+B2_LOCAL_ROOT = str(getattr(settings, 'B2_LOCAL_ROOT', os.path.join(settings.BASE_DIR, 'local_b2')))
+B2_LOCAL_LATENCY = getattr(settings, 'B2_LOCAL_LATENCY', 0.0)  # seconds per request
+B2_LOCAL_JITTER = getattr(settings, 'B2_LOCAL_JITTER', 0.0)  # extra random seconds per request
+B2_LOCAL_BANDWIDTH = getattr(settings, 'B2_LOCAL_BANDWIDTH', None)  # bytes per second
+B2_LOCAL_ERROR_RATE = getattr(settings, 'B2_LOCAL_ERROR_RATE', 0.0)  # share of requests failing with 503
+B2_LOCAL_SEED = getattr(settings, 'B2_LOCAL_SEED', None)  # fixed seed for repeatable runs
+
+MULTIPART_DIR = '.multipart'
+READ_CHUNK_SIZE = 64 * 1024
+
+
+class Simulator:
+    """Injects the configured latency, bandwidth cap and failures"""
+
+    def __init__(self, latency=0.0, jitter=0.0, bandwidth=None, error_rate=0.0, seed=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.bandwidth = bandwidth
+        self.error_rate = error_rate
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def request(self, operation):
+        with self._lock:
+            delay = self.latency + (self._random.uniform(0, self.jitter) if self.jitter else 0)
+            fail = self.error_rate and self._random.random() < self.error_rate
+        if delay:
+            time.sleep(delay)
+        if fail:
+            raise _client_error('ServiceUnavailable', 'Injected fault', operation, status=503)
+
+    def transfer(self, size):
+        if self.bandwidth:
+            time.sleep(size / self.bandwidth)
+
+
+simulator = Simulator(
+    latency=B2_LOCAL_LATENCY,
+    jitter=B2_LOCAL_JITTER,
+    bandwidth=B2_LOCAL_BANDWIDTH,
+    error_rate=B2_LOCAL_ERROR_RATE,
+    seed=B2_LOCAL_SEED,
+)
+
+
+def _client_error(code, message, operation, status=400):
+    return ClientError(
+        {'Error': {'Code': code, 'Message': message}, 'ResponseMetadata': {'HTTPStatusCode': status}},
+        operation,
+    )
+
+
+def _object_path(key):
+    path = os.path.normpath(os.path.join(B2_LOCAL_ROOT, key))
+    if not path.startswith(os.path.join(B2_LOCAL_ROOT, '')):
+        raise _client_error('InvalidArgument', 'Key escapes the bucket', 'Path')
+    return path
+
+
+def _etag(path):
+    md5 = hashlib.md5()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(READ_CHUNK_SIZE), b''):
+            md5.update(chunk)
+    return f'"{md5.hexdigest()}"'
+
+
+def _write_atomic(path, chunks):
+    # Readers never see a half-written object
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp-')
+    md5 = hashlib.md5()
+    size = 0
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            for chunk in chunks:
+                md5.update(chunk)
+                size += len(chunk)
+                f.write(chunk)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    simulator.transfer(size)
+    return f'"{md5.hexdigest()}"', size
+
+
+def _body_chunks(body):
+    if isinstance(body, (bytes, bytearray)):
+        yield bytes(body)
+        return
+    for chunk in iter(lambda: body.read(READ_CHUNK_SIZE), b''):
+        yield chunk
+
+
+def _walk_keys(prefix=''):
+    """Every stored key under ``prefix``, in byte order like a bucket listing"""
+    keys = []
+    for root, dirs, files in os.walk(B2_LOCAL_ROOT):
+        dirs[:] = [d for d in dirs if d != MULTIPART_DIR]
+        for name in files:
+            if name.startswith('.tmp-'):
+                continue
+            key = os.path.relpath(os.path.join(root, name), B2_LOCAL_ROOT).replace(os.sep, '/')
+            if key.startswith(prefix):
+                keys.append(key)
+    return sorted(keys)
+
+
+class LocalStreamingBody:
+    """The parts of botocore's StreamingBody that storage_app uses"""
+
+    def __init__(self, f, length):
+        self._f = f
+        self._remaining = length
+
+    def read(self, amt=None):
+        if amt is None or amt > self._remaining:
+            amt = self._remaining
+        data = self._f.read(amt)
+        self._remaining -= len(data)
+        simulator.transfer(len(data))
+        return data
+
+    def iter_chunks(self, chunk_size=1024):
+        for chunk in iter(lambda: self.read(chunk_size), b''):
+            yield chunk
+
+    def close(self):
+        self._f.close()
+
+
+class FakePaginator:
+    def __init__(self, method, token_in, token_out, result_keys):
+        self._method = method
+        self._token_in = token_in
+        self._token_out = token_out
+        self._result_keys = result_keys
+
+    def paginate(self, PaginationConfig=None, **kwargs):
+        # PaginationConfig is accepted for boto3 compatibility; pages always
+        # have the operation's default size
+        while True:
+            page = self._method(**kwargs)
+            yield page
+            if not page.get('IsTruncated'):
+                return
+            kwargs[self._token_in] = page[self._token_out]
+
+
+class FakeS3Client:
+    """
+    In-process replacement for the boto3 S3 client, covering the calls
+    storage_app makes (objects, listings, multipart uploads, managed
+    transfers), backed by files under B2_LOCAL_ROOT
+    """
+
+    def __init__(self):
+        self.meta = SimpleNamespace(region_name=getattr(settings, 'AWS_S3_REGION_NAME', None) or 'us-east-1')
+        self._lock = threading.Lock()
+
+    # Objects
+
+    def head_object(self, Bucket, Key, **kwargs):
+        simulator.request('HeadObject')
+        path = _object_path(Key)
+        if not os.path.isfile(path):
+            raise _client_error('404', 'Not Found', 'HeadObject', status=404)
+        stat = os.stat(path)
+        return {
+            'ContentLength': stat.st_size,
+            'ETag': _etag(path),
+            'LastModified': datetime.fromtimestamp(stat.st_mtime, dt_timezone.utc),
+            'ContentType': mimetypes.guess_type(Key)[0] or 'application/octet-stream',
+        }
+
+    def get_object(self, Bucket, Key, Range=None, **kwargs):
+        simulator.request('GetObject')
+        path = _object_path(Key)
+        if not os.path.isfile(path):
+            raise _client_error('NoSuchKey', 'The specified key does not exist.', 'GetObject', status=404)
+        size = os.path.getsize(path)
+        start, end = 0, size - 1
+        if Range:
+            first, _, last = Range.replace('bytes=', '').partition('-')
+            start = int(first)
+            end = min(int(last), size - 1) if last else size - 1
+        f = open(path, 'rb')
+        f.seek(start)
+        length = max(end - start + 1, 0)
+        return {
+            'Body': LocalStreamingBody(f, length),
+            'ContentLength': length,
+            'ETag': _etag(path),
+            'ContentType': mimetypes.guess_type(Key)[0] or 'application/octet-stream',
+        }
+
+    def put_object(self, Bucket, Key, Body=b'', **kwargs):
+        simulator.request('PutObject')
+        etag, _ = _write_atomic(_object_path(Key), _body_chunks(Body))
+        return {'ETag': etag}
+
+    def delete_object(self, Bucket, Key, **kwargs):
+        simulator.request('DeleteObject')
+        try:
+            os.remove(_object_path(Key))
+        except FileNotFoundError:
+            pass
+        return {}
+
+    def delete_objects(self, Bucket, Delete, **kwargs):
+        simulator.request('DeleteObjects')
+        deleted = []
+        for obj in Delete['Objects']:
+            try:
+                os.remove(_object_path(obj['Key']))
+            except FileNotFoundError:
+                pass
+            deleted.append({'Key': obj['Key']})
+        return {} if Delete.get('Quiet') else {'Deleted': deleted}
+
+    def copy_object(self, Bucket, Key, CopySource, **kwargs):
+        simulator.request('CopyObject')
+        source = _object_path(CopySource['Key'])
+        if not os.path.isfile(source):
+            raise _client_error('NoSuchKey', 'The specified key does not exist.', 'CopyObject', status=404)
+        with open(source, 'rb') as f:
+            etag, _ = _write_atomic(_object_path(Key), _body_chunks(f))
+        return {'CopyObjectResult': {'ETag': etag}}
+
+    def list_objects_v2(self, Bucket, Prefix='', MaxKeys=1000, ContinuationToken=None, StartAfter=None, **kwargs):
+        simulator.request('ListObjectsV2')
+        after = ContinuationToken or StartAfter
+        keys = [key for key in _walk_keys(Prefix) if after is None or key > after]
+        page = keys[:MaxKeys]
+        contents = []
+        for key in page:
+            stat = os.stat(_object_path(key))
+            contents.append({
+                'Key': key,
+                'Size': stat.st_size,
+                'LastModified': datetime.fromtimestamp(stat.st_mtime, dt_timezone.utc),
+            })
+        response = {'KeyCount': len(page), 'IsTruncated': len(keys) > MaxKeys}
+        if contents:
+            response['Contents'] = contents
+        if response['IsTruncated']:
+            response['NextContinuationToken'] = page[-1]
+        return response
+
+    def list_buckets(self, **kwargs):
+        simulator.request('ListBuckets')
+        return {'Buckets': [{'Name': settings.AWS_STORAGE_BUCKET_NAME}]}
+
+    # Multipart uploads
+
+    def _upload_dir(self, upload_id):
+        if not upload_id or '/' in upload_id or upload_id.startswith('.'):
+            raise _client_error('NoSuchUpload', 'The specified upload does not exist.', 'Multipart', status=404)
+        path = os.path.join(B2_LOCAL_ROOT, MULTIPART_DIR, upload_id)
+        if not os.path.isdir(path):
+            raise _client_error('NoSuchUpload', 'The specified upload does not exist.', 'Multipart', status=404)
+        return path
+
+    def create_multipart_upload(self, Bucket, Key, **kwargs):
+        simulator.request('CreateMultipartUpload')
+        upload_id = uuid.uuid4().hex
+        path = os.path.join(B2_LOCAL_ROOT, MULTIPART_DIR, upload_id)
+        os.makedirs(path)
+        with open(os.path.join(path, 'key'), 'w', encoding='utf-8') as f:
+            f.write(Key)
+        return {'Bucket': Bucket, 'Key': Key, 'UploadId': upload_id}
+
+    def upload_part(self, Bucket, Key, UploadId, PartNumber, Body=b'', **kwargs):
+        simulator.request('UploadPart')
+        path = os.path.join(self._upload_dir(UploadId), f'{int(PartNumber):05d}')
+        etag, _ = _write_atomic(path, _body_chunks(Body))
+        return {'ETag': etag}
+
+    def list_parts(self, Bucket, Key, UploadId, PartNumberMarker=0, MaxParts=1000, **kwargs):
+        simulator.request('ListParts')
+        upload_dir = self._upload_dir(UploadId)
+        numbers = sorted(
+            int(name) for name in os.listdir(upload_dir) if name.isdigit() and int(name) > PartNumberMarker
+        )
+        page = numbers[:MaxParts]
+        parts = []
+        for number in page:
+            path = os.path.join(upload_dir, f'{number:05d}')
+            parts.append({'PartNumber': number, 'ETag': _etag(path), 'Size': os.path.getsize(path)})
+        response = {'Parts': parts, 'IsTruncated': len(numbers) > MaxParts}
+        if response['IsTruncated']:
+            response['NextPartNumberMarker'] = page[-1]
+        return response
+
+    def complete_multipart_upload(self, Bucket, Key, UploadId, MultipartUpload, **kwargs):
+        simulator.request('CompleteMultipartUpload')
+        upload_dir = self._upload_dir(UploadId)
+        numbers = [part['PartNumber'] for part in MultipartUpload['Parts']]
+        paths = [os.path.join(upload_dir, f'{number:05d}') for number in numbers]
+        if numbers != sorted(numbers) or not all(os.path.isfile(path) for path in paths):
+            raise _client_error('InvalidPart', 'One or more of the specified parts could not be found.', 'CompleteMultipartUpload')
+
+        def chunks():
+            for path in paths:
+                with open(path, 'rb') as f:
+                    yield from _body_chunks(f)
+
+        digests = b''.join(bytes.fromhex(_etag(path).strip('"')) for path in paths)
+
+        # Concatenating is local disk work, not a transfer
+        bandwidth, simulator.bandwidth = simulator.bandwidth, None
+        try:
+            _write_atomic(_object_path(Key), chunks())
+        finally:
+            simulator.bandwidth = bandwidth
+        shutil.rmtree(upload_dir, ignore_errors=True)
+        return {'Bucket': Bucket, 'Key': Key, 'ETag': f'"{hashlib.md5(digests).hexdigest()}-{len(paths)}"'}
+
+    def abort_multipart_upload(self, Bucket, Key, UploadId, **kwargs):
+        simulator.request('AbortMultipartUpload')
+        shutil.rmtree(self._upload_dir(UploadId), ignore_errors=True)
+        return {}
+
+    def list_multipart_uploads(self, Bucket, KeyMarker=None, **kwargs):
+        simulator.request('ListMultipartUploads')
+        root = os.path.join(B2_LOCAL_ROOT, MULTIPART_DIR)
+        uploads = []
+        for upload_id in sorted(os.listdir(root)) if os.path.isdir(root) else []:
+            path = os.path.join(root, upload_id)
+            with open(os.path.join(path, 'key'), encoding='utf-8') as f:
+                key = f.read()
+            uploads.append({
+                'Key': key,
+                'UploadId': upload_id,
+                'Initiated': datetime.fromtimestamp(os.stat(path).st_mtime, dt_timezone.utc),
+            })
+        return {'Uploads': uploads, 'IsTruncated': False}
+
+    # Operation -> (input token, output token, result key) of its paginator
+    PAGINATORS = {
+        'list_objects_v2': ('ContinuationToken', 'NextContinuationToken', 'Contents'),
+        'list_parts': ('PartNumberMarker', 'NextPartNumberMarker', 'Parts'),
+        'list_multipart_uploads': ('KeyMarker', 'NextKeyMarker', 'Uploads'),
+    }
+
+    def get_paginator(self, operation_name):
+        if operation_name not in self.PAGINATORS:
+            raise ValueError(
+                f"The local B2 stand-in cannot paginate {operation_name!r}; "
+                f"supported: {', '.join(sorted(self.PAGINATORS))}"
+            )
+        return FakePaginator(getattr(self, operation_name), *self.PAGINATORS[operation_name])
+
+    # Managed transfers (boto3.s3.transfer)
+
+    def upload_file(self, Filename, Bucket, Key, ExtraArgs=None, Callback=None, Config=None):
+        with open(Filename, 'rb') as f:
+            self.put_object(Bucket=Bucket, Key=Key, Body=f)
+
+    def upload_fileobj(self, Fileobj, Bucket, Key, ExtraArgs=None, Callback=None, Config=None):
+        self.put_object(Bucket=Bucket, Key=Key, Body=Fileobj)
+
+    def copy(self, CopySource, Bucket, Key, ExtraArgs=None, Callback=None, SourceClient=None, Config=None):
+        self.copy_object(Bucket=Bucket, Key=Key, CopySource=CopySource)
+
+
+@deconstructible(path='storage_app.storage_backends.BackblazeB2Storage')
+class LocalB2Storage(FileSystemStorage):
+    """
+    Filesystem storage laid out like the bucket (``<root>/<AWS_LOCATION>/``).
+    Deconstructs as BackblazeB2Storage so switching to it never shows up as
+    a model change in migrations.
+    """
+
+    def __init__(self, *args, **kwargs):
+        self.location_prefix = getattr(settings, 'AWS_LOCATION', '').strip('/')
+        super().__init__(location=os.path.join(B2_LOCAL_ROOT, self.location_prefix), base_url=None)
+
+    def object_key(self, name):
+        """Return the bucket key that stores ``name`` (including AWS_LOCATION)"""
+        name = name.replace('\\', '/').lstrip('/')
+        return f'{self.location_prefix}/{name}' if self.location_prefix else name
+
+    def _open(self, name, mode='rb'):
+        simulator.request('GetObject')
+        return super()._open(name, mode)
+
+    def _save(self, name, content):
+        simulator.request('PutObject')
+        simulator.transfer(content.size)
+        return super()._save(name, content)
+
+    def delete(self, name):
+        simulator.request('DeleteObject')
+        super().delete(name)
+
+    def exists(self, name):
+        simulator.request('HeadObject')
+        return super().exists(name)
+
+    def url(self, name):
+        from .presign import presigned_get_url
+        return presigned_get_url(self.object_key(name), 'inline')
+
+
+# Presigned URLs point here while the stand-in is enabled (see urls.py)
+
+def _signature_is_valid(request, key):
+    from .presign import presign
+
+    query = request.GET
+    try:
+        signed_at = int(datetime.strptime(query['X-Amz-Date'], '%Y%m%dT%H%M%SZ')
+                        .replace(tzinfo=dt_timezone.utc).timestamp())
+        expires_in = int(query['X-Amz-Expires'])
+        signature = query['X-Amz-Signature']
+    except (KeyError, ValueError):
+        return False
+    if time.time() > signed_at + expires_in:
+        return False
+
+    params = {name: value for name, value in query.items() if not name.startswith('X-Amz-')}
+    expected = presign(request.method, key, params, signed_at=signed_at, expires_in=expires_in)
+    return hmac.compare_digest(expected.rpartition('X-Amz-Signature=')[2], signature)
+
+
+@csrf_exempt
+def serve_object(request, bucket, key):
+    """Answer presigned GET/PUT requests the way B2 would"""
+    if bucket != settings.AWS_STORAGE_BUCKET_NAME or request.method not in ('GET', 'PUT'):
+        raise Http404()
+    if not _signature_is_valid(request, key):
+        return HttpResponse('SignatureDoesNotMatch', status=403)
+
+    client = FakeS3Client()
+    try:
+        if request.method == 'PUT':
+            if 'uploadId' in request.GET:
+                result = client.upload_part(
+                    Bucket=bucket, Key=key, UploadId=request.GET['uploadId'],
+                    PartNumber=int(request.GET['partNumber']), Body=request,
+                )
+            else:
+                result = client.put_object(Bucket=bucket, Key=key, Body=request)
+            response = HttpResponse(status=200)
+            response['ETag'] = result['ETag']
+            return response
+
+        obj = client.get_object(Bucket=bucket, Key=key)
+    except ClientError as e:
+        status = e.response['ResponseMetadata']['HTTPStatusCode']
+        return HttpResponse(e.response['Error']['Code'], status=status)
+
+    response = FileResponse(obj['Body'], content_type=obj['ContentType'])
+    response['Content-Length'] = obj['ContentLength']
+    response['ETag'] = obj['ETag']
+    if 'response-content-disposition' in request.GET:
+        response['Content-Disposition'] = request.GET['response-content-disposition']
+    return response
@@ -0,0 +1,80 @@
+from datetime import timedelta
+
+from botocore.exceptions import ClientError
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from storage_app.b2_client import get_s3_client
+from storage_app.models import MultipartUpload
+
+
+class Command(BaseCommand):
+    help = 'Abort multipart uploads that were never completed so their parts stop accruing storage'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--older-than-hours',
+            type=int,
+            default=24,
+            help='Only abort uploads started at least this many hours ago',
+        )
+        parser.add_argument(
+            '--scan-bucket',
+            action='store_true',
+            help='Also abort stale uploads found in the bucket that have no tracking row',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='List stale uploads without aborting them',
+        )
+
+    def handle(self, *args, **options):
+        self.client = get_s3_client()
+        self.bucket = settings.AWS_STORAGE_BUCKET_NAME
+        self.dry_run = options['dry_run']
+        cutoff = timezone.now() - timedelta(hours=options['older_than_hours'])
+
+        aborted = 0
+        failed = 0
+
+        self.stdout.write(f"🧹 Aborting multipart uploads started before {cutoff:%Y-%m-%d %H:%M}...")
+
+        stale = MultipartUpload.objects.filter(status='pending', created_at__lt=cutoff)
+        for upload in stale.iterator():
+            if self.abort(upload.object_key, upload.upload_id):
+                aborted += 1
+                if not self.dry_run:
+                    upload.status = 'aborted'
+                    upload.save()
+                    upload.parts.all().delete()
+            else:
+                failed += 1
+
+        if options['scan_bucket']:
+            # Catches uploads left behind by crashed workers or streaming uploads
+            paginator = self.client.get_paginator('list_multipart_uploads')
+            for page in paginator.paginate(Bucket=self.bucket):
+                for upload in page.get('Uploads', []):
+                    if upload['Initiated'] >= cutoff:
+                        continue
+                    if self.abort(upload['Key'], upload['UploadId']):
+                        aborted += 1
+                    else:
+                        failed += 1
+
+        verb = 'would be aborted' if self.dry_run else 'aborted'
+        self.stdout.write(self.style.SUCCESS(f"🎉 Done! {aborted} uploads {verb}, {failed} failed"))
+
+    def abort(self, key, upload_id):
+        self.stdout.write(f"   🗑️  {key} ({upload_id[:16]}...)")
+        if self.dry_run:
+            return True
+        try:
+            self.client.abort_multipart_upload(Bucket=self.bucket, Key=key, UploadId=upload_id)
+            return True
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') == 'NoSuchUpload':
+                return True
+            self.stdout.write(self.style.ERROR(f"   ❌ Failed to abort {key}: {e}"))
+            return False
@@ -0,0 +1,49 @@
+from django.core.management.base import BaseCommand
+from storage_app.file_types import categorize
+from storage_app.models import File
+
+
+class Command(BaseCommand):
+    help = 'Set File.category for files saved before the column existed'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=2000,
+            help='Number of File rows loaded and updated per batch',
+        )
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Recompute categories that are already set (after changing the registry)',
+        )
+
+    def handle(self, *args, **options):
+        queryset = File.objects.order_by('pk')
+        if not options['all']:
+            queryset = queryset.filter(category='')
+
+        updated = 0
+        last_pk = None
+
+        self.stdout.write("🏷️  Backfilling file categories...")
+
+        while True:
+            batch_qs = queryset if last_pk is None else queryset.filter(pk__gt=last_pk)
+            batch = list(batch_qs.only('pk', 'name', 'category')[:options['batch_size']])
+            if not batch:
+                break
+            last_pk = batch[-1].pk
+
+            changed = []
+            for file_obj in batch:
+                category = categorize(file_obj.name)
+                if category != file_obj.category:
+                    file_obj.category = category
+                    changed.append(file_obj)
+            File.objects.bulk_update(changed, ['category'])
+            updated += len(changed)
+            self.stdout.write(f"   ✅ Processed batch ending at {last_pk} ({len(changed)} updated)")
+
+        self.stdout.write(self.style.SUCCESS(f"🎉 Done! Categories set for {updated} files"))
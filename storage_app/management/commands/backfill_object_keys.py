@@ -0,0 +1,119 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from botocore.exceptions import ClientError
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from storage_app.b2_client import get_s3_client
+from storage_app.models import File
+
+
+class Command(BaseCommand):
+    help = 'Resolve and store the bucket key of every File so views never probe B2'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Number of File rows resolved and saved per batch',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=16,
+            help='Concurrent HEAD/copy requests against B2',
+        )
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Re-resolve rows that already have an object key',
+        )
+        parser.add_argument(
+            '--normalize',
+            action='store_true',
+            help='Server-side copy objects found at a legacy key to the canonical layout',
+        )
+        parser.add_argument(
+            '--delete-legacy',
+            action='store_true',
+            help='With --normalize, delete the legacy object once the copy succeeded',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Report what would change without writing to B2 or the database',
+        )
+
+    def handle(self, *args, **options):
+        self.client = get_s3_client()
+        self.bucket = settings.AWS_STORAGE_BUCKET_NAME
+        self.options = options
+
+        queryset = File.objects.order_by('pk').only('pk', 'file', 'object_key')
+        if not options['all']:
+            queryset = queryset.filter(object_key='')
+
+        totals = {'resolved': 0, 'normalized': 0, 'missing': 0, 'failed': 0}
+        last_pk = None
+
+        self.stdout.write(f"🔍 Resolving object keys (batch {options['batch_size']}, {options['workers']} workers)...")
+
+        with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+            while True:
+                batch_qs = queryset if last_pk is None else queryset.filter(pk__gt=last_pk)
+                batch = list(batch_qs[:options['batch_size']])
+                if not batch:
+                    break
+                last_pk = batch[-1].pk
+
+                changed = []
+                for file_obj, (status, key) in zip(batch, pool.map(self.resolve, batch)):
+                    totals[status] += 1
+                    if status == 'missing':
+                        self.stdout.write(self.style.WARNING(f"⚠️  Not found in bucket: {file_obj.file.name}"))
+                    elif status == 'failed':
+                        self.stdout.write(self.style.ERROR(f"❌ Failed: {file_obj.file.name} - {key}"))
+                    elif key != file_obj.object_key:
+                        file_obj.object_key = key
+                        changed.append(file_obj)
+
+                if changed and not options['dry_run']:
+                    File.objects.bulk_update(changed, ['object_key'])
+                self.stdout.write(f"   ✅ Processed batch ending at {last_pk} ({len(changed)} updated)")
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"🎉 Done! {totals['resolved']} resolved, {totals['normalized']} normalized, "
+                f"{totals['missing']} missing, {totals['failed']} failed"
+            )
+        )
+
+    def exists(self, key):
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=key)
+            return True
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey', 'NotFound'):
+                return False
+            raise
+
+    def resolve(self, file_obj):
+        """Return (status, key) for one File, probing canonical then legacy keys"""
+        canonical = file_obj.file.storage.object_key(file_obj.file.name)
+        legacy = file_obj.file.name
+        try:
+            if self.exists(canonical):
+                return 'resolved', canonical
+            if legacy == canonical or not self.exists(legacy):
+                return 'missing', None
+            if not self.options['normalize']:
+                return 'resolved', legacy
+
+            if not self.options['dry_run']:
+                # Managed copy switches to multipart copy for large objects
+                self.client.copy({'Bucket': self.bucket, 'Key': legacy}, self.bucket, canonical)
+                if self.options['delete_legacy']:
+                    self.client.delete_object(Bucket=self.bucket, Key=legacy)
+            return 'normalized', canonical
+        except Exception as e:
+            return 'failed', str(e)
@@ -1,3 +1,4 @@
+from botocore.exceptions import BotoCoreError, ClientError
 from django.core.management.base import BaseCommand
 from django.conf import settings
 from storage_app.models import File
@@ -40,8 +41,8 @@ class Command(BaseCommand):
                 try:
                     file_size = file.file.size
                     size_str = f"{file_size} bytes"
-                except:
-                    size_str = "Unknown size"
+                except (ClientError, BotoCoreError) as e:
+                    size_str = f"Unknown size ({e})"
                 
                 self.stdout.write(f"   📋 {file.name}")
                 self.stdout.write(f"      URL: {file_url}")
@@ -1,19 +1,14 @@
 # storage_app/management/commands/debug_file_locations.py
 from django.core.management.base import BaseCommand
 from storage_app.models import File
-import boto3
 from django.conf import settings
+from storage_app.b2_client import get_s3_client
 
 class Command(BaseCommand):
     help = 'Debug file locations in Backblaze B2'
 
     def handle(self, *args, **options):
-        s3_client = boto3.client(
-            's3',
-            endpoint_url=settings.AWS_S3_ENDPOINT_URL,
-            aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
-            aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY
-        )
+        s3_client = get_s3_client()
         
         # Get all files from database
         files = File.objects.all()[:5]
@@ -0,0 +1,70 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from storage_app.models import File
+from storage_app.thumbnails import IMAGE_TYPES, THUMBNAIL_MAX_SOURCE_SIZE, generate_thumbnails
+
+
+class Command(BaseCommand):
+    help = 'Generate WebP thumbnails for image files that do not have them yet'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=200,
+            help='Number of File rows loaded per batch',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=8,
+            help='Concurrent downloads/uploads (resizing runs in the thumbnail process pool)',
+        )
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Regenerate thumbnails that already exist',
+        )
+
+    def handle(self, *args, **options):
+        queryset = File.objects.filter(
+            file_type__in=IMAGE_TYPES,
+            size__lte=THUMBNAIL_MAX_SOURCE_SIZE,
+            is_deleted=False,
+        ).order_by('pk')
+        if not options['all']:
+            queryset = queryset.filter(thumbnails={})
+
+        generated = 0
+        failed = 0
+        last_pk = None
+
+        self.stdout.write(f"🖼️  Generating thumbnails ({options['workers']} workers)...")
+
+        with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+            while True:
+                batch_qs = queryset if last_pk is None else queryset.filter(pk__gt=last_pk)
+                batch = list(batch_qs[:options['batch_size']])
+                if not batch:
+                    break
+                last_pk = batch[-1].pk
+
+                for file_obj, error in zip(batch, pool.map(self.generate, batch)):
+                    if error:
+                        failed += 1
+                        self.stdout.write(self.style.ERROR(f"❌ Failed: {file_obj.name} - {error}"))
+                    else:
+                        generated += 1
+                self.stdout.write(f"   ✅ Processed batch ending at {last_pk}")
+
+        self.stdout.write(
+            self.style.SUCCESS(f"🎉 Done! Thumbnails generated for {generated} files, {failed} failed")
+        )
+
+    def generate(self, file_obj):
+        try:
+            generate_thumbnails(file_obj)
+            return None
+        except Exception as e:
+            return str(e)
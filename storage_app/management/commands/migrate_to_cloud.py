@@ -1,7 +1,12 @@
 import os
-import boto3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from boto3.s3.transfer import TransferConfig
 from django.conf import settings
 from django.core.management.base import BaseCommand
+from storage_app.b2_client import get_s3_client
 
 class Command(BaseCommand):
     help = 'Migrate all local files to Backblaze B2 cloud storage'
@@ -17,6 +22,27 @@ class Command(BaseCommand):
             action='store_true', 
             help='Only check configuration without migrating',
         )
+        parser.add_argument(
+            '--prefix',
+            default=getattr(settings, 'AWS_LOCATION', ''),
+            help='Bucket prefix the media tree is copied under (defaults to AWS_LOCATION)',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=16,
+            help='Number of files uploaded concurrently',
+        )
+        parser.add_argument(
+            '--journal',
+            default=os.path.join(settings.BASE_DIR, 'migrate_to_cloud.journal'),
+            help='Checkpoint file recording finished uploads so an interrupted run can resume',
+        )
+        parser.add_argument(
+            '--fresh',
+            action='store_true',
+            help='Ignore any existing journal and start over',
+        )
 
     def handle(self, *args, **options):
         
@@ -24,7 +50,7 @@ class Command(BaseCommand):
             self.check_configuration()
             return
             
-        self.migrate_files(options['delete_local'])
+        self.migrate_files(options)
 
     def check_configuration(self):
         """Check if Backblaze B2 is properly configured"""
@@ -50,12 +76,7 @@ class Command(BaseCommand):
             
             # Test connection
             try:
-                client = boto3.client(
-                    's3',
-                    endpoint_url=settings.AWS_S3_ENDPOINT_URL,
-                    aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
-                    aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY
-                )
+                client = get_s3_client()
                 response = client.list_buckets()
                 self.stdout.write(self.style.SUCCESS("✅ Backblaze B2 connection successful!"))
             except Exception as e:
@@ -65,7 +86,7 @@ class Command(BaseCommand):
                 "⚠️  Please configure Backblaze B2 settings in settings.py before migration."
             ))
 
-    def migrate_files(self, delete_local=False):
+    def migrate_files(self, options):
         """Migrate files to Backblaze B2"""
         # Check if Backblaze is configured
         if not all([
@@ -79,61 +100,121 @@ class Command(BaseCommand):
             )
             return
 
-        client = boto3.client(
-            's3',
-            endpoint_url=settings.AWS_S3_ENDPOINT_URL,
-            aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
-            aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY
-        )
-        
         local_media = settings.MEDIA_ROOT
-        migrated_count = 0
-        failed_count = 0
-        
-        self.stdout.write(f"📁 Scanning local media folder: {local_media}")
-        
+        prefix = options['prefix'].strip('/')
+        workers = max(1, options['workers'])
+
         # Check if media directory exists
         if not os.path.exists(local_media):
             self.stdout.write(self.style.WARNING(f"⚠️  Media directory {local_media} does not exist."))
             return
-        
+
+        # Each file's multipart transfer uses its own threads, so the pool
+        # needs room for all of them at once
+        transfer_config = TransferConfig(
+            multipart_threshold=getattr(settings, 'MULTIPART_PART_SIZE', 16 * 1024 * 1024),
+            multipart_chunksize=getattr(settings, 'MULTIPART_PART_SIZE', 16 * 1024 * 1024),
+            max_concurrency=4,
+        )
+        self.client = get_s3_client('migrate', max_pool_connections=workers * transfer_config.max_concurrency)
+        self.bucket = settings.AWS_STORAGE_BUCKET_NAME
+
+        self.stdout.write(f"☁️  Listing bucket prefix: {prefix or '(bucket root)'}")
+        remote = self.list_remote(prefix)
+        self.stdout.write(f"   {len(remote)} objects already in the bucket")
+
+        journal_path = options['journal']
+        done = {} if options['fresh'] else self.read_journal(journal_path)
+        if done:
+            self.stdout.write(f"📒 Resuming from journal: {len(done)} files already migrated")
+
+        self.stdout.write(f"📁 Scanning local media folder: {local_media}")
+        pending = []
+        skipped = 0
         for root, dirs, files in os.walk(local_media):
             for file in files:
                 local_path = os.path.join(root, file)
                 # Create cloud key preserving directory structure
-                cloud_key = os.path.relpath(local_path, local_media).replace('\\', '/')
-                
-                # Skip if file already exists in cloud
-                try:
-                    client.head_object(Bucket=settings.AWS_STORAGE_BUCKET_NAME, Key=cloud_key)
-                    self.stdout.write(
-                        self.style.WARNING(f"⚠️  Skipped (already exists): {cloud_key}")
-                    )
+                relative = os.path.relpath(local_path, local_media).replace('\\', '/')
+                cloud_key = f"{prefix}/{relative}" if prefix else relative
+                size = os.path.getsize(local_path)
+
+                if remote.get(cloud_key) == size or done.get(cloud_key) == size:
+                    skipped += 1
                     continue
-                except:
-                    pass  # File doesn't exist in cloud, proceed with upload
-                
-                try:
-                    self.stdout.write(f"⬆️  Uploading: {cloud_key}")
-                    client.upload_file(local_path, settings.AWS_STORAGE_BUCKET_NAME, cloud_key)
+                pending.append((local_path, cloud_key, size))
+
+        total_bytes = sum(size for _, _, size in pending)
+        self.stdout.write(
+            f"⬆️  Uploading {len(pending)} files ({total_bytes / (1024 * 1024):.1f} MB) "
+            f"with {workers} workers, {skipped} skipped (already migrated)"
+        )
+
+        migrated_count = 0
+        failed_count = 0
+        migrated_bytes = 0
+        started = time.monotonic()
+
+        self.journal_lock = threading.Lock()
+        with open(journal_path, 'w' if options['fresh'] else 'a', encoding='utf-8') as journal:
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                futures = {
+                    pool.submit(self.upload, local_path, cloud_key, size, transfer_config, journal): (local_path, cloud_key, size)
+                    for local_path, cloud_key, size in pending
+                }
+                for future in as_completed(futures):
+                    local_path, cloud_key, size = futures[future]
+                    try:
+                        future.result()
+                    except Exception as e:
+                        failed_count += 1
+                        self.stdout.write(self.style.ERROR(f"❌ Failed: {cloud_key} - {e}"))
+                        continue
+
                     migrated_count += 1
-                    
+                    migrated_bytes += size
+                    self.stdout.write(self.style.SUCCESS(f"✅ Uploaded: {cloud_key}"))
+
                     # Delete local file if requested
-                    if delete_local:
+                    if options['delete_local']:
                         os.remove(local_path)
                         self.stdout.write(f"🗑️  Deleted local: {cloud_key}")
-                    
-                    self.stdout.write(
-                        self.style.SUCCESS(f"✅ Uploaded: {cloud_key}")
-                    )
-                except Exception as e:
-                    failed_count += 1
-                    self.stdout.write(
-                        self.style.ERROR(f"❌ Failed: {cloud_key} - {e}")
-                    )
-        
+
+        elapsed = max(time.monotonic() - started, 1e-6)
         self.stdout.write(
             self.style.SUCCESS(
-                f"🎉 Migration complete! {migrated_count} files migrated, {failed_count} failed"
+                f"🎉 Migration complete! {migrated_count} files migrated, {failed_count} failed, "
+                f"{skipped} skipped in {elapsed:.1f}s "
+                f"({migrated_count / elapsed:.1f} files/s, {migrated_bytes / (1024 * 1024) / elapsed:.1f} MB/s)"
             )
-        )
\ No newline at end of file
+        )
+        if not failed_count:
+            os.remove(journal_path)
+
+    def list_remote(self, prefix):
+        """Return {key: size} for every object under ``prefix``, in one paginated listing"""
+        remote = {}
+        paginator = self.client.get_paginator('list_objects_v2')
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=f"{prefix}/" if prefix else ''):
+            for obj in page.get('Contents', []):
+                remote[obj['Key']] = obj['Size']
+        return remote
+
+    def read_journal(self, path):
+        """Return {key: size} recorded by earlier, interrupted runs"""
+        done = {}
+        if not os.path.exists(path):
+            return done
+        with open(path, encoding='utf-8') as journal:
+            for line in journal:
+                key, _, size = line.rstrip('\n').rpartition('\t')
+                if key and size.isdigit():
+                    done[key] = int(size)
+        return done
+
+    def upload(self, local_path, cloud_key, size, transfer_config, journal):
+        # Managed transfer switches to parallel multipart above the threshold
+        self.client.upload_file(local_path, self.bucket, cloud_key, Config=transfer_config)
+        with self.journal_lock:
+            journal.write(f"{cloud_key}\t{size}\n")
+            journal.flush()
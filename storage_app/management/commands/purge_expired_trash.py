@@ -0,0 +1,74 @@
+from django.core.management.base import BaseCommand
+from storage_app.purge import PURGE_BATCH_SIZE, purge_expired_trash
+
+
+class Command(BaseCommand):
+    help = 'Permanently delete trashed files whose 30-day retention period has expired'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=PURGE_BATCH_SIZE,
+            help='Files purged per batch (one DeleteObjects request per 1000 files)',
+        )
+        parser.add_argument(
+            '--max-batches',
+            type=int,
+            default=None,
+            help='Stop after this many batches; the next run picks up the rest',
+        )
+        parser.add_argument(
+            '--sleep',
+            type=float,
+            default=0,
+            help='Seconds to pause between batches to limit the load on B2 and the database',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Report what would be purged without deleting anything',
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write("🗑️  Purging expired trash...")
+
+        totals = purge_expired_trash(
+            batch_size=options['batch_size'],
+            max_batches=options['max_batches'],
+            sleep=options['sleep'],
+            dry_run=options['dry_run'],
+            progress=self.report_batch,
+        )
+
+        reclaimed = self.format_size(totals['bytes'])
+        if options['dry_run']:
+            self.stdout.write(
+                self.style.WARNING(f"⚠️  Dry run: {totals['purged']} files ({reclaimed}) would be purged")
+            )
+            return
+
+        if totals['failed']:
+            self.stdout.write(
+                self.style.ERROR(f"❌ {totals['failed']} files could not be deleted from B2 and were kept")
+            )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"🎉 Done! {totals['purged']} files purged in {totals['batches']} batches, {reclaimed} reclaimed"
+            )
+        )
+
+    def report_batch(self, totals):
+        self.stdout.write(
+            f"   ✅ Batch {totals['batches']}: {totals['purged']} purged, "
+            f"{self.format_size(totals['bytes'])} reclaimed so far"
+        )
+
+    def format_size(self, size):
+        if size >= 1024 * 1024 * 1024:
+            return f"{size / (1024 * 1024 * 1024):.1f} GB"
+        if size >= 1024 * 1024:
+            return f"{size / (1024 * 1024):.1f} MB"
+        if size >= 1024:
+            return f"{size / 1024:.1f} KB"
+        return f"{size} Bytes"
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from storage_app.quota import reconcile_quota
+
+
+class Command(BaseCommand):
+    help = "Recompute every user's used storage from their files and correct any drift"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Report drift without correcting it',
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write("📊 Recomputing used storage (one grouped query over files)...")
+
+        drift = reconcile_quota(dry_run=options['dry_run'])
+
+        for user_id, (was, now) in sorted(drift.items()):
+            self.stdout.write(self.style.WARNING(f"⚠️  User {user_id}: recorded {was} bytes, actual {now} bytes"))
+
+        verb = 'would be corrected' if options['dry_run'] else 'corrected'
+        self.stdout.write(self.style.SUCCESS(f"🎉 Done! {len(drift)} users {verb}"))
@@ -0,0 +1,109 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from storage_app.purge import DELETE_OBJECTS_MAX_KEYS, delete_objects
+from storage_app.reconcile import find_discrepancies, unresolved_file_count
+
+
+class Command(BaseCommand):
+    help = 'Compare every bucket object with the File table and optionally delete orphaned objects'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--prefix',
+            default='',
+            help='Only reconcile keys under this prefix (e.g. media/user_7/)',
+        )
+        parser.add_argument(
+            '--delete-orphans',
+            action='store_true',
+            help='Delete objects that no File row points at',
+        )
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Delete orphans even while some files have no stored key (their objects look orphaned)',
+        )
+        parser.add_argument(
+            '--min-age-hours',
+            type=int,
+            default=24,
+            help='Never delete orphans younger than this (uploads still in flight have no row yet)',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='With --delete-orphans, list what would be deleted without deleting it',
+        )
+        parser.add_argument(
+            '--max-report',
+            type=int,
+            default=100,
+            help='Print at most this many keys of each kind',
+        )
+
+    def handle(self, *args, **options):
+        self.dry_run = options['dry_run']
+        cutoff = timezone.now() - timedelta(hours=options['min_age_hours'])
+        counts = {'missing': 0, 'orphan': 0, 'size_mismatch': 0}
+        orphan_bytes = 0
+        self.deleted = 0
+        self.failed = 0
+        batch = []
+
+        # Rows without a stored key are left out of the merge, so their live
+        # objects show up as orphans; never delete those unasked
+        unresolved = unresolved_file_count()
+        if unresolved:
+            message = f"{unresolved} files have no stored key and are not checked; run backfill_object_keys first"
+            if options['delete_orphans'] and not options['force']:
+                raise CommandError(f"{message}, or pass --force to delete orphans anyway")
+            self.stdout.write(self.style.WARNING(f"⚠️  {message}"))
+
+        self.stdout.write(f"🔍 Reconciling bucket with database{' under ' + options['prefix'] if options['prefix'] else ''}...")
+
+        for item in find_discrepancies(options['prefix']):
+            counts[item.kind] += 1
+            if counts[item.kind] <= options['max_report']:
+                self.report(item)
+
+            if item.kind == 'orphan':
+                orphan_bytes += item.bucket_size
+                if options['delete_orphans'] and item.last_modified < cutoff:
+                    batch.append(item.key)
+                    if len(batch) >= DELETE_OBJECTS_MAX_KEYS:
+                        self.delete(batch)
+                        batch = []
+
+        if batch:
+            self.delete(batch)
+
+        self.stdout.write(self.style.SUCCESS("📊 Reconciliation summary:"))
+        self.stdout.write(f"   ❓ Missing from bucket: {counts['missing']}")
+        self.stdout.write(f"   👻 Orphaned objects: {counts['orphan']} ({orphan_bytes / (1024 * 1024):.1f} MB)")
+        self.stdout.write(f"   📏 Size mismatches: {counts['size_mismatch']}")
+        if options['delete_orphans']:
+            verb = 'would be deleted' if self.dry_run else 'deleted'
+            self.stdout.write(f"   🗑️  Orphans {verb}: {self.deleted}, failed: {self.failed}")
+
+    def report(self, item):
+        if item.kind == 'missing':
+            size = 'thumbnail' if item.db_size is None else f'{item.db_size} bytes'
+            self.stdout.write(self.style.ERROR(f"❌ Missing from bucket: {item.key} ({size})"))
+        elif item.kind == 'orphan':
+            self.stdout.write(
+                self.style.WARNING(f"👻 Orphan: {item.key} ({item.bucket_size} bytes, {item.last_modified:%Y-%m-%d %H:%M})")
+            )
+        else:
+            self.stdout.write(
+                self.style.WARNING(f"📏 Size mismatch: {item.key} (database {item.db_size}, bucket {item.bucket_size})")
+            )
+
+    def delete(self, keys):
+        if self.dry_run:
+            self.deleted += len(keys)
+            return
+        failed = delete_objects(keys)
+        self.failed += len(failed)
+        self.deleted += len(keys) - len(failed)
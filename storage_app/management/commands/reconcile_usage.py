@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+from storage_app.usage import reconcile_usage
+
+
+class Command(BaseCommand):
+    help = 'Recount the storage usage ledger from a bucket listing and correct any drift'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Report drift without correcting the ledger',
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write("📊 Recounting storage usage (one streamed bucket listing)...")
+
+        drift = reconcile_usage(dry_run=options['dry_run'])
+
+        for (scope, key), (was, now) in sorted(drift.items()):
+            self.stdout.write(
+                self.style.WARNING(
+                    f"⚠️  {scope} {key or '(all)'}: recorded {was[0]} bytes / {was[1]} objects, "
+                    f"actual {now[0]} bytes / {now[1]} objects"
+                )
+            )
+
+        verb = 'would be corrected' if options['dry_run'] else 'corrected'
+        self.stdout.write(self.style.SUCCESS(f"🎉 Done! {len(drift)} ledger rows {verb}"))
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from storage_app.folder_stats import repair_folder_stats
+
+
+class Command(BaseCommand):
+    help = 'Recompute the file, subfolder and size counters stored on every folder'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Report how many folders are off without fixing them',
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write("📁 Recomputing folder statistics...")
+        wrong = repair_folder_stats(dry_run=options['dry_run'])
+        if not wrong:
+            self.stdout.write(self.style.SUCCESS("🎉 Every folder's counters were correct"))
+        elif options['dry_run']:
+            self.stdout.write(self.style.WARNING(f"⚠️  {wrong} folders have wrong counters"))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"✅ Fixed the counters of {wrong} folders"))
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+from storage_app.scheduler import SCHEDULED_COMMANDS, run_forever
+
+
+class Command(BaseCommand):
+    help = (
+        'Run settings.SCHEDULED_COMMANDS at their times in this process. Start one, '
+        'as its own worker service (see render.yaml), never inside the web server'
+    )
+
+    def handle(self, *args, **options):
+        if not SCHEDULED_COMMANDS:
+            self.stdout.write(self.style.WARNING("⚠️  No scheduled commands configured"))
+            return
+
+        for job in SCHEDULED_COMMANDS:
+            when = f"{job['at']} UTC" + (f" (weekday {job['weekday']})" if job.get('weekday') is not None else '')
+            command = ' '.join([job['command'], *job.get('args', [])])
+            self.stdout.write(f"   ⏰ {command} at {when}")
+        self.stdout.write(self.style.SUCCESS(f"🚀 Scheduler running {len(SCHEDULED_COMMANDS)} commands"))
+
+        run_forever()
@@ -1,8 +1,8 @@
-import boto3
 from django.core.management.base import BaseCommand
 from django.core.files.base import ContentFile
 from storage_app.models import File, User
 from django.conf import settings
+from storage_app.b2_client import get_s3_client
 
 class Command(BaseCommand):
     help = 'Test direct upload to Backblaze B2'
@@ -13,12 +13,7 @@ class Command(BaseCommand):
         # Test 1: Check boto3 connection
         self.stdout.write("1. Testing boto3 connection...")
         try:
-            client = boto3.client(
-                's3',
-                endpoint_url=settings.AWS_S3_ENDPOINT_URL,
-                aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
-                aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY
-            )
+            client = get_s3_client()
             client.list_buckets()
             self.stdout.write(self.style.SUCCESS("   ✅ boto3 connection works"))
         except Exception as e:
@@ -0,0 +1,31 @@
+from botocore.exceptions import ConnectionError, ReadTimeoutError
+from django.http import HttpResponse, JsonResponse
+
+from .resilience import B2_BREAKER_RESET_SECONDS, StorageUnavailable
+
+# Errors meaning B2 could not be reached in time, as opposed to a bad request
+STORAGE_DOWN_ERRORS = (StorageUnavailable, ConnectionError, ReadTimeoutError)
+
+
+class StorageUnavailableMiddleware:
+    """Turn B2 outages that escape a view into a fast 503 instead of a 500"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        return self.get_response(request)
+
+    def process_exception(self, request, exception):
+        if not isinstance(exception, STORAGE_DOWN_ERRORS):
+            return None
+        message = 'File storage is temporarily unavailable, please try again shortly'
+        # fetch() sends Accept: */*, which must get the JSON the API callers
+        # parse; only requests that rank HTML above JSON (page loads) get text
+        preferred = request.get_preferred_type(['application/json', 'text/html'])
+        if preferred == 'text/html' and not request.headers.get('x-requested-with'):
+            response = HttpResponse(message, status=503, content_type='text/plain')
+        else:
+            response = JsonResponse({'success': False, 'error': message}, status=503)
+        response['Retry-After'] = str(B2_BREAKER_RESET_SECONDS)
+        return response
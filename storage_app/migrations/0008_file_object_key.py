@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('storage_app', '0007_alter_task_due_date'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='file',
+            name='object_key',
+            field=models.CharField(blank=True, default='', max_length=1024),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('storage_app', '0009_multipartupload'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='trash',
+            name='scheduled_permanent_deletion',
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+    ]
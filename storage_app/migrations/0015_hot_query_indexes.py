@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:42
+
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('storage_app', '0014_storageusage'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='sharelink',
+            name='token',
+            field=models.UUIDField(default=uuid.uuid4, editable=False, unique=True),
+        ),
+        migrations.AddIndex(
+            model_name='file',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['owner', 'folder', '-uploaded_at'], name='file_owner_folder_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='file',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['owner', '-uploaded_at'], name='file_owner_live_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='file',
+            index=models.Index(condition=models.Q(('is_deleted', False), ('is_starred', True)), fields=['owner', '-uploaded_at'], name='file_owner_starred_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='folder',
+            index=models.Index(fields=['owner', 'parent_folder', 'name'], name='folder_owner_parent_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='trash',
+            index=models.Index(fields=['user', '-deleted_at'], name='trash_user_recent_idx'),
+        ),
+    ]
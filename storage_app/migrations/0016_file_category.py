@@ -0,0 +1,96 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:44
+
+import mimetypes
+import os
+
+from django.conf import settings
+from django.db import migrations, models
+
+# The category registry (storage_app/file_types.py) as it was when the
+# column was added; frozen so later edits never change this migration
+EXTENSION_CATEGORIES = {
+    ext: category
+    for category, extensions in {
+        'image': ['.jpg', '.jpeg', '.png', '.gif', '.bmp', '.svg', '.webp'],
+        'document': ['.doc', '.docx', '.txt', '.rtf', '.odt'],
+        'pdf': ['.pdf'],
+        'spreadsheet': ['.xls', '.xlsx', '.csv', '.ods'],
+        'presentation': ['.ppt', '.pptx', '.odp'],
+        'video': ['.mp4', '.avi', '.mov', '.wmv', '.flv', '.webm', '.mkv'],
+        'audio': ['.mp3', '.wav', '.ogg', '.m4a', '.flac'],
+        'archive': ['.zip', '.rar', '.7z', '.tar', '.gz'],
+        'code': ['.html', '.css', '.js', '.py', '.java', '.cpp', '.c', '.php', '.xml', '.json'],
+    }.items()
+    for ext in extensions
+}
+MIME_CATEGORIES = [
+    ('application/pdf', 'pdf'),
+    ('image/', 'image'),
+    ('video/', 'video'),
+    ('audio/', 'audio'),
+    ('text/x-', 'code'),
+    ('text/', 'document'),
+    ('application/vnd.ms-excel', 'spreadsheet'),
+    ('application/vnd.openxmlformats-officedocument.spreadsheetml', 'spreadsheet'),
+    ('application/vnd.ms-powerpoint', 'presentation'),
+    ('application/vnd.openxmlformats-officedocument.presentationml', 'presentation'),
+    ('application/msword', 'document'),
+    ('application/vnd.openxmlformats-officedocument.wordprocessingml', 'document'),
+    ('application/x-tar', 'archive'),
+    ('application/x-bzip', 'archive'),
+    ('application/x-xz', 'archive'),
+    ('application/zip', 'archive'),
+]
+
+BATCH_SIZE = 2000
+
+
+def categorize(name):
+    category = EXTENSION_CATEGORIES.get(os.path.splitext(name)[1].lower())
+    if category:
+        return category
+    guessed = mimetypes.guess_type(name)[0]
+    if guessed:
+        for prefix, category in MIME_CATEGORIES:
+            if guessed.startswith(prefix):
+                return category
+    return 'other'
+
+
+def fill_categories(apps, schema_editor):
+    # Type filters and facet counts match on the column, so existing files
+    # need it set before they show up there again
+    File = apps.get_model('storage_app', 'File')
+    last_pk = None
+    while True:
+        files = File.objects.order_by('pk')
+        if last_pk is not None:
+            files = files.filter(pk__gt=last_pk)
+        batch = list(files.only('pk', 'name')[:BATCH_SIZE])
+        if not batch:
+            break
+        last_pk = batch[-1].pk
+        for file_obj in batch:
+            file_obj.category = categorize(file_obj.name)
+        File.objects.bulk_update(batch, ['category'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('storage_app', '0015_hot_query_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='file',
+            name='category',
+            field=models.CharField(blank=True, default='', max_length=20),
+        ),
+        migrations.RunPython(fill_categories, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='file',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['owner', 'category', '-uploaded_at'], name='file_owner_category_recent_idx'),
+        ),
+    ]
@@ -0,0 +1,76 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:45
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def fill_folder_stats(apps, schema_editor):
+    # Same computation as storage_app.folder_stats.repair_folder_stats at
+    # the time, kept here so later changes to it never alter this migration
+    File = apps.get_model('storage_app', 'File')
+    Folder = apps.get_model('storage_app', 'Folder')
+
+    direct = {
+        row['folder_id']: (row['count'], row['size'] or 0)
+        for row in File.objects.filter(is_deleted=False, folder__isnull=False)
+        .order_by().values('folder_id').annotate(count=Count('pk'), size=Sum('size'))
+    }
+    parents = dict(Folder.objects.values_list('pk', 'parent_folder_id'))
+
+    fields = ['file_count', 'subfolder_count', 'size_bytes', 'total_file_count', 'total_bytes']
+    stats = {pk: dict.fromkeys(fields, 0) for pk in parents}
+    for pk, parent_id in parents.items():
+        count, size = direct.get(pk, (0, 0))
+        stats[pk]['file_count'] = count
+        stats[pk]['size_bytes'] = size
+        if parent_id in stats:
+            stats[parent_id]['subfolder_count'] += 1
+
+        # Every file counts towards its folder and all of its ancestors
+        seen = set()
+        ancestor = pk
+        while ancestor in parents and ancestor not in seen:
+            seen.add(ancestor)
+            stats[ancestor]['total_file_count'] += count
+            stats[ancestor]['total_bytes'] += size
+            ancestor = parents[ancestor]
+
+    for pk, values in stats.items():
+        if any(values.values()):
+            Folder.objects.filter(pk=pk).update(**values)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('storage_app', '0016_file_category'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='folder',
+            name='file_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='folder',
+            name='size_bytes',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='folder',
+            name='subfolder_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='folder',
+            name='total_bytes',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='folder',
+            name='total_file_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(fill_folder_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,34 @@
+from django.db import migrations
+from django.db.models import Count, Sum
+
+
+def seed_quota_ledgers(apps, schema_editor):
+    # used_storage and the per-user usage rows are only moved by deltas from
+    # here on, so start them from the files that exist, trash included
+    File = apps.get_model('storage_app', 'File')
+    StorageUsage = apps.get_model('storage_app', 'StorageUsage')
+    UserProfile = apps.get_model('storage_app', 'UserProfile')
+
+    owners = File.objects.order_by().values('owner_id').annotate(total=Sum('size'), count=Count('pk'))
+    totals = {row['owner_id']: (row['total'] or 0, row['count']) for row in owners}
+
+    for profile in UserProfile.objects.all():
+        used = totals.get(profile.user_id, (0, 0))[0]
+        if profile.used_storage != used:
+            UserProfile.objects.filter(pk=profile.pk).update(used_storage=used)
+
+    for owner_id, (size, count) in totals.items():
+        StorageUsage.objects.update_or_create(
+            scope='user', key=str(owner_id), defaults={'bytes': size, 'object_count': count},
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('storage_app', '0017_folder_stats'),
+    ]
+
+    operations = [
+        migrations.RunPython(seed_quota_ledgers, migrations.RunPython.noop),
+    ]
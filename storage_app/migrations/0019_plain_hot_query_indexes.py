@@ -0,0 +1,47 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:12
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('storage_app', '0018_seed_quota_ledgers'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='file',
+            name='file_owner_folder_recent_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='file',
+            name='file_owner_live_recent_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='file',
+            name='file_owner_starred_recent_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='file',
+            name='file_owner_category_recent_idx',
+        ),
+        migrations.AddIndex(
+            model_name='file',
+            index=models.Index(fields=['owner', 'folder', 'is_deleted', '-uploaded_at'], name='file_owner_folder_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='file',
+            index=models.Index(fields=['owner', 'is_deleted', '-uploaded_at'], name='file_owner_live_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='file',
+            index=models.Index(fields=['owner', 'is_deleted', 'category', '-uploaded_at'], name='file_owner_category_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='file',
+            index=models.Index(fields=['owner', 'is_starred', 'is_deleted', '-uploaded_at'], name='file_owner_starred_recent_idx'),
+        ),
+    ]
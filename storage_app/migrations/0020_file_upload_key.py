@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('storage_app', '0019_plain_hot_query_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='file',
+            name='upload_key',
+            field=models.CharField(blank=True, default='', max_length=1024),
+        ),
+    ]
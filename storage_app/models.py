@@ -6,9 +6,15 @@ from django.conf import settings
 
 from django.utils import timezone
 
+from .file_types import categorize
+from .presign import presigned_get_url
+
 # Import the custom storage
 try:
-    from .storage_backends import BackblazeB2Storage
+    if getattr(settings, 'B2_LOCAL_STANDIN', False):
+        from .local_b2 import LocalB2Storage as BackblazeB2Storage
+    else:
+        from .storage_backends import BackblazeB2Storage
     cloud_storage = BackblazeB2Storage()
 except ImportError:
     # Fallback to default S3 storage if custom backend fails
@@ -21,6 +27,35 @@ except ImportError:
 def user_directory_path(instance, filename):
     return f'user_{instance.owner.id}/{filename}'
 
+def new_object_name(user, filename):
+    """
+    Storage name for a new upload, made unique without asking B2 and cut to
+    fit File.file (FileField.pre_save never sees it to truncate it)
+    """
+    prefix = f'user_{user.id}/'
+    file_root, file_ext = os.path.splitext(cloud_storage.get_valid_name(os.path.basename(filename)))
+    name = prefix + cloud_storage.get_alternative_name(file_root, file_ext)
+    excess = len(name) - File._meta.get_field('file').max_length
+    if excess > 0:
+        # Shorten the root first and the extension only if it alone is too long
+        keep = max(len(file_root) - excess, 1)
+        excess -= len(file_root) - keep
+        file_root = file_root[:keep]
+        if excess > 0:
+            file_ext = file_ext[:len(file_ext) - excess]
+        name = prefix + cloud_storage.get_alternative_name(file_root, file_ext)
+    return name
+
+def upload_display_name(filename):
+    """Base name of an upload cut to fit File.name, the way Django cuts form uploads"""
+    name = os.path.basename(filename)
+    max_length = File._meta.get_field('name').max_length
+    if len(name) > max_length:
+        file_root, file_ext = os.path.splitext(name)
+        file_ext = file_ext[:max_length]
+        name = file_root[:max_length - len(file_ext)] + file_ext
+    return name
+
 class StoragePlan(models.Model):
     PLAN_TYPES = [
         ('free', 'Free'),
@@ -106,10 +141,21 @@ class Folder(models.Model):
     owner = models.ForeignKey(User, on_delete=models.CASCADE)
     parent_folder = models.ForeignKey('self', on_delete=models.CASCADE, null=True, blank=True, related_name='subfolders')
     created_at = models.DateTimeField(auto_now_add=True)
+    # Live (not trashed) contents, kept current by storage_app/folder_stats.py.
+    # The total_ fields include every folder below this one.
+    file_count = models.PositiveIntegerField(default=0)
+    subfolder_count = models.PositiveIntegerField(default=0)
+    size_bytes = models.BigIntegerField(default=0)
+    total_file_count = models.PositiveIntegerField(default=0)
+    total_bytes = models.BigIntegerField(default=0)
     
     class Meta:
         unique_together = ['name', 'owner', 'parent_folder']
         ordering = ['name']
+        indexes = [
+            # Subfolders of a folder, listed by name
+            models.Index(fields=['owner', 'parent_folder', 'name'], name='folder_owner_parent_name_idx'),
+        ]
     
     def __str__(self):
         return self.name
@@ -121,12 +167,12 @@ class Folder(models.Model):
         return self.name
     
     def get_files_count(self):
-        """Count files in this folder"""
-        return self.files.count()
+        """Live files directly in this folder"""
+        return self.file_count
     
     def get_subfolders_count(self):
-        """Count subfolders"""
-        return self.subfolders.count()
+        """Direct subfolders"""
+        return self.subfolder_count
 
 
 class Trash(models.Model):
@@ -135,15 +181,57 @@ class Trash(models.Model):
     file = models.ForeignKey('File', on_delete=models.CASCADE)
     original_folder = models.ForeignKey('Folder', on_delete=models.SET_NULL, null=True, blank=True)
     deleted_at = models.DateTimeField(auto_now_add=True)
-    scheduled_permanent_deletion = models.DateTimeField(null=True, blank=True)
+    scheduled_permanent_deletion = models.DateTimeField(null=True, blank=True, db_index=True)
     
     class Meta:
         ordering = ['-deleted_at']
+        indexes = [
+            models.Index(fields=['user', '-deleted_at'], name='trash_user_recent_idx'),
+        ]
     
     def __str__(self):
         return f"Trash item: {self.file.name}"
     
 
+class Blob(models.Model):
+    """Stored content shared by every File with the same SHA-256"""
+    sha256 = models.CharField(max_length=64, unique=True)
+    # Storage name and key of the first upload, reused by every duplicate
+    storage_name = models.CharField(max_length=1024)
+    object_key = models.CharField(max_length=1024)
+    size = models.BigIntegerField()
+    ref_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.sha256[:12]} ({self.ref_count} refs)"
+
+class StorageUsage(models.Model):
+    """
+    Running totals kept up to date by the upload and delete paths, so usage
+    questions never need a bucket listing. ``bucket`` and ``prefix`` rows
+    count stored objects except thumbnails; ``user`` rows count the files a
+    user owns.
+    """
+    SCOPE_CHOICES = [
+        ('bucket', 'Bucket'),
+        ('prefix', 'Prefix'),
+        ('user', 'User'),
+    ]
+
+    scope = models.CharField(max_length=10, choices=SCOPE_CHOICES)
+    key = models.CharField(max_length=255, blank=True, default='')  # prefix or user id
+    bytes = models.BigIntegerField(default=0)
+    object_count = models.BigIntegerField(default=0)
+    reconciled_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ['scope', 'key']
+
+    def __str__(self):
+        return f"{self.scope} {self.key}: {self.bytes} bytes in {self.object_count} objects"
+
 class File(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     name = models.CharField(max_length=255)
@@ -151,7 +239,15 @@ class File(models.Model):
         upload_to=user_directory_path,
         storage=cloud_storage
     )
+    # Resolved bucket key, so serving a file never has to probe B2 for it
+    object_key = models.CharField(max_length=1024, blank=True, default='')
+    blob = models.ForeignKey(Blob, on_delete=models.PROTECT, null=True, blank=True, related_name='files')
+    # Key the upload was sent to. Differs from object_key when the content
+    # was deduplicated onto an existing blob; completion retries look it up
+    upload_key = models.CharField(max_length=1024, blank=True, default='')
     file_type = models.CharField(max_length=50)
+    # Filter category from storage_app/file_types.py, set on first save
+    category = models.CharField(max_length=20, blank=True, default='')
     size = models.BigIntegerField()
     owner = models.ForeignKey(User, on_delete=models.CASCADE)
     folder = models.ForeignKey(Folder, on_delete=models.CASCADE, null=True, blank=True, related_name='files')
@@ -159,14 +255,68 @@ class File(models.Model):
     is_public = models.BooleanField(default=False)
     is_starred = models.BooleanField(default=False)
     is_deleted = models.BooleanField(default=False)
+    # Bucket keys of the WebP derivatives, by size in px ({"128": "media/..."})
+    thumbnails = models.JSONField(default=dict, blank=True)
+    # Image dimensions and a tiny inline preview (data URI) shown while loading
+    width = models.PositiveIntegerField(null=True, blank=True)
+    height = models.PositiveIntegerField(null=True, blank=True)
+    placeholder = models.TextField(blank=True, default='')
+
+    class Meta:
+        # Matched to the listing queries in views.py, newest first. Plain
+        # composite indexes: MySQL ignores partial index conditions, and it
+        # compares is_deleted = false, so the flag narrows the key like the
+        # other equality columns before uploaded_at gives the order
+        indexes = [
+            # file_list: one folder (or the root) of one owner
+            models.Index(
+                fields=['owner', 'folder', 'is_deleted', '-uploaded_at'],
+                name='file_owner_folder_recent_idx',
+            ),
+            # dashboard: everything an owner has not trashed
+            models.Index(
+                fields=['owner', 'is_deleted', '-uploaded_at'],
+                name='file_owner_live_recent_idx',
+            ),
+            # file_list/starred_files type filters and facet counts
+            models.Index(
+                fields=['owner', 'is_deleted', 'category', '-uploaded_at'],
+                name='file_owner_category_recent_idx',
+            ),
+            # starred_files
+            models.Index(
+                fields=['owner', 'is_starred', 'is_deleted', '-uploaded_at'],
+                name='file_owner_starred_recent_idx',
+            ),
+        ]
     
     def save(self, *args, **kwargs):
         if not self.name:
             self.name = os.path.basename(self.file.name)
         if not self.file_type:
             self.file_type = os.path.splitext(self.file.name)[1].lower()
+        if not self.category:
+            self.category = categorize(self.name)
+        if self.file and not self.file._committed:
+            # Upload first so the final (possibly renamed) storage name is known
+            self.file.save(self.file.name, self.file.file, save=False)
+        if self.file and not self.object_key:
+            self.object_key = self.file.storage.object_key(self.file.name)
         super().save(*args, **kwargs)
 
+    @property
+    def storage_key(self):
+        """Bucket key for this file, falling back to the canonical layout"""
+        return self.object_key or self.file.storage.object_key(self.file.name)
+
+    def thumbnail_url(self, size=128):
+        """Presigned URL of the smallest thumbnail at least ``size`` px, if any"""
+        sizes = sorted(int(s) for s in self.thumbnails)
+        if not sizes:
+            return None
+        chosen = next((s for s in sizes if s >= size), sizes[-1])
+        return presigned_get_url(self.thumbnails[str(chosen)], 'inline')
+
     def soft_delete(self):
         """Soft delete - move to trash"""
         self.is_deleted = True
@@ -180,9 +330,56 @@ class File(models.Model):
     def __str__(self):
         return self.name
 
+class MultipartUpload(models.Model):
+    """A resumable S3 multipart upload against B2, tracked until completed or aborted"""
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('completed', 'Completed'),
+        ('aborted', 'Aborted'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    owner = models.ForeignKey(User, on_delete=models.CASCADE)
+    upload_id = models.CharField(max_length=255)  # B2's multipart UploadId
+    storage_name = models.CharField(max_length=1024)
+    object_key = models.CharField(max_length=1024)
+    name = models.CharField(max_length=255)
+    size = models.BigIntegerField()
+    part_size = models.BigIntegerField()
+    is_public = models.BooleanField(default=False)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"Multipart upload of {self.name} ({self.status})"
+
+    @property
+    def part_count(self):
+        return max(1, -(-self.size // self.part_size))
+
+
+class MultipartUploadPart(models.Model):
+    upload = models.ForeignKey(MultipartUpload, on_delete=models.CASCADE, related_name='parts')
+    part_number = models.PositiveIntegerField()
+    etag = models.CharField(max_length=255)
+    size = models.BigIntegerField()
+    uploaded_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ['upload', 'part_number']
+        ordering = ['part_number']
+
+    def __str__(self):
+        return f"Part {self.part_number} of {self.upload.name}"
+
+
 class ShareLink(models.Model):
     file = models.ForeignKey(File, on_delete=models.CASCADE)
-    token = models.UUIDField(default=uuid.uuid4, editable=False)
+    token = models.UUIDField(default=uuid.uuid4, editable=False, unique=True)
     created_at = models.DateTimeField(auto_now_add=True)
     expires_at = models.DateTimeField(null=True, blank=True)
     is_active = models.BooleanField(default=True)
@@ -0,0 +1,143 @@
+import functools
+import hashlib
+import hmac
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone as dt_timezone
+from urllib.parse import quote, urlsplit
+
+from django.conf import settings
+
+from .b2_client import get_s3_client
+
+# URLs are signed for the start of a fixed time window, so every request in
+# the same window gets the byte-identical URL (and browsers can reuse what
+# they already downloaded). A URL stays valid for at least one full window,
+# and nothing can revoke one already handed out before it expires.
+PRESIGN_WINDOW_SECONDS = getattr(settings, 'PRESIGN_WINDOW_SECONDS', 3600)
+PRESIGN_CACHE_SIZE = getattr(settings, 'PRESIGN_CACHE_SIZE', 10000)
+
+
+class PresignedUrlCache:
+    """Bounded, thread-safe LRU of presigned URLs for the current window"""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, cache_key, window_start):
+        with self._lock:
+            entry = self._entries.get(cache_key)
+            if entry is None or entry[0] != window_start:
+                return None
+            self._entries.move_to_end(cache_key)
+            return entry[1]
+
+    def put(self, cache_key, window_start, url):
+        with self._lock:
+            self._entries[cache_key] = (window_start, url)
+            self._entries.move_to_end(cache_key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+_cache = PresignedUrlCache(PRESIGN_CACHE_SIZE)
+
+
+def _uri_encode(value, safe='-_.~'):
+    return quote(value, safe=safe)
+
+
+def _hmac(key, msg):
+    return hmac.new(key, msg.encode('utf-8'), hashlib.sha256).digest()
+
+
+@functools.lru_cache(maxsize=8)
+def _signing_key(date_stamp, region):
+    # Derived once per day and region instead of four HMACs per URL
+    key = _hmac(('AWS4' + settings.AWS_SECRET_ACCESS_KEY).encode('utf-8'), date_stamp)
+    key = _hmac(key, region)
+    key = _hmac(key, 's3')
+    return _hmac(key, 'aws4_request')
+
+
+@functools.lru_cache(maxsize=1)
+def _region_name():
+    # Same region the pooled client resolves, looked up once per process
+    return getattr(settings, 'AWS_S3_REGION_NAME', None) or get_s3_client().meta.region_name
+
+
+def presign(method, key, params=None, signed_at=None, expires_in=None):
+    """
+    Build a SigV4 query-string presigned URL for ``key`` without any network
+    calls. ``signed_at`` (a UNIX timestamp) makes the result deterministic.
+    """
+    if signed_at is None:
+        signed_at = int(time.time())
+    if expires_in is None:
+        expires_in = 2 * PRESIGN_WINDOW_SECONDS
+
+    endpoint = urlsplit(settings.AWS_S3_ENDPOINT_URL)
+    region = _region_name()
+    timestamp = datetime.fromtimestamp(signed_at, dt_timezone.utc)
+    amz_date = timestamp.strftime('%Y%m%dT%H%M%SZ')
+    date_stamp = timestamp.strftime('%Y%m%d')
+    scope = f'{date_stamp}/{region}/s3/aws4_request'
+
+    query = dict(params or {})
+    query.update({
+        'X-Amz-Algorithm': 'AWS4-HMAC-SHA256',
+        'X-Amz-Credential': f'{settings.AWS_ACCESS_KEY_ID}/{scope}',
+        'X-Amz-Date': amz_date,
+        'X-Amz-Expires': str(expires_in),
+        'X-Amz-SignedHeaders': 'host',
+    })
+    canonical_query = '&'.join(
+        f'{_uri_encode(k)}={_uri_encode(str(v))}' for k, v in sorted(query.items())
+    )
+    path = _uri_encode(f'{endpoint.path.rstrip("/")}/{settings.AWS_STORAGE_BUCKET_NAME}/{key}', safe='/-_.~')
+
+    canonical_request = '\n'.join([
+        method,
+        path,
+        canonical_query,
+        f'host:{endpoint.netloc}\n',
+        'host',
+        'UNSIGNED-PAYLOAD',
+    ])
+    string_to_sign = '\n'.join([
+        'AWS4-HMAC-SHA256',
+        amz_date,
+        scope,
+        hashlib.sha256(canonical_request.encode('utf-8')).hexdigest(),
+    ])
+    signature = hmac.new(
+        _signing_key(date_stamp, region), string_to_sign.encode('utf-8'), hashlib.sha256
+    ).hexdigest()
+
+    return f'{endpoint.scheme}://{endpoint.netloc}{path}?{canonical_query}&X-Amz-Signature={signature}'
+
+
+def presigned_get_url(key, disposition='attachment', filename=None):
+    """Presigned GET URL for ``key``, identical for every call in the same window"""
+    window_start = int(time.time()) // PRESIGN_WINDOW_SECONDS * PRESIGN_WINDOW_SECONDS
+    cache_key = (key, disposition, filename)
+
+    url = _cache.get(cache_key, window_start)
+    if url is None:
+        content_disposition = f'{disposition}; filename="{filename}"' if filename else disposition
+        url = presign(
+            'GET',
+            key,
+            {'response-content-disposition': content_disposition},
+            signed_at=window_start,
+            expires_in=2 * PRESIGN_WINDOW_SECONDS,
+        )
+        _cache.put(cache_key, window_start, url)
+    return url
@@ -0,0 +1,167 @@
+import logging
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.utils import timezone
+
+from .b2_client import get_s3_client
+from .blobs import release_blobs
+from .facets import invalidate_facets
+from .folder_stats import record_files
+from .models import File, Trash, cloud_storage
+from .quota import release
+from .usage import record_objects, record_user_files
+
+logger = logging.getLogger(__name__)
+
+# DeleteObjects accepts at most 1000 keys per request
+DELETE_OBJECTS_MAX_KEYS = 1000
+
+# Files removed per bucket request / database round trip
+PURGE_BATCH_SIZE = min(getattr(settings, 'PURGE_BATCH_SIZE', 1000), DELETE_OBJECTS_MAX_KEYS)
+
+
+def delete_objects(keys):
+    """Delete ``keys`` from the bucket in batched requests; return the keys that failed"""
+    client = get_s3_client()
+    failed = set()
+    for start in range(0, len(keys), DELETE_OBJECTS_MAX_KEYS):
+        chunk = keys[start:start + DELETE_OBJECTS_MAX_KEYS]
+        try:
+            response = client.delete_objects(
+                Bucket=settings.AWS_STORAGE_BUCKET_NAME,
+                Delete={'Objects': [{'Key': key} for key in chunk], 'Quiet': True},
+            )
+        except Exception as e:
+            logger.error(f"DeleteObjects failed for {len(chunk)} keys: {e}")
+            failed.update(chunk)
+            continue
+        for error in response.get('Errors', []):
+            logger.error(f"Failed to delete {error.get('Key')}: {error.get('Code')} {error.get('Message')}")
+            failed.add(error.get('Key'))
+    return failed
+
+
+def purge_files(files, max_files=None, batch_size=PURGE_BATCH_SIZE):
+    """
+    Permanently delete the File rows in ``files`` together with their objects
+    and trash records, ``batch_size`` at a time, stopping after ``max_files``.
+    Files backed by a shared blob drop a reference instead, and the blob's
+    object goes with its last reference. Owners' used storage is released
+    in the transaction that deletes each batch of rows. Rows whose object could not be deleted are kept so a
+    later purge can retry them.
+    """
+    files = files.order_by('pk')
+    purged = 0
+    purged_bytes = 0
+    failed = 0
+    owners = set()
+    last_pk = None
+
+    while max_files is None or purged + failed < max_files:
+        limit = batch_size if max_files is None else min(batch_size, max_files - purged - failed)
+        batch_qs = files if last_pk is None else files.filter(pk__gt=last_pk)
+        rows = list(batch_qs.values(
+            'pk', 'owner_id', 'folder_id', 'is_deleted', 'object_key', 'file', 'size', 'blob_id', 'thumbnails',
+        )[:limit])
+        if not rows:
+            break
+        last_pk = rows[-1]['pk']
+
+        for row in rows:
+            row['key'] = row['object_key'] or cloud_storage.object_key(row['file'])
+
+        # Objects behind a blob may still be referenced by other files; they
+        # are only deleted once the blob's last reference is gone
+        own_rows = [row for row in rows if row['blob_id'] is None]
+        failed_keys = delete_objects([row['key'] for row in own_rows])
+        done = [row for row in rows if row['key'] not in failed_keys or row['blob_id'] is not None]
+        failed += len(rows) - len(done)
+        if not done:
+            continue
+
+        pks = [row['pk'] for row in done]
+        released = Counter(row['blob_id'] for row in done if row['blob_id'] is not None)
+        totals_by_owner = {}
+        for row in done:
+            owner_totals = totals_by_owner.setdefault(row['owner_id'], [0, 0])
+            owner_totals[0] += row['size']
+            owner_totals[1] += 1
+        with transaction.atomic():
+            Trash.objects.filter(file_id__in=pks).delete()
+            File.objects.filter(pk__in=pks).delete()
+            dead_blobs = release_blobs(released) if released else []
+            record_objects([(row['key'], row['size']) for row in done if row['blob_id'] is None], sign=-1)
+            # Trashed files already left their folder's counts
+            for row in done:
+                if not row['is_deleted']:
+                    record_files(row['folder_id'], -1, -row['size'])
+            for owner_id, (size, count) in totals_by_owner.items():
+                release(owner_id, size)
+                record_user_files(owner_id, -size, -count)
+        owners.update(totals_by_owner)
+
+        # Thumbnails belong to the file, even when its content is shared.
+        # The usage ledger does not count them (see usage.py).
+        thumbnail_keys = [key for row in done for key in (row['thumbnails'] or {}).values()]
+        orphaned = delete_objects([key for key, _ in dead_blobs] + thumbnail_keys)
+        for key in orphaned:
+            # The rows are gone, so nothing will retry this delete
+            logger.error(f"Orphaned object left in bucket: {key}")
+        record_objects([(key, size) for key, size in dead_blobs if key not in orphaned], sign=-1)
+
+        purged += len(done)
+        purged_bytes += sum(row['size'] for row in done)
+
+    for owner_id in owners:
+        invalidate_facets(owner_id)
+
+    return {'purged': purged, 'bytes': purged_bytes, 'failed': failed}
+
+
+def trashed_files(user):
+    """Files ``user`` has in the trash"""
+    return File.objects.filter(
+        owner=user,
+        pk__in=Trash.objects.filter(user=user).values('file_id'),
+    )
+
+
+def expired_trash_files(now=None):
+    """Trashed files of every user whose retention period is over"""
+    now = now or timezone.now()
+    return File.objects.filter(
+        pk__in=Trash.objects.filter(scheduled_permanent_deletion__lte=now).values('file_id'),
+    )
+
+
+def purge_expired_trash(batch_size=PURGE_BATCH_SIZE, max_batches=None, sleep=0, dry_run=False, progress=None):
+    """
+    Scheduler entry point: purge expired trash in batches of ``batch_size``,
+    pausing ``sleep`` seconds between batches. Every batch commits on its
+    own, so an interrupted run simply resumes on the next invocation.
+    ``progress`` is called with the running totals after each batch.
+    """
+    files = expired_trash_files()
+    if dry_run:
+        summary = files.aggregate(count=Count('pk'), bytes=Sum('size'))
+        return {'purged': summary['count'], 'bytes': summary['bytes'] or 0, 'failed': 0, 'batches': 0}
+
+    totals = {'purged': 0, 'bytes': 0, 'failed': 0, 'batches': 0}
+    while max_batches is None or totals['batches'] < max_batches:
+        result = purge_files(files, max_files=batch_size, batch_size=batch_size)
+        totals['failed'] += result['failed']
+        if not result['purged']:
+            # Empty, or only rows whose objects keep failing to delete
+            break
+        totals['batches'] += 1
+        totals['purged'] += result['purged']
+        totals['bytes'] += result['bytes']
+        if progress:
+            progress(totals)
+        if sleep:
+            time.sleep(sleep)
+    return totals
@@ -0,0 +1,58 @@
+from django.db.models import F, Sum
+from django.db.models.functions import Greatest
+
+from .models import File, UserProfile
+
+# UserProfile.used_storage is the quota ledger: bytes of every File row the
+# user owns, trashed ones included until they are purged. It only moves by
+# the deltas below, applied in the transaction that adds or removes the rows.
+
+
+class QuotaExceeded(Exception):
+    """The new file would take its owner past their plan's storage limit"""
+
+
+def charge(user_id, size):
+    """
+    Add ``size`` bytes to ``user_id``'s used storage, raising QuotaExceeded
+    when that would go over their plan. The limit check and the increment
+    are one UPDATE, so concurrent uploads cannot both take the last bytes.
+    """
+    limit = (
+        UserProfile.objects.filter(user_id=user_id)
+        .values_list('storage_plan__max_storage_size', flat=True).first()
+    )
+    if limit is None or not UserProfile.objects.filter(
+        user_id=user_id, used_storage__lte=limit - size,
+    ).update(used_storage=F('used_storage') + size):
+        raise QuotaExceeded()
+
+
+def release(user_id, size):
+    """Give ``size`` bytes back to ``user_id``"""
+    # Floored at zero so drift never fails a purge; reconcile_quota fixes it
+    UserProfile.objects.filter(user_id=user_id).update(used_storage=Greatest(F('used_storage') - size, 0))
+
+
+def reconcile_quota(dry_run=False):
+    """
+    Recompute every user's used storage from one grouped File query and fix
+    the ones that drifted. Returns ``{user_id: (recorded, actual)}`` for them.
+    """
+    # Profiles are read before the files: an upload or purge committing in
+    # between changes used_storage, so the guarded update below skips it
+    recorded = dict(UserProfile.objects.values_list('user_id', 'used_storage'))
+    actual = dict(
+        File.objects.order_by().values('owner_id').annotate(total=Sum('size')).values_list('owner_id', 'total')
+    )
+
+    drift = {}
+    for user_id, was in recorded.items():
+        now = actual.get(user_id) or 0
+        if was != now:
+            drift[user_id] = (was, now)
+
+    if not dry_run:
+        for user_id, (was, now) in drift.items():
+            UserProfile.objects.filter(user_id=user_id, used_storage=was).update(used_storage=now)
+    return drift
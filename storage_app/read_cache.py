@@ -0,0 +1,210 @@
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+
+from botocore.exceptions import BotoCoreError, ClientError
+from django.conf import settings
+from django.http import FileResponse
+
+from .b2_client import get_s3_client
+
+logger = logging.getLogger(__name__)
+
+# Local-disk cache for objects read through public and share links. Disabled
+# unless READ_CACHE_DIR is set; routes opt in by calling serve_cached().
+READ_CACHE_DIR = getattr(settings, 'READ_CACHE_DIR', None)
+READ_CACHE_MAX_BYTES = getattr(settings, 'READ_CACHE_MAX_BYTES', 1024 * 1024 * 1024)
+# Bigger objects are not worth evicting the rest of the cache for
+READ_CACHE_MAX_OBJECT_SIZE = getattr(settings, 'READ_CACHE_MAX_OBJECT_SIZE', 100 * 1024 * 1024)
+# How long a cached copy is trusted before its ETag is checked against B2
+READ_CACHE_REVALIDATE_SECONDS = getattr(settings, 'READ_CACHE_REVALIDATE_SECONDS', 300)
+
+FILL_CHUNK_SIZE = 1024 * 1024
+# Hits only move an entry up the LRU once per interval, to spare the disk
+TOUCH_INTERVAL = 60
+LOCK_STRIPES = 64
+
+
+class ReadCache:
+    """
+    Size-capped LRU of bucket objects on local disk.
+
+    Every object is stored as ``<dir>/<xx>/<sha256 of key>`` plus a ``.json``
+    sidecar holding its ETag and size. Both are written to temporary files
+    and renamed into place, so a reader never sees a partial copy, and
+    processes sharing the directory need no coordination. Recency is the
+    data file's mtime. Concurrent misses for the same key in this process
+    wait for the first one's fill instead of downloading again.
+    """
+
+    def __init__(self, directory, max_bytes, max_object_size=None):
+        self.directory = str(directory)
+        self.max_bytes = max_bytes
+        self.max_object_size = max_object_size
+        self._locks = [threading.Lock() for _ in range(LOCK_STRIPES)]
+        self._evict_lock = threading.Lock()
+        self._total = None
+
+    def _paths(self, key):
+        digest = hashlib.sha256(key.encode('utf-8')).hexdigest()
+        path = os.path.join(self.directory, digest[:2], digest)
+        return path, path + '.json'
+
+    def _lock_for(self, key):
+        return self._locks[hash(key) % LOCK_STRIPES]
+
+    def _read_meta(self, key):
+        path, meta_path = self._paths(key)
+        try:
+            with open(meta_path, encoding='utf-8') as f:
+                meta = json.load(f)
+            if os.path.getsize(path) != meta['size'] or meta['key'] != key:
+                return None
+        except (OSError, ValueError, KeyError):
+            return None
+        return meta
+
+    def _write_json(self, path, data):
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp-')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
+
+    def _is_current(self, key, meta):
+        if time.time() - meta['validated_at'] < READ_CACHE_REVALIDATE_SECONDS:
+            return True
+        head = get_s3_client().head_object(Bucket=settings.AWS_STORAGE_BUCKET_NAME, Key=key)
+        if head['ETag'] != meta['etag']:
+            return False
+        meta['validated_at'] = time.time()
+        self._write_json(self._paths(key)[1], meta)
+        return True
+
+    def _fill(self, key):
+        path, meta_path = self._paths(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        obj = get_s3_client().get_object(Bucket=settings.AWS_STORAGE_BUCKET_NAME, Key=key)
+        if self.max_object_size and obj['ContentLength'] > self.max_object_size:
+            obj['Body'].close()
+            return None
+
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp-')
+        size = 0
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                for chunk in obj['Body'].iter_chunks(FILL_CHUNK_SIZE):
+                    f.write(chunk)
+                    size += len(chunk)
+            meta = {'key': key, 'etag': obj['ETag'], 'size': size, 'validated_at': time.time()}
+            # Metadata first: until the data rename lands the sizes disagree
+            # and readers treat the entry as missing
+            self._write_json(meta_path, meta)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        finally:
+            obj['Body'].close()
+
+        self._added(size)
+        return meta
+
+    def _touch(self, path):
+        try:
+            if time.time() - os.path.getmtime(path) > TOUCH_INTERVAL:
+                os.utime(path)
+        except OSError:
+            pass
+
+    def _entries(self):
+        for root, _, names in os.walk(self.directory):
+            for name in names:
+                if name.endswith('.json') or name.startswith('.tmp-'):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                yield path, stat.st_size, stat.st_mtime
+
+    def _added(self, size):
+        with self._evict_lock:
+            if self._total is None:
+                self._total = sum(entry[1] for entry in self._entries())
+            else:
+                self._total += size
+            if self._total > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        # Other processes fill the same directory, so recount from disk and
+        # drop least recently used entries down to 90% of the cap
+        entries = sorted(self._entries(), key=lambda entry: entry[2])
+        self._total = sum(entry[1] for entry in entries)
+        target = self.max_bytes * 0.9
+        for path, size, _ in entries:
+            if self._total <= target:
+                break
+            for victim in (path + '.json', path):
+                try:
+                    os.remove(victim)
+                except FileNotFoundError:
+                    pass
+            self._total -= size
+
+    def open(self, key):
+        """
+        Open the cached copy of ``key``, fetching it from B2 on a miss or
+        when its ETag changed. Returns ``(file, meta)``, or None when the
+        object is too big to cache.
+        """
+        meta = self._read_meta(key)
+        if meta is None or not self._is_current(key, meta):
+            with self._lock_for(key):
+                # Another thread may have filled it while we waited
+                meta = self._read_meta(key)
+                if meta is None or not self._is_current(key, meta):
+                    meta = self._fill(key)
+                    if meta is None:
+                        return None
+
+        path = self._paths(key)[0]
+        self._touch(path)
+        try:
+            return open(path, 'rb'), meta
+        except FileNotFoundError:
+            # Evicted between the check and the open
+            meta = self._fill(key)
+            return (open(path, 'rb'), meta) if meta else None
+
+
+read_cache = ReadCache(READ_CACHE_DIR, READ_CACHE_MAX_BYTES, READ_CACHE_MAX_OBJECT_SIZE) if READ_CACHE_DIR else None
+
+
+def serve_cached(file_obj, as_attachment=True):
+    """
+    FileResponse for ``file_obj`` served from the read cache, or None when
+    the cache is off, the file is too big, or B2 could not be reached; the
+    caller then falls back to a presigned URL.
+    """
+    if read_cache is None or (READ_CACHE_MAX_OBJECT_SIZE and file_obj.size > READ_CACHE_MAX_OBJECT_SIZE):
+        return None
+    try:
+        cached = read_cache.open(file_obj.storage_key)
+    except (BotoCoreError, ClientError, OSError) as e:
+        logger.error(f"Read cache miss failed for {file_obj.storage_key}: {e}")
+        return None
+    if cached is None:
+        return None
+
+    f, meta = cached
+    # FileResponse hands real files to wsgi.file_wrapper (sendfile where the
+    # server supports it), so hits never pass through Python buffers
+    response = FileResponse(f, as_attachment=as_attachment, filename=file_obj.name)
+    response['ETag'] = meta['etag']
+    return response
@@ -0,0 +1,119 @@
+import heapq
+from collections import namedtuple
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import CharField, F
+from django.db.models.functions import Cast, Collate
+
+from .b2_client import get_s3_client
+from .models import File
+
+Discrepancy = namedtuple('Discrepancy', ['kind', 'key', 'db_size', 'bucket_size', 'last_modified'])
+
+
+def _binary_ordering(field):
+    # The bucket lists keys in UTF-8 byte order; the database has to sort
+    # the same way or the merge below would report false orphans
+    if connection.vendor == 'postgresql':
+        return Collate(field, 'C')
+    if connection.vendor == 'mysql':
+        return Collate(field, f'{_mysql_charset(field)}_bin')
+    return F(field)  # SQLite compares text with BINARY by default
+
+
+def _mysql_charset(field):
+    # The binary collation has to belong to the column's own character set
+    # (utf8mb4_bin, utf8mb3_bin, latin1_bin, ...)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT CHARACTER_SET_NAME FROM information_schema.COLUMNS "
+            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND COLUMN_NAME = %s",
+            [File._meta.db_table, File._meta.get_field(field).column],
+        )
+        row = cursor.fetchone()
+    return row[0] if row else 'utf8mb4'
+
+
+def _ensure_sorted(rows, side):
+    previous = None
+    for row in rows:
+        if previous is not None and row[0] < previous:
+            raise RuntimeError(f"{side} keys are not in byte order ({previous!r} before {row[0]!r})")
+        previous = row[0]
+        yield row
+
+
+def bucket_objects(prefix=''):
+    """Stream ``(key, size, last_modified)`` for every object, in key order"""
+    paginator = get_s3_client().get_paginator('list_objects_v2')
+    for page in paginator.paginate(Bucket=settings.AWS_STORAGE_BUCKET_NAME, Prefix=prefix):
+        for obj in page.get('Contents', []):
+            yield obj['Key'], obj['Size'], obj['LastModified']
+
+
+def database_objects(prefix=''):
+    """Stream ``(key, size)`` for every key File rows point at, in key order"""
+    files = File.objects.exclude(object_key='')
+    if prefix:
+        files = files.filter(object_key__startswith=prefix)
+    rows = files.order_by(_binary_ordering('object_key')).values_list('object_key', 'size')
+
+    previous = None
+    for key, size in rows.iterator(chunk_size=2000):
+        # Files sharing a blob share its key
+        if key != previous:
+            previous = key
+            yield key, size
+
+
+def database_thumbnails(prefix=''):
+    """
+    Stream ``(key, None)`` for every thumbnail File rows record, in key
+    order. Keys are ``user_<owner>/.thumbs/<file id>/<size>.webp``, so rows
+    are read by owner id as text, then by id; derivatives have no size.
+    """
+    files = (
+        File.objects.exclude(thumbnails={})
+        .annotate(owner_key=Cast('owner_id', CharField(max_length=20)))
+        .order_by('owner_key', 'id')
+        .values_list('thumbnails', flat=True)
+    )
+    for thumbnails in files.iterator(chunk_size=2000):
+        for key in sorted(thumbnails.values()):
+            if key.startswith(prefix):
+                yield key, None
+
+
+def find_discrepancies(prefix=''):
+    """
+    Merge-join the bucket listing with the File table (objects and their
+    recorded thumbnails), both sorted by key, and yield a Discrepancy for
+    every key that is only on one side (``missing`` / ``orphan``) or whose
+    sizes differ (``size_mismatch``).
+    Memory use does not depend on the number of objects.
+    """
+    bucket = _ensure_sorted(bucket_objects(prefix), 'Bucket')
+    database = _ensure_sorted(
+        heapq.merge(database_objects(prefix), database_thumbnails(prefix), key=lambda row: row[0]), 'Database'
+    )
+    obj = next(bucket, None)
+    row = next(database, None)
+
+    while obj is not None or row is not None:
+        if row is None or (obj is not None and obj[0] < row[0]):
+            yield Discrepancy('orphan', obj[0], None, obj[1], obj[2])
+            obj = next(bucket, None)
+        elif obj is None or row[0] < obj[0]:
+            yield Discrepancy('missing', row[0], row[1], None, None)
+            row = next(database, None)
+        else:
+            if row[1] is not None and obj[1] != row[1]:
+                yield Discrepancy('size_mismatch', row[0], row[1], obj[1], obj[2])
+            obj = next(bucket, None)
+            row = next(database, None)
+
+
+def unresolved_file_count():
+    """File rows without a stored key, which the merge cannot check"""
+    return File.objects.filter(object_key='').count()
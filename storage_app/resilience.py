@@ -0,0 +1,189 @@
+import bisect
+import threading
+import time
+from collections import defaultdict
+
+from botocore.exceptions import BotoCoreError
+from django.conf import settings
+
+# Failures in a row that open the circuit, and how long it then stays open
+# before a single trial call is let through
+B2_BREAKER_FAILURE_THRESHOLD = getattr(settings, 'B2_BREAKER_FAILURE_THRESHOLD', 5)
+B2_BREAKER_RESET_SECONDS = getattr(settings, 'B2_BREAKER_RESET_SECONDS', 30)
+# Wall-clock budget per call, retries included; no retry starts after it.
+# Per-operation overrides, e.g. {'HeadObject': 5}
+B2_CALL_BUDGET = getattr(settings, 'B2_CALL_BUDGET', 20)
+B2_OPERATION_BUDGETS = getattr(settings, 'B2_OPERATION_BUDGETS', {
+    'HeadObject': 5,
+    'ListParts': 10,
+    'DeleteObject': 10,
+})
+
+# Upper bounds (ms) of the latency histogram buckets
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+
+# Throttling and server errors mean B2 is degraded, not that the request was bad
+_FAILURE_STATUS = {429, 500, 502, 503, 504}
+
+
+class StorageUnavailable(BotoCoreError):
+    """B2 is failing fast (circuit open) or a call ran out of its time budget"""
+    fmt = 'Storage unavailable: {reason}'
+
+
+class CircuitBreaker:
+    """
+    Classic three-state breaker. ``closed`` lets everything through;
+    ``failure_threshold`` consecutive failures make it ``open``, rejecting
+    calls without touching the network; after ``reset_seconds`` it goes
+    ``half_open`` and lets one trial call decide whether to close again.
+    """
+
+    def __init__(self, failure_threshold, reset_seconds):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = 'closed'
+        self.failures = 0
+        self.opened_at = None
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        with self._lock:
+            if self.state == 'closed':
+                return
+            if self.state == 'open' and time.monotonic() - self.opened_at >= self.reset_seconds:
+                self.state = 'half_open'
+            if self.state == 'half_open' and not self._trial_running:
+                self._trial_running = True
+                return
+        raise StorageUnavailable(reason='circuit open after repeated B2 failures')
+
+    def record_success(self):
+        with self._lock:
+            self.state = 'closed'
+            self.failures = 0
+            self.opened_at = None
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial_running = False
+            if self.state == 'half_open' or self.failures >= self.failure_threshold:
+                self.state = 'open'
+                self.opened_at = time.monotonic()
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'state': self.state,
+                'consecutive_failures': self.failures,
+                'open_for_seconds': round(time.monotonic() - self.opened_at, 1) if self.opened_at else None,
+            }
+
+
+class LatencyHistogram:
+    """Fixed-bucket latency histogram for one operation"""
+
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.total_ms = 0.0
+        self.errors = 0
+
+    def record(self, elapsed_ms, failed=False):
+        self.counts[bisect.bisect_left(LATENCY_BUCKETS_MS, elapsed_ms)] += 1
+        self.total_ms += elapsed_ms
+        if failed:
+            self.errors += 1
+
+    def percentile(self, fraction):
+        """Upper bound (ms) of the bucket holding the given fraction of calls"""
+        target = fraction * sum(self.counts)
+        seen = 0
+        for bound, count in zip((*LATENCY_BUCKETS_MS, None), self.counts):
+            seen += count
+            if seen >= target:
+                return bound
+        return None
+
+    def snapshot(self):
+        calls = sum(self.counts)
+        return {
+            'calls': calls,
+            'errors': self.errors,
+            'mean_ms': round(self.total_ms / calls, 1) if calls else None,
+            'p50_ms': self.percentile(0.5) if calls else None,
+            'p95_ms': self.percentile(0.95) if calls else None,
+            'p99_ms': self.percentile(0.99) if calls else None,
+            'buckets': dict(zip([*map(str, LATENCY_BUCKETS_MS), 'inf'], self.counts)),
+        }
+
+
+breaker = CircuitBreaker(B2_BREAKER_FAILURE_THRESHOLD, B2_BREAKER_RESET_SECONDS)
+_histograms = defaultdict(LatencyHistogram)
+_histograms_lock = threading.Lock()
+
+
+def _record(operation, context, failed):
+    started = context.get('b2_started')
+    if started is None:
+        return
+    with _histograms_lock:
+        _histograms[operation].record((time.monotonic() - started) * 1000, failed)
+
+
+def _before_call(model, context, **kwargs):
+    breaker.before_call()
+    context['b2_operation'] = model.name
+    context['b2_started'] = time.monotonic()
+
+
+def _before_send(request, **kwargs):
+    # Fires before every attempt; stops botocore's jittered retries once the
+    # call has used up its budget instead of waiting out the full timeout
+    context = request.context
+    started = context.get('b2_started')
+    if started is None or context.get('retries', {}).get('attempt', 1) <= 1:
+        return
+    operation = context.get('b2_operation')
+    budget = B2_OPERATION_BUDGETS.get(operation, B2_CALL_BUDGET)
+    if time.monotonic() - started > budget:
+        raise StorageUnavailable(reason=f'{operation} exceeded its {budget}s budget')
+
+
+def _after_call(http_response, model, context, **kwargs):
+    failed = http_response.status_code in _FAILURE_STATUS
+    _record(model.name, context, failed)
+    if failed:
+        breaker.record_failure()
+    else:
+        breaker.record_success()
+
+
+def _after_call_error(exception, context, **kwargs):
+    _record(context.get('b2_operation', 'unknown'), context, True)
+    breaker.record_failure()
+
+
+def instrument(client):
+    """
+    Put ``client`` behind the shared circuit breaker, call budgets and
+    latency histograms. Safe to call more than once per client.
+    """
+    if getattr(client, '_b2_instrumented', False):
+        return client
+    events = client.meta.events
+    events.register_first('before-call.s3', _before_call, unique_id='b2-breaker')
+    events.register('before-send.s3', _before_send, unique_id='b2-budget')
+    events.register('after-call.s3', _after_call, unique_id='b2-after-call')
+    events.register('after-call-error.s3', _after_call_error, unique_id='b2-after-call-error')
+    client._b2_instrumented = True
+    return client
+
+
+def health():
+    """Breaker state and per-operation latency for this process"""
+    with _histograms_lock:
+        operations = {name: histogram.snapshot() for name, histogram in sorted(_histograms.items())}
+    return {'breaker': breaker.snapshot(), 'operations': operations}
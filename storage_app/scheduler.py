@@ -0,0 +1,48 @@
+import logging
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.management import call_command
+from django.db import close_old_connections
+
+logger = logging.getLogger(__name__)
+
+# Maintenance commands run by the run_scheduler worker process:
+# {'command', 'args', 'at': 'HH:MM' UTC, 'weekday': 0-6 (Mon-Sun)}
+SCHEDULED_COMMANDS = getattr(settings, 'SCHEDULED_COMMANDS', [])
+
+
+def next_run(job, after):
+    """First time strictly after ``after`` (aware, UTC) that ``job`` is due"""
+    hour, minute = map(int, job['at'].split(':'))
+    due = after.replace(hour=hour, minute=minute, second=0, microsecond=0)
+    while due <= after or (job.get('weekday') is not None and due.weekday() != job['weekday']):
+        due += timedelta(days=1)
+    return due
+
+
+def run_job(job):
+    # Same connection handling Django does around every request
+    close_old_connections()
+    try:
+        logger.info(f"Running scheduled command {job['command']}")
+        call_command(job['command'], *job.get('args', []))
+    except Exception:
+        logger.exception(f"Scheduled command {job['command']} failed")
+    finally:
+        close_old_connections()
+
+
+def run_forever(jobs=SCHEDULED_COMMANDS):
+    """Run each of ``jobs`` whenever it is due, one at a time, until killed"""
+    now = datetime.now(dt_timezone.utc)
+    due = {index: next_run(job, now) for index, job in enumerate(jobs)}
+    while due:
+        index = min(due, key=due.get)
+        delay = (due[index] - datetime.now(dt_timezone.utc)).total_seconds()
+        if delay > 0:
+            time.sleep(delay)
+            continue
+        run_job(jobs[index])
+        due[index] = next_run(jobs[index], max(due[index], datetime.now(dt_timezone.utc)))
@@ -20,6 +20,9 @@ function initializeEnhancedInteractions() {
     
     // Add loading states to forms
     initializeFormLoadingStates();
+
+    // Swap per-file download redirects for direct signed URLs
+    presignFileLinks();
 }
 
 function setupDragAndDrop(uploadArea, fileInput) {
@@ -263,13 +266,53 @@ function enhancedDeleteFile(fileId, element) {
 }
 
 function getCSRFToken() {
-    return document.querySelector('[name=csrfmiddlewaretoken]')?.value || '';
+    const input = document.querySelector('[name=csrfmiddlewaretoken]');
+    if (input) {
+        return input.value;
+    }
+    const cookie = document.cookie.split('; ').find(row => row.startsWith('csrftoken='));
+    return cookie ? decodeURIComponent(cookie.split('=')[1]) : '';
+}
+
+// Fetch signed URLs for every [data-presign-file-id] link on the page in
+// batches, so clicking a download no longer needs a redirect through Django.
+// Links keep their original href as a fallback if the request fails.
+const PRESIGN_BATCH_SIZE = 200;
+
+function presignFileLinks() {
+    const links = Array.from(document.querySelectorAll('[data-presign-file-id]'));
+    const fileIds = [...new Set(links.map(link => link.dataset.presignFileId))];
+
+    for (let i = 0; i < fileIds.length; i += PRESIGN_BATCH_SIZE) {
+        fetch('/files/presign/', {
+            method: 'POST',
+            headers: {
+                'X-CSRFToken': getCSRFToken(),
+                'Content-Type': 'application/json',
+            },
+            body: JSON.stringify({ file_ids: fileIds.slice(i, i + PRESIGN_BATCH_SIZE) }),
+        })
+        .then(response => response.json())
+        .then(data => {
+            if (!data.success) {
+                return;
+            }
+            links.forEach(link => {
+                const urls = data.urls[link.dataset.presignFileId];
+                if (urls) {
+                    link.href = urls[link.dataset.presignVariant || 'download'];
+                }
+            });
+        })
+        .catch(() => {});
+    }
 }
 
 // Export functions for global use
 window.enhancedDeleteFile = enhancedDeleteFile;
 window.showNotification = showNotification;
 window.formatFileSize = formatFileSize;
+window.presignFileLinks = presignFileLinks;
 
 
 // Task Management Functions
@@ -1,6 +1,10 @@
 from storages.backends.s3boto3 import S3Boto3Storage
+from storages.utils import clean_name
 from django.conf import settings
 
+from .b2_client import build_client_config
+from .resilience import instrument
+
 class BackblazeB2Storage(S3Boto3Storage):
     """Custom storage backend for Backblaze B2"""
     
@@ -14,5 +18,17 @@ class BackblazeB2Storage(S3Boto3Storage):
             file_overwrite=settings.AWS_S3_FILE_OVERWRITE,
             default_acl=settings.AWS_DEFAULT_ACL,
             querystring_auth=settings.AWS_QUERYSTRING_AUTH,
+            client_config=build_client_config(),
             *args, **kwargs
-        )
\ No newline at end of file
+        )
+
+    @property
+    def connection(self):
+        # One resource per thread; its client shares the breaker and budgets
+        connection = super().connection
+        instrument(connection.meta.client)
+        return connection
+
+    def object_key(self, name):
+        """Return the bucket key that stores ``name`` (including AWS_LOCATION)"""
+        return self._normalize_name(clean_name(name))
@@ -1,3 +1,341 @@
-from django.test import TestCase
+import hashlib
+import io
+import json
+import shutil
+import tempfile
+import zipfile
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core import signing
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, TestCase, override_settings
+from django.utils import timezone
+
+from . import views
+from .archive import ArchiveAborted, stream_zip
+from .folder_stats import repair_folder_stats
+from .local_b2 import FakeS3Client
+from .models import Blob, File, Folder, MultipartUpload, ShareLink, StoragePlan, Trash, UserProfile
+from .models import new_object_name, upload_display_name
+from .purge import purge_expired_trash
+from .reconcile import find_discrepancies
+from .thumbnails import thumbnail_key
+from .usage import get_usage
+
+BUCKET = 'test-bucket'
+
+
+@override_settings(
+    AWS_STORAGE_BUCKET_NAME=BUCKET,
+    AWS_S3_ENDPOINT_URL='https://s3.example.com',
+    AWS_S3_REGION_NAME='us-west-000',
+    AWS_ACCESS_KEY_ID='key-id',
+    AWS_SECRET_ACCESS_KEY='secret',
+)
+class B2TestCase(TestCase):
+    """Runs against the local B2 stand-in, rooted in a temporary directory"""
+
+    max_storage_size = 10 * 1024 * 1024
+
+    def setUp(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root, ignore_errors=True)
+        self.patch('storage_app.local_b2.B2_LOCAL_ROOT', root)
+        self.b2 = FakeS3Client()
+        for module in ('views', 'upload_handlers', 'blobs', 'usage', 'purge', 'archive', 'reconcile'):
+            self.patch(f'storage_app.{module}.get_s3_client', return_value=self.b2)
+
+        plan = StoragePlan.objects.create(name='Test', max_storage_size=self.max_storage_size, price=0)
+        self.user = User.objects.create_user('alice', password='secret')
+        UserProfile.objects.update_or_create(user=self.user, defaults={'storage_plan': plan})
+        self.client.login(username='alice', password='secret')
+
+    def patch(self, target, *args, **kwargs):
+        patcher = mock.patch(target, *args, **kwargs)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def bucket_keys(self):
+        return sorted(obj['Key'] for obj in self.b2.list_objects_v2(Bucket=BUCKET).get('Contents', []))
+
+    def upload(self, name, content, **extra):
+        response = self.client.post('/upload/', {'file': SimpleUploadedFile(name, content), **extra})
+        return response.json()
+
+    def post_json(self, url, payload):
+        return self.client.post(url, json.dumps(payload), content_type='application/json').json()
+
+    def used_storage(self):
+        return UserProfile.objects.get(user=self.user).used_storage
+
+    def expire_trash(self):
+        Trash.objects.update(scheduled_permanent_deletion=timezone.now() - timedelta(days=1))
+
+
+class NewObjectNameTests(B2TestCase):
+    def test_long_name_fits_file_field(self):
+        max_length = File._meta.get_field('file').max_length
+        name = new_object_name(self.user, 'x' * 300 + '.txt')
+        self.assertLessEqual(len(name), max_length)
+        self.assertTrue(name.startswith(f'user_{self.user.id}/'))
+        self.assertTrue(name.endswith('.txt'))
+
+    def test_long_name_uploads(self):
+        name = 'quarterly report ' * 8 + '.pdf'
+        self.assertTrue(self.upload(name, b'%PDF-1.4')['success'])
+        file_obj = File.objects.get()
+        self.assertEqual(file_obj.name, name)
+        self.assertLessEqual(len(file_obj.file.name), File._meta.get_field('file').max_length)
+        self.assertEqual(self.bucket_keys(), [file_obj.object_key])
+
+
+    def test_display_name_fits_name_field(self):
+        name = upload_display_name('/tmp/' + 'y' * 300 + '.jpeg')
+        self.assertEqual(len(name), File._meta.get_field('name').max_length)
+        self.assertTrue(name.startswith('y'))
+        self.assertTrue(name.endswith('.jpeg'))
+
+
+class DedupLedgerTests(B2TestCase):
+    content = b'the same bytes twice'
+
+    def test_identical_uploads_share_one_object(self):
+        self.assertTrue(self.upload('a.txt', self.content)['success'])
+        self.assertTrue(self.upload('b.txt', self.content)['success'])
+
+        blob = Blob.objects.get()
+        self.assertEqual(blob.ref_count, 2)
+        self.assertEqual(blob.sha256, hashlib.sha256(self.content).hexdigest())
+        self.assertEqual(set(File.objects.values_list('object_key', flat=True)), {blob.object_key})
+        self.assertEqual(self.bucket_keys(), [blob.object_key])
+
+        # The object is stored (and counted) once, the files twice
+        size = len(self.content)
+        bucket = get_usage()
+        self.assertEqual((bucket.bytes, bucket.object_count), (size, 1))
+        user_row = get_usage('user', self.user.id)
+        self.assertEqual((user_row.bytes, user_row.object_count), (2 * size, 2))
+        self.assertEqual(self.used_storage(), 2 * size)
+
+    def test_purge_releases_references_then_the_object(self):
+        self.upload('a.txt', self.content)
+        self.upload('b.txt', self.content)
+        first, second = File.objects.order_by('name')
+        size = len(self.content)
+
+        self.client.post(f'/file/move-to-trash/{first.id}/')
+        self.expire_trash()
+        purge_expired_trash()
+        self.assertEqual(Blob.objects.get().ref_count, 1)
+        self.assertEqual(self.bucket_keys(), [second.object_key])
+        self.assertEqual(get_usage().object_count, 1)
+        self.assertEqual(self.used_storage(), size)
+
+        self.client.post(f'/file/move-to-trash/{second.id}/')
+        self.expire_trash()
+        purge_expired_trash()
+        self.assertFalse(Blob.objects.exists())
+        self.assertEqual(self.bucket_keys(), [])
+        bucket = get_usage()
+        self.assertEqual((bucket.bytes, bucket.object_count), (0, 0))
+        user_row = get_usage('user', self.user.id)
+        self.assertEqual((user_row.bytes, user_row.object_count), (0, 0))
+        self.assertEqual(self.used_storage(), 0)
+
+    def test_folder_counters_follow_moves_and_trash(self):
+        folder = Folder.objects.create(name='Docs', owner=self.user)
+        self.upload('a.txt', b'12345')
+        file_obj = File.objects.get()
+
+        self.client.post(f'/file/move/{file_obj.id}/', {'folder': folder.id})
+        folder.refresh_from_db()
+        self.assertEqual((folder.file_count, folder.size_bytes), (1, 5))
+
+        self.client.post(f'/file/move-to-trash/{file_obj.id}/')
+        folder.refresh_from_db()
+        self.assertEqual((folder.file_count, folder.size_bytes), (0, 0))
+        self.assertEqual(repair_folder_stats(dry_run=True), 0)
+
+
+class QuotaTests(B2TestCase):
+    max_storage_size = 10
+
+    def test_upload_over_the_limit_is_discarded(self):
+        result = self.upload('big.txt', b'x' * 20)
+        self.assertFalse(result['success'])
+        self.assertFalse(File.objects.exists())
+        self.assertEqual(self.bucket_keys(), [])
+        self.assertEqual(self.used_storage(), 0)
+
+    def test_upload_within_the_limit_is_charged(self):
+        self.assertTrue(self.upload('small.txt', b'x' * 10)['success'])
+        self.assertEqual(self.used_storage(), 10)
+
+
+class CompletionIdempotencyTests(B2TestCase):
+    def direct_upload(self, content):
+        storage_name = new_object_name(self.user, 'a.txt')
+        object_key = File._meta.get_field('file').storage.object_key(storage_name)
+        self.b2.put_object(Bucket=BUCKET, Key=object_key, Body=content)
+        token = signing.dumps({
+            'user': self.user.id,
+            'name': 'a.txt',
+            'storage_name': storage_name,
+            'size': len(content),
+            'is_public': False,
+        }, salt=views.DIRECT_UPLOAD_SALT)
+        return {'token': token, 'sha256': hashlib.sha256(content).hexdigest()}
+
+    def test_direct_retry_returns_the_same_file(self):
+        payload = self.direct_upload(b'direct')
+        first = self.post_json('/upload/direct/complete/', payload)
+        retry = self.post_json('/upload/direct/complete/', payload)
+        self.assertTrue(first['success'])
+        self.assertEqual(retry, first)
+        self.assertEqual(File.objects.count(), 1)
+
+    def test_direct_retry_of_a_deduplicated_upload(self):
+        self.post_json('/upload/direct/complete/', self.direct_upload(b'shared'))
+        payload = self.direct_upload(b'shared')
+        first = self.post_json('/upload/direct/complete/', payload)
+        retry = self.post_json('/upload/direct/complete/', payload)
+        self.assertTrue(first['success'])
+        self.assertEqual(retry, first)
+        self.assertEqual(File.objects.count(), 2)
+        self.assertEqual(Blob.objects.get().ref_count, 2)
+        self.assertEqual(self.used_storage(), 12)
+
+    def test_multipart_retry_returns_the_same_file(self):
+        created = self.post_json('/upload/multipart/', {'name': 'big.bin', 'size': 4})
+        upload = MultipartUpload.objects.get(id=created['upload_id'])
+        self.b2.upload_part(
+            Bucket=BUCKET, Key=upload.object_key, UploadId=upload.upload_id, PartNumber=1, Body=b'data',
+        )
+
+        first = self.post_json(f'/upload/multipart/{upload.id}/complete/', {})
+        retry = self.post_json(f'/upload/multipart/{upload.id}/complete/', {})
+        self.assertTrue(first['success'])
+        self.assertEqual(retry, first)
+        self.assertEqual(File.objects.count(), 1)
+        self.assertEqual(self.used_storage(), 4)
+
+
+class PurgeBatchingTests(B2TestCase):
+    def setUp(self):
+        super().setUp()
+        for i in range(5):
+            self.upload(f'file{i}.txt', f'content {i}'.encode())
+        for file_obj in File.objects.all():
+            self.client.post(f'/file/move-to-trash/{file_obj.id}/')
+        self.expire_trash()
+
+    def test_batches_count_only_purged_files(self):
+        reports = []
+        totals = purge_expired_trash(batch_size=2, progress=lambda totals: reports.append(dict(totals)))
+        self.assertEqual((totals['purged'], totals['batches'], totals['failed']), (5, 3, 0))
+        self.assertEqual([report['batches'] for report in reports], [1, 2, 3])
+        self.assertFalse(File.objects.exists())
+        self.assertEqual(self.bucket_keys(), [])
+        self.assertEqual(self.used_storage(), 0)
+
+    def test_max_batches_leaves_the_rest(self):
+        totals = purge_expired_trash(batch_size=2, max_batches=1)
+        self.assertEqual((totals['purged'], totals['batches']), (2, 1))
+        self.assertEqual(File.objects.count(), 3)
+
+    def test_dry_run_deletes_nothing(self):
+        totals = purge_expired_trash(dry_run=True)
+        self.assertEqual(totals['purged'], 5)
+        self.assertEqual(File.objects.count(), 5)
+
+    def test_unexpired_trash_is_kept(self):
+        Trash.objects.update(scheduled_permanent_deletion=timezone.now() + timedelta(days=1))
+        self.assertEqual(purge_expired_trash()['purged'], 0)
+        self.assertEqual(File.objects.count(), 5)
+
+
+class ConditionalGetTests(B2TestCase):
+    def setUp(self):
+        super().setUp()
+        self.upload('shared.txt', b'shared content')
+        self.link = ShareLink.objects.create(file=File.objects.get())
+        self.url = f'/share/{self.link.token}/'
+        self.client.logout()
+
+    def test_matching_etag_is_not_modified(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_unchanged_since_last_modified_is_not_modified(self):
+        response = self.client.get(self.url)
+        response = self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_another_viewer_gets_the_page(self):
+        etag = self.client.get(self.url)['ETag']
+        self.client.login(username='alice', password='secret')
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_deactivated_link_is_not_served_from_cache(self):
+        etag = self.client.get(self.url)['ETag']
+        ShareLink.objects.filter(pk=self.link.pk).update(is_active=False)
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertTemplateUsed(response, 'share_error.html')
+
+
+class UploadCsrfTests(B2TestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = Client(enforce_csrf_checks=True)
+        self.client.login(username='alice', password='secret')
+        self.token = self.client.get('/dashboard/').cookies['csrftoken'].value
+
+    def test_form_token_is_accepted(self):
+        self.assertTrue(self.upload('a.txt', b'hello', csrfmiddlewaretoken=self.token)['success'])
+
+    def test_missing_token_leaves_nothing_behind(self):
+        response = self.client.post('/upload/', {'file': SimpleUploadedFile('a.txt', b'hello')})
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(self.bucket_keys(), [])
+
+    def test_failed_store_leaves_nothing_behind(self):
+        self.patch('storage_app.views.create_uploaded_file', side_effect=RuntimeError)
+        with self.assertRaises(RuntimeError):
+            self.upload('a.txt', b'hello', csrfmiddlewaretoken=self.token)
+        self.assertEqual(self.bucket_keys(), [])
+
+
+class ZipTests(B2TestCase):
+    def test_root_zip_is_resolved_server_side(self):
+        for i in range(3):
+            self.upload(f'file{i}.txt', f'content {i}'.encode())
+        response = self.client.post('/files/zip/', {'root': '1'})
+        archive = zipfile.ZipFile(io.BytesIO(b''.join(response.streaming_content)))
+        self.assertEqual(sorted(archive.namelist()), ['file0.txt', 'file1.txt', 'file2.txt'])
+        self.assertIsNone(archive.testzip())
+
+    def test_unreadable_member_aborts_the_archive(self):
+        self.upload('a.txt', b'content')
+        file_obj = File.objects.get()
+        self.b2.delete_object(Bucket=BUCKET, Key=file_obj.object_key)
+        with self.assertRaises(ArchiveAborted):
+            list(stream_zip([('a.txt', file_obj)]))
+
+
+class ReconcileTests(B2TestCase):
+    def test_thumbnails_are_reconciled(self):
+        self.upload('photo.txt', b'pixels')
+        file_obj = File.objects.get()
+        recorded = {'128': thumbnail_key(file_obj, 128), '256': thumbnail_key(file_obj, 256)}
+        File.objects.filter(pk=file_obj.pk).update(thumbnails=recorded)
+        self.b2.put_object(Bucket=BUCKET, Key=recorded['128'], Body=b'thumb')
+        leaked = thumbnail_key(file_obj, 512)
+        self.b2.put_object(Bucket=BUCKET, Key=leaked, Body=b'thumb')
+
+        found = sorted((item.kind, item.key) for item in find_discrepancies())
+        self.assertEqual(found, [('missing', recorded['256']), ('orphan', leaked)])
@@ -0,0 +1,159 @@
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+
+from .b2_client import get_s3_client
+from .imaging import image_dimensions, make_derivatives, make_placeholder
+from .models import File, cloud_storage
+
+logger = logging.getLogger(__name__)
+
+# Derivative sizes (longest edge in px)
+THUMBNAIL_SIZES = tuple(getattr(settings, 'THUMBNAIL_SIZES', (128, 256, 512)))
+THUMBNAIL_WORKERS = getattr(settings, 'THUMBNAIL_WORKERS', 2)
+# Originals larger than this are not decoded on the web servers
+THUMBNAIL_MAX_SOURCE_SIZE = getattr(settings, 'THUMBNAIL_MAX_SOURCE_SIZE', 50 * 1024 * 1024)
+
+# Enough of the original to read the dimensions of almost any image
+IMAGE_HEADER_BYTES = 64 * 1024
+
+# Derivatives live in this directory under the owner's folder
+THUMBNAIL_DIR = '.thumbs'
+
+IMAGE_TYPES = {'.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp', '.tif', '.tiff'}
+
+_lock = threading.Lock()
+_process_pool = None
+_io_pool = None
+
+
+def _pools():
+    # Spawned (not forked) workers only import imaging.py, never Django
+    global _process_pool, _io_pool
+    with _lock:
+        if _process_pool is None:
+            _process_pool = ProcessPoolExecutor(
+                max_workers=THUMBNAIL_WORKERS,
+                mp_context=multiprocessing.get_context('spawn'),
+            )
+            _io_pool = ThreadPoolExecutor(max_workers=THUMBNAIL_WORKERS * 2)
+        return _process_pool, _io_pool
+
+
+def _reset_pools():
+    global _lock, _process_pool, _io_pool
+    _lock = threading.Lock()
+    _process_pool = None
+    _io_pool = None
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_pools)
+
+
+def is_thumbnailable(file_obj):
+    return file_obj.file_type in IMAGE_TYPES and file_obj.size <= THUMBNAIL_MAX_SOURCE_SIZE
+
+
+def thumbnail_key(file_obj, size):
+    """Bucket key of one derivative, kept under the owner's folder"""
+    return cloud_storage.object_key(f'user_{file_obj.owner_id}/{THUMBNAIL_DIR}/{file_obj.pk}/{size}.webp')
+
+
+def is_thumbnail_key(key):
+    return f'/{THUMBNAIL_DIR}/' in key
+
+
+def generate_thumbnails(file_obj):
+    """
+    Build and store every derivative of ``file_obj`` and record them with
+    the image's dimensions and inline placeholder; returns the new mapping
+    """
+    client = get_s3_client()
+    bucket = settings.AWS_STORAGE_BUCKET_NAME
+    data = client.get_object(Bucket=bucket, Key=file_obj.storage_key)['Body'].read()
+
+    process_pool, _ = _pools()
+    derivatives = process_pool.submit(make_derivatives, data, THUMBNAIL_SIZES).result()
+
+    thumbnails = {}
+    for size, content in derivatives['thumbnails'].items():
+        key = thumbnail_key(file_obj, size)
+        client.put_object(
+            Bucket=bucket,
+            Key=key,
+            Body=content,
+            ContentType='image/webp',
+            # The key changes with the file, so the bytes never do
+            CacheControl='public, max-age=31536000, immutable',
+        )
+        thumbnails[str(size)] = key
+
+    fields = {
+        'thumbnails': thumbnails,
+        'width': derivatives['width'],
+        'height': derivatives['height'],
+        'placeholder': derivatives['placeholder'],
+    }
+    File.objects.filter(pk=file_obj.pk).update(**fields)
+    for name, value in fields.items():
+        setattr(file_obj, name, value)
+    return thumbnails
+
+
+def backfill_placeholder(file_obj):
+    """
+    Record dimensions and placeholder for an image that already has
+    thumbnails, from its smallest thumbnail and the first bytes of the
+    original instead of the whole file
+    """
+    if not file_obj.thumbnails:
+        generate_thumbnails(file_obj)
+        return
+
+    client = get_s3_client()
+    bucket = settings.AWS_STORAGE_BUCKET_NAME
+    header = client.get_object(
+        Bucket=bucket, Key=file_obj.storage_key, Range=f'bytes=0-{IMAGE_HEADER_BYTES - 1}'
+    )['Body'].read()
+    dimensions = image_dimensions(header)
+    if dimensions is None:
+        generate_thumbnails(file_obj)
+        return
+
+    smallest = min(file_obj.thumbnails, key=int)
+    thumbnail = client.get_object(Bucket=bucket, Key=file_obj.thumbnails[smallest])['Body'].read()
+    file_obj.width, file_obj.height = dimensions
+    file_obj.placeholder = make_placeholder(thumbnail)
+    File.objects.filter(pk=file_obj.pk).update(
+        width=file_obj.width, height=file_obj.height, placeholder=file_obj.placeholder
+    )
+
+
+def _generate_in_background(file_id):
+    # Pool threads outlive requests and keep their own connection; drop it
+    # once unusable or past CONN_MAX_AGE, as Django does around each request
+    close_old_connections()
+    try:
+        file_obj = File.objects.get(pk=file_id)
+        generate_thumbnails(file_obj)
+    except File.DoesNotExist:
+        pass
+    except Exception as e:
+        # A missing thumbnail only means the listing shows the type icon
+        logger.error(f"Thumbnail generation failed for {file_id}: {e}")
+    finally:
+        close_old_connections()
+
+
+def schedule_thumbnails(file_obj):
+    """Generate thumbnails off the request once the File row is committed"""
+    if not is_thumbnailable(file_obj):
+        return
+    file_id = file_obj.pk
+    transaction.on_commit(lambda: _pools()[1].submit(_generate_in_background, file_id))
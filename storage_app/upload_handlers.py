@@ -0,0 +1,176 @@
+import base64
+import hashlib
+import logging
+
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+from django.core.files.uploadhandler import FileUploadHandler, StopFutureHandlers
+
+from .b2_client import get_s3_client
+from .models import cloud_storage, new_object_name
+
+logger = logging.getLogger(__name__)
+
+# Bytes buffered per upload before a part is sent to B2 (B2's minimum part
+# size is 5 MB, so this is also the peak buffer per concurrent upload)
+STREAMING_UPLOAD_PART_SIZE = max(
+    getattr(settings, 'STREAMING_UPLOAD_PART_SIZE', 5 * 1024 * 1024),
+    5 * 1024 * 1024,
+)
+
+
+class B2StreamedFile(UploadedFile):
+    """An upload whose bytes are already stored in B2; only metadata is kept"""
+
+    def __init__(self, name, storage_name, object_key, content_type, size, charset,
+                 sha256, content_type_extra=None):
+        super().__init__(None, name, content_type, size, charset, content_type_extra)
+        self.storage_name = storage_name
+        self.object_key = object_key
+        self.sha256 = sha256
+
+    def open(self, mode=None):
+        raise ValueError('A streamed upload has no local data; read it from B2 instead.')
+
+
+class B2StreamingUploadHandler(FileUploadHandler):
+    """
+    Pipe the ``file`` field of a multipart request straight into a B2
+    multipart upload as chunks arrive, instead of buffering the whole file
+    in memory or on disk first. Size and SHA-256 are computed in the same
+    pass and every part is sent with its Content-MD5.
+    """
+
+    field_name = 'file'
+
+    def __init__(self, request=None):
+        super().__init__(request)
+        self.active = False
+        self.stored = False
+        self.upload_id = None
+
+    def new_file(self, field_name, file_name, content_type, content_length, charset=None,
+                 content_type_extra=None):
+        super().new_file(field_name, file_name, content_type, content_length, charset, content_type_extra)
+        if field_name != self.field_name:
+            return
+
+        self.client = get_s3_client()
+        self.storage_name = new_object_name(self.request.user, file_name)
+        self.object_key = cloud_storage.object_key(self.storage_name)
+        self.buffer = bytearray()
+        self.parts = []
+        self.sha256 = hashlib.sha256()
+        self.size = 0
+        self.active = True
+
+        # The remaining handlers never see this file
+        raise StopFutureHandlers()
+
+    def receive_data_chunk(self, raw_data, start):
+        if not self.active:
+            return raw_data
+
+        self.buffer += raw_data
+        self.sha256.update(raw_data)
+        self.size += len(raw_data)
+        if len(self.buffer) >= STREAMING_UPLOAD_PART_SIZE:
+            self._send_part()
+        return None
+
+    def file_complete(self, file_size):
+        if not self.active:
+            return None
+
+        bucket = settings.AWS_STORAGE_BUCKET_NAME
+        if not self.parts:
+            # Small file: a single PUT is cheaper than a one-part multipart upload
+            self.client.put_object(
+                Bucket=bucket,
+                Key=self.object_key,
+                Body=bytes(self.buffer),
+                ContentMD5=self._content_md5(self.buffer),
+                ContentType=self.content_type or 'application/octet-stream',
+            )
+        else:
+            if self.buffer:
+                self._send_part()
+            self.client.complete_multipart_upload(
+                Bucket=bucket,
+                Key=self.object_key,
+                UploadId=self.upload_id,
+                MultipartUpload={'Parts': self.parts},
+            )
+        self.buffer = bytearray()
+        self.active = False
+        self.stored = True
+
+        return B2StreamedFile(
+            name=self.file_name,
+            storage_name=self.storage_name,
+            object_key=self.object_key,
+            content_type=self.content_type,
+            size=self.size,
+            charset=self.charset,
+            sha256=self.sha256.hexdigest(),
+            content_type_extra=self.content_type_extra,
+        )
+
+    def upload_interrupted(self):
+        self._abort()
+
+    def upload_complete(self):
+        # Still active here means the request body ended mid-file
+        self._abort()
+
+    def discard(self):
+        """Abort or delete whatever was sent to B2 for a request that failed to parse"""
+        if self.active:
+            self._abort()
+        elif self.stored:
+            self.stored = False
+            try:
+                self.client.delete_object(Bucket=settings.AWS_STORAGE_BUCKET_NAME, Key=self.object_key)
+            except Exception as e:
+                logger.error(f"Failed to delete streamed upload {self.object_key}: {e}")
+
+    def _send_part(self):
+        if self.upload_id is None:
+            self.upload_id = self.client.create_multipart_upload(
+                Bucket=settings.AWS_STORAGE_BUCKET_NAME,
+                Key=self.object_key,
+                ContentType=self.content_type or 'application/octet-stream',
+            )['UploadId']
+
+        part_number = len(self.parts) + 1
+        response = self.client.upload_part(
+            Bucket=settings.AWS_STORAGE_BUCKET_NAME,
+            Key=self.object_key,
+            UploadId=self.upload_id,
+            PartNumber=part_number,
+            Body=bytes(self.buffer),
+            ContentMD5=self._content_md5(self.buffer),
+        )
+        self.parts.append({'PartNumber': part_number, 'ETag': response['ETag']})
+        self.buffer = bytearray()
+
+    def _abort(self):
+        if not self.active:
+            return
+        self.active = False
+        self.buffer = bytearray()
+        if self.upload_id is None:
+            return
+        try:
+            self.client.abort_multipart_upload(
+                Bucket=settings.AWS_STORAGE_BUCKET_NAME,
+                Key=self.object_key,
+                UploadId=self.upload_id,
+            )
+        except Exception as e:
+            # abort_stale_multipart_uploads --scan-bucket cleans up leftovers
+            logger.error(f"Failed to abort streamed upload {self.object_key}: {e}")
+
+    @staticmethod
+    def _content_md5(data):
+        return base64.b64encode(hashlib.md5(data).digest()).decode('ascii')
@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.urls import path
 from . import views
 
@@ -13,8 +14,18 @@ urlpatterns = [
     path('files/folder/<uuid:folder_id>/', views.file_list, name='file_list_folder'),
     
     path('upload/', views.upload_file, name='upload_file'),
+    path('upload/claim/', views.claim_upload, name='claim_upload'),
+    path('upload/direct/', views.initiate_direct_upload, name='initiate_direct_upload'),
+    path('upload/direct/complete/', views.complete_direct_upload, name='complete_direct_upload'),
+    path('upload/multipart/', views.create_multipart_upload, name='create_multipart_upload'),
+    path('upload/multipart/<uuid:upload_id>/', views.multipart_upload_status, name='multipart_upload_status'),
+    path('upload/multipart/<uuid:upload_id>/part/<int:part_number>/', views.multipart_upload_part, name='multipart_upload_part'),
+    path('upload/multipart/<uuid:upload_id>/complete/', views.complete_multipart_upload, name='complete_multipart_upload'),
+    path('upload/multipart/<uuid:upload_id>/abort/', views.abort_multipart_upload, name='abort_multipart_upload'),
     path('delete/<uuid:file_id>/', views.delete_file, name='delete_file'),
     path('download/<uuid:file_id>/', views.download_file, name='download_file'),
+    path('files/zip/', views.download_zip, name='download_zip'),
+    path('files/presign/', views.batch_presign, name='batch_presign'),
     
     # Folder management URLs
     path('folder/create/', views.create_folder, name='create_folder'),
@@ -24,9 +35,11 @@ urlpatterns = [
     # Share URLs
     path('share/create/<uuid:file_id>/', views.create_share_link, name='create_share'),
     path('share/<uuid:token>/', views.share_file, name='share_file'),
+    path('share/<uuid:token>/download/', views.share_download, name='share_download'),
 
     path('file/toggle-public/<uuid:file_id>/', views.toggle_file_visibility, name='toggle_file_visibility'),
     path('public/file/<uuid:file_id>/', views.public_file_access, name='public_file_access'),
+    path('public/file/<uuid:file_id>/download/', views.public_file_download, name='public_file_download'),
 
     path('pricing/', views.pricing_plans, name='pricing_plans'),
     path('create-checkout-session/<str:plan_id>/', views.create_checkout_session, name='create_checkout_session'),
@@ -37,6 +50,8 @@ urlpatterns = [
 
     path('check-payment-status/', views.check_payment_status, name='check_payment_status'),
 
+    path('storage/health/', views.storage_health, name='storage_health'),
+
     path('debug-plans/', views.debug_plans, name='debug_plans'),
 
     path('test-subscription-email/', views.test_subscription_email, name='test_subscription_email'),
@@ -70,4 +85,9 @@ urlpatterns = [
 
     path('tasks/<uuid:task_id>/json/', views.task_detail_json, name='task_detail_json'),
 
-]
\ No newline at end of file
+]
+
+if getattr(settings, 'B2_LOCAL_STANDIN', False):
+    # Presigned URLs resolve here instead of the bucket (storage_app/local_b2.py)
+    from .local_b2 import serve_object
+    urlpatterns.append(path('local-b2/<str:bucket>/<path:key>', serve_object, name='local_b2_object'))
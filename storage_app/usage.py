@@ -0,0 +1,125 @@
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.utils import timezone
+
+from .b2_client import get_s3_client
+from .models import File, StorageUsage
+from .thumbnails import is_thumbnail_key
+
+# Prefix rows group keys by their first path segment below AWS_LOCATION,
+# i.e. one row per user directory ("media/user_7"). Thumbnails are left out
+# on both sides: they are rewritten in place, so no delta could track them.
+PREFIX_DEPTH = len([part for part in getattr(settings, 'AWS_LOCATION', '').split('/') if part]) + 1
+
+
+def usage_prefix(key):
+    return '/'.join(key.split('/')[:PREFIX_DEPTH])
+
+
+def _bump(scope, key, size, count):
+    changes = {
+        'bytes': F('bytes') + size,
+        'object_count': F('object_count') + count,
+        'updated_at': timezone.now(),
+    }
+    if StorageUsage.objects.filter(scope=scope, key=key).update(**changes):
+        return
+    try:
+        with transaction.atomic():
+            StorageUsage.objects.create(scope=scope, key=key, bytes=size, object_count=count)
+    except IntegrityError:
+        # Created concurrently; add to that row instead
+        StorageUsage.objects.filter(scope=scope, key=key).update(**changes)
+
+
+def record_objects(objects, sign=1):
+    """Add (``sign=1``) or remove (``sign=-1``) stored ``(key, size)`` objects"""
+    by_prefix = defaultdict(lambda: [0, 0])
+    for key, size in objects:
+        if is_thumbnail_key(key):
+            continue
+        totals = by_prefix[usage_prefix(key)]
+        totals[0] += size
+        totals[1] += 1
+    if not by_prefix:
+        return
+
+    for prefix, (size, count) in by_prefix.items():
+        _bump('prefix', prefix, sign * size, sign * count)
+    _bump(
+        'bucket', '',
+        sign * sum(size for size, _ in by_prefix.values()),
+        sign * sum(count for _, count in by_prefix.values()),
+    )
+
+
+def record_user_files(user_id, size, count=1):
+    """Adjust the totals of files owned by ``user_id`` (negative to remove)"""
+    _bump('user', str(user_id), size, count)
+
+
+def get_usage(scope='bucket', key=''):
+    """The ledger row for ``scope``/``key``, or None if nothing was recorded yet"""
+    return StorageUsage.objects.filter(scope=scope, key=str(key)).first()
+
+
+def reconcile_usage(dry_run=False):
+    """
+    Recount every ledger row from one streamed bucket listing and one grouped
+    File query, fixing any drift. Returns ``{(scope, key): (recorded, actual)}``
+    with ``(bytes, object_count)`` pairs for the rows that were off.
+    Rows that an upload or purge changed while the listing ran are left for
+    the next run rather than overwritten.
+    """
+    # Read before counting: any delta recorded from here on changes a row,
+    # which makes the guarded writes below skip it
+    recorded = {(row.scope, row.key): row for row in StorageUsage.objects.all()}
+
+    actual = defaultdict(lambda: [0, 0])
+    actual[('bucket', '')] = [0, 0]
+    paginator = get_s3_client().get_paginator('list_objects_v2')
+    for page in paginator.paginate(Bucket=settings.AWS_STORAGE_BUCKET_NAME):
+        for obj in page.get('Contents', []):
+            if is_thumbnail_key(obj['Key']):
+                continue
+            for row_key in (('prefix', usage_prefix(obj['Key'])), ('bucket', '')):
+                actual[row_key][0] += obj['Size']
+                actual[row_key][1] += 1
+
+    owners = File.objects.order_by().values('owner_id').annotate(total=Sum('size'), count=Count('pk'))
+    for owner in owners:
+        actual[('user', str(owner['owner_id']))] = [owner['total'] or 0, owner['count']]
+
+    drift = {}
+    for row_key in set(actual) | set(recorded):
+        row = recorded.get(row_key)
+        was = (row.bytes, row.object_count) if row else (0, 0)
+        now = tuple(actual.get(row_key, (0, 0)))
+        if was != now:
+            drift[row_key] = (was, now)
+
+    if not dry_run:
+        reconciled_at = timezone.now()
+        for row_key in set(actual) | set(recorded):
+            row = recorded.get(row_key)
+            size, count = actual.get(row_key, (0, 0))
+            if row is None:
+                try:
+                    with transaction.atomic():
+                        StorageUsage.objects.create(
+                            scope=row_key[0], key=row_key[1],
+                            bytes=size, object_count=count, reconciled_at=reconciled_at,
+                        )
+                except IntegrityError:
+                    # Created by a delta meanwhile; the next run checks it
+                    pass
+                continue
+            unchanged = StorageUsage.objects.filter(pk=row.pk, bytes=row.bytes, object_count=row.object_count)
+            if row_key in actual:
+                unchanged.update(bytes=size, object_count=count, reconciled_at=reconciled_at)
+            else:
+                unchanged.delete()
+    return drift
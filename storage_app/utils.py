@@ -1,10 +1,10 @@
-import boto3
 from django.conf import settings
 from django.core.mail import send_mail
 from django.template.loader import render_to_string
 from django.utils.html import strip_tags
 from django.contrib.auth.models import User
 from .models import UserProfile, StoragePlan
+from .usage import get_usage
 import logging
 
 # Set up logger
@@ -13,28 +13,19 @@ logger = logging.getLogger(__name__)
 def check_storage_usage():
     """Check current storage usage to avoid surprise costs"""
     try:
-        client = boto3.client(
-            's3',
-            endpoint_url=settings.AWS_S3_ENDPOINT_URL,
-            aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
-            aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY
-        )
-        
-        # Calculate total storage used
-        paginator = client.get_paginator('list_objects_v2')
-        total_size = 0
-        file_count = 0
-        
-        for page in paginator.paginate(Bucket=settings.AWS_STORAGE_BUCKET_NAME):
-            if 'Contents' in page:
-                for obj in page['Contents']:
-                    total_size += obj['Size']
-                    file_count += 1
+        # Kept current by uploads and deletes (and corrected by reconcile_usage),
+        # so this never lists the bucket
+        usage = get_usage('bucket')
+        if usage is None:
+            logger.warning("No storage usage recorded yet; run manage.py reconcile_usage")
+        total_size = usage.bytes if usage else 0
+        file_count = usage.object_count if usage else 0
         
         result = {
             'total_size_gb': total_size / (1024 ** 3),
             'file_count': file_count,
-            'free_tier_remaining': max(0, 10 - (total_size / (1024 ** 3)))  # 10GB free
+            'free_tier_remaining': max(0, 10 - (total_size / (1024 ** 3))),  # 10GB free
+            'reconciled_at': usage.reconciled_at if usage else None,
         }
         
         logger.info(f"Storage usage checked: {result}")
@@ -45,7 +36,8 @@ def check_storage_usage():
         return {
             'total_size_gb': 0,
             'file_count': 0,
-            'free_tier_remaining': 10
+            'free_tier_remaining': 10,
+            'reconciled_at': None,
         }
 
 def send_welcome_email(user):
@@ -1,20 +1,45 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth import login, logout, authenticate
 from django.contrib.auth.decorators import login_required
-from django.http import JsonResponse, HttpResponse, Http404
+from django.views.decorators.http import condition, require_POST
+from django.views.decorators.csrf import csrf_exempt, csrf_protect
+from django.http import JsonResponse, HttpResponse, Http404, StreamingHttpResponse
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.http import content_disposition_header
+from django.db import transaction
 from django.db.models import Sum, Q 
 from django.utils import timezone
+import hashlib
 import os
+import time
+import uuid
+from botocore.exceptions import ClientError
+from django.core import signing
 from .models import File, UserProfile, ShareLink, StoragePlan, Folder, Subscription, Trash
+from .models import MultipartUpload, MultipartUploadPart, cloud_storage, new_object_name, upload_display_name
 from .forms import CustomUserCreationForm, FileUploadForm, FileShareForm, FolderCreateForm, MoveFileForm
 
 from django.urls import reverse  
-from datetime import datetime  
+from datetime import datetime, timezone as dt_timezone
 import stripe  
 from django.conf import settings
 import json
 
 from .utils import send_welcome_email, send_subscription_email, send_payment_success_email
+from .presign import PRESIGN_WINDOW_SECONDS, presign, presigned_get_url
+from .b2_client import get_s3_client
+from .upload_handlers import B2StreamedFile, B2StreamingUploadHandler
+from .purge import purge_files, trashed_files
+from .blobs import ContentMismatch, find_claimable_blob, hash_file, register_blob, verified_upload_hash
+from .thumbnails import schedule_thumbnails
+from .archive import collect_folder_files, stream_zip
+from .usage import record_objects, record_user_files
+from .read_cache import read_cache, serve_cached
+from .resilience import health as storage_health_snapshot
+from .facets import ALL_FOLDERS, facet_counts, invalidate_facets
+from .file_types import CATEGORIES, categorize, preview_category
+from .folder_stats import record_files, record_move, record_subfolder
+from .quota import QuotaExceeded, charge
 
 from django.db import models
 
@@ -23,6 +48,29 @@ from .forms import TaskCreateForm, TaskEditForm
 
 from django.utils import timezone
 
+# Upper bound on file ids accepted by batch_presign
+BATCH_PRESIGN_MAX_FILES = getattr(settings, 'BATCH_PRESIGN_MAX_FILES', 200)
+
+# Lifetime of presigned upload URLs and their completion tokens (seconds)
+DIRECT_UPLOAD_EXPIRES = getattr(settings, 'DIRECT_UPLOAD_EXPIRES', 3600)
+DIRECT_UPLOAD_SALT = 'storage_app.direct_upload'
+
+# Preferred part size for resumable multipart uploads (bytes)
+MULTIPART_PART_SIZE = getattr(settings, 'MULTIPART_PART_SIZE', 16 * 1024 * 1024)
+
+# Upper bound on files packed into one ZIP download
+ZIP_MAX_FILES = getattr(settings, 'ZIP_MAX_FILES', 10000)
+
+# Files purged per empty_trash request; the page keeps posting until done
+EMPTY_TRASH_MAX_FILES = getattr(settings, 'EMPTY_TRASH_MAX_FILES', 5000)
+
+# Slack allowed for multipart/form-data framing when pre-checking the quota
+UPLOAD_FRAMING_ALLOWANCE = 64 * 1024
+
+# How long browsers and shared caches may reuse public and share pages
+# (capped further by the presigned URLs they embed and link expiry)
+PUBLIC_PAGE_MAX_AGE = getattr(settings, 'PUBLIC_PAGE_MAX_AGE', 300)
+
 def register_view(request):
     if request.method == 'POST':
         form = CustomUserCreationForm(request.POST)
@@ -76,19 +124,18 @@ def dashboard(request):
             name="Free",
             defaults={'max_storage_size': 500 * 1024 * 1024, 'price': 0}
         )[0]
+        # Start the quota ledger from whatever the user already stores
         user_profile = UserProfile.objects.create(
             user=request.user,
             storage_plan=free_plan,
-            used_storage=0
+            used_storage=File.objects.filter(owner=request.user).aggregate(Sum('size'))['size__sum'] or 0
         )
     
     files = File.objects.filter(owner=request.user, is_deleted=False).order_by('-uploaded_at')
     total_files = files.count()
-    
-    # Calculate storage usage
-    total_size = files.aggregate(Sum('size'))['size__sum'] or 0
-    user_profile.used_storage = total_size
-    user_profile.save()
+
+    # The quota ledger kept current by uploads and purges, trash included
+    total_size = user_profile.used_storage
     
     # Get view preference from session or default to 'grid'
     view_mode = request.session.get('dashboard_view_mode', 'grid')
@@ -113,49 +160,30 @@ def toggle_dashboard_view(request):
         return JsonResponse({'success': True, 'view_mode': new_view})
     return JsonResponse({'success': False, 'error': 'Invalid request method'})
 
-@login_required
-def upload_file(request):
-    if request.method == 'POST':
-        form = FileUploadForm(request.POST, request.FILES)
-        if form.is_valid():
-            file_obj = form.save(commit=False)
-            file_obj.owner = request.user
-            file_obj.size = file_obj.file.size
-            file_obj.name = file_obj.file.name
-            file_obj.file_type = os.path.splitext(file_obj.file.name)[1].lower()
-            
-            # Check storage limit
-            user_profile = UserProfile.objects.get(user=request.user)
-            if user_profile.used_storage + file_obj.size > user_profile.storage_plan.max_storage_size:
-                return JsonResponse({
-                    'success': False,
-                    'error': 'Storage limit exceeded'
-                })
-            
-            file_obj.save()
-            return JsonResponse({'success': True})
-        else:
-            return JsonResponse({'success': False, 'error': 'Invalid file'})
-    return JsonResponse({'success': False, 'error': 'Invalid request'})
-
 @login_required
 def delete_file(request, file_id):
     """Move file to trash instead of permanent deletion"""
     if request.method == 'POST':
         try:
-            file_obj = get_object_or_404(File, id=file_id, owner=request.user)
-            
-            # Create trash record
-            Trash.objects.create(
-                user=request.user,
-                file=file_obj,
-                original_folder=file_obj.folder,
-                scheduled_permanent_deletion=timezone.now() + timezone.timedelta(days=30)
-            )
-            
-            # Mark file as deleted
-            file_obj.is_deleted = True
-            file_obj.save()
+            # The row is locked so the folder counters change with it, once
+            with transaction.atomic():
+                file_obj = get_object_or_404(File.objects.select_for_update(), id=file_id, owner=request.user)
+
+                # Create trash record
+                Trash.objects.create(
+                    user=request.user,
+                    file=file_obj,
+                    original_folder=file_obj.folder,
+                    scheduled_permanent_deletion=timezone.now() + timezone.timedelta(days=30)
+                )
+
+                # Mark file as deleted
+                was_deleted = file_obj.is_deleted
+                file_obj.is_deleted = True
+                file_obj.save()
+                if not was_deleted:
+                    record_files(file_obj.folder_id, -1, -file_obj.size)
+            invalidate_facets(request.user.pk)
             
             return JsonResponse({
                 'success': True,
@@ -169,49 +197,12 @@ def delete_file(request, file_id):
 
 @login_required
 def download_file(request, file_id):
-    """Generate a fresh signed URL for downloading a file"""
+    """Redirect to a signed URL for downloading a file"""
     try:
         file_obj = get_object_or_404(File, id=file_id, owner=request.user)
         
-        # Generate a fresh signed URL
-        from django.conf import settings
-        import boto3
-        from botocore.client import Config
-        
-        s3_client = boto3.client(
-            's3',
-            endpoint_url=settings.AWS_S3_ENDPOINT_URL,
-            aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
-            aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
-            config=Config(signature_version='s3v4')
-        )
-        
-        # Find the correct file key in Backblaze
-        file_key = file_obj.file.name
-        possible_keys = [
-            file_key,  # Original key from database
-            f"media/{file_key}",  # With media/ prefix
-        ]
-        
-        actual_key = file_key
-        for test_key in possible_keys:
-            try:
-                s3_client.head_object(Bucket=settings.AWS_STORAGE_BUCKET_NAME, Key=test_key)
-                actual_key = test_key
-                break
-            except:
-                continue
-        
-        # Generate presigned URL valid for 1 hour that forces download
-        presigned_url = s3_client.generate_presigned_url(
-            'get_object',
-            Params={
-                'Bucket': settings.AWS_STORAGE_BUCKET_NAME,
-                'Key': actual_key,
-                'ResponseContentDisposition': f'attachment; filename="{file_obj.name}"'  # This forces download
-            },
-            ExpiresIn=3600  # 1 hour in seconds
-        )
+        # Signed URL, reused for every request in the same time window
+        presigned_url = presigned_get_url(file_obj.storage_key, 'attachment', file_obj.name)
         
         # Redirect to the fresh signed URL
         return redirect(presigned_url)
@@ -219,6 +210,38 @@ def download_file(request, file_id):
     except Exception as e:
         return JsonResponse({'success': False, 'error': str(e)})
 
+@login_required
+@require_POST
+def batch_presign(request):
+    """Return download and inline presigned URLs for many files in one request"""
+    try:
+        payload = json.loads(request.body or '{}')
+        file_ids = [str(uuid.UUID(str(file_id))) for file_id in payload.get('file_ids', [])]
+    except (ValueError, TypeError, AttributeError):
+        return JsonResponse({'success': False, 'error': 'Invalid file ids'}, status=400)
+
+    if len(file_ids) > BATCH_PRESIGN_MAX_FILES:
+        return JsonResponse({
+            'success': False,
+            'error': f'At most {BATCH_PRESIGN_MAX_FILES} files per request'
+        }, status=400)
+
+    # Ownership is checked for the whole batch in a single query
+    files = File.objects.filter(owner=request.user, id__in=file_ids).only('id', 'name', 'file', 'object_key')
+
+    urls = {}
+    for file_obj in files:
+        urls[str(file_obj.id)] = {
+            'download': presigned_get_url(file_obj.storage_key, 'attachment', file_obj.name),
+            'inline': presigned_get_url(file_obj.storage_key, 'inline'),
+        }
+
+    return JsonResponse({
+        'success': True,
+        'urls': urls,
+        'missing': [file_id for file_id in file_ids if file_id not in urls],
+    })
+
 @login_required
 def create_share_link(request, file_id):
     """Create a shareable link for a file - POST only"""
@@ -249,67 +272,104 @@ def create_share_link(request, file_id):
     
     return JsonResponse({'success': False, 'error': 'Invalid request method'})
 
+def _presign_window():
+    return int(time.time()) // PRESIGN_WINDOW_SECONDS * PRESIGN_WINDOW_SECONDS
+
+
+def _page_etag(*parts):
+    # Pages embed presigned URLs, so the window they were signed in is part
+    # of the page's identity
+    data = '|'.join(str(part) for part in (*parts, _presign_window()))
+    return hashlib.sha256(data.encode('utf-8')).hexdigest()
+
+
+def _page_viewer(request):
+    """Who the page is rendered for; base.html shows the signed-in username"""
+    return request.user.pk if request.user.is_authenticated else None
+
+
+def _page_last_modified(request, *timestamps):
+    # A date cannot tell viewers apart, so signed-in users revalidate by
+    # ETag alone (which includes them)
+    if request.user.is_authenticated:
+        return None
+    window_start = datetime.fromtimestamp(_presign_window(), dt_timezone.utc)
+    return max([window_start, *[ts for ts in timestamps if ts]])
+
+
+def _cache_page(response, request, expires_at=None):
+    """Let browsers and proxies reuse a public/share page while its links stay valid"""
+    max_age = min(PUBLIC_PAGE_MAX_AGE, _presign_window() + 2 * PRESIGN_WINDOW_SECONDS - int(time.time()))
+    if expires_at:
+        max_age = min(max_age, int((expires_at - timezone.now()).total_seconds()))
+    if request.user.is_authenticated:
+        patch_cache_control(response, private=True, max_age=max(max_age, 0))
+    else:
+        patch_cache_control(response, public=True, max_age=max(max_age, 0))
+    patch_vary_headers(response, ['Cookie'])
+    return response
+
+
+def _shared_page_link(request, token):
+    """The live share link for ``token`` (memoized on the request), or None"""
+    if not hasattr(request, '_share_link'):
+        share_link = (
+            ShareLink.objects.select_related('file', 'file__owner').filter(token=token, is_active=True).first()
+        )
+        if share_link and share_link.expires_at and share_link.expires_at < timezone.now():
+            share_link = None
+        request._share_link = share_link
+    return request._share_link
+
+
+def _share_page_etag(request, token):
+    share_link = _shared_page_link(request, token)
+    if share_link is None:
+        return None
+    file_obj = share_link.file
+    return _page_etag(
+        file_obj.id, file_obj.name, file_obj.size, file_obj.uploaded_at.timestamp(),
+        share_link.pk, share_link.expires_at, _page_viewer(request), read_cache is not None,
+    )
+
+
+def _share_page_last_modified(request, token):
+    share_link = _shared_page_link(request, token)
+    if share_link is None:
+        return None
+    return _page_last_modified(request, share_link.file.uploaded_at, share_link.created_at)
+
+
+@condition(etag_func=_share_page_etag, last_modified_func=_share_page_last_modified)
 def share_file(request, token):
     """View to handle shared file access - GET only"""
     try:
-        # Get the share link
-        share_link = get_object_or_404(ShareLink, token=token, is_active=True)
-        
-        # Check if link has expired
-        if share_link.expires_at and share_link.expires_at < timezone.now():
+        share_link = _shared_page_link(request, token)
+        if share_link is None:
+            # Get the share link
+            share_link = get_object_or_404(ShareLink, token=token, is_active=True)
+            
+            # Only an expired link gets here
             return render(request, 'share_expired.html', {
                 'error': 'This share link has expired'
             })
         
         file_obj = share_link.file
         
-        # Generate a fresh signed URL that's valid for a short time
-        from django.conf import settings
-        import boto3
-        from botocore.client import Config
-        
-        # Create a presigned URL that's valid for 1 hour
-        s3_client = boto3.client(
-            's3',
-            endpoint_url=settings.AWS_S3_ENDPOINT_URL,
-            aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
-            aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
-            config=Config(signature_version='s3v4')
-        )
-        
-        # Find the correct file key in Backblaze
-        file_key = file_obj.file.name
-        possible_keys = [
-            file_key,  # Original key from database
-            f"media/{file_key}",  # With media/ prefix
-        ]
-        
-        actual_key = file_key
-        for test_key in possible_keys:
-            try:
-                s3_client.head_object(Bucket=settings.AWS_STORAGE_BUCKET_NAME, Key=test_key)
-                actual_key = test_key
-                break
-            except:
-                continue
-        
-        # Generate presigned URL valid for 1 hour that forces download
-        presigned_url = s3_client.generate_presigned_url(
-            'get_object',
-            Params={
-                'Bucket': settings.AWS_STORAGE_BUCKET_NAME,
-                'Key': actual_key,
-                'ResponseContentDisposition': f'attachment; filename="{file_obj.name}"'  # This forces download
-            },
-            ExpiresIn=3600  # 1 hour in seconds
-        )
+        if read_cache is not None:
+            # Downloads go through the local read cache
+            presigned_url = reverse('share_download', args=[share_link.token])
+        else:
+            # Signed URL, reused for every request in the same time window
+            presigned_url = presigned_get_url(file_obj.storage_key, 'attachment', file_obj.name)
         
         # Render the share page with the fresh presigned URL
-        return render(request, 'share_file.html', {
+        response = render(request, 'share_file.html', {
             'file': file_obj,
             'share_link': share_link,
             'download_url': presigned_url
         })
+        return _cache_page(response, request, share_link.expires_at)
         
     except Http404:
         return render(request, 'share_error.html', {
@@ -320,6 +380,15 @@ def share_file(request, token):
             'error': f'Error accessing file: {str(e)}'
         })
 
+def share_download(request, token):
+    """Download a shared file, from the read cache when it is enabled"""
+    share_link = get_object_or_404(ShareLink.objects.select_related('file'), token=token, is_active=True)
+    if share_link.expires_at and share_link.expires_at < timezone.now():
+        raise Http404('Share link expired')
+
+    file_obj = share_link.file
+    return serve_cached(file_obj) or redirect(presigned_get_url(file_obj.storage_key, 'attachment', file_obj.name))
+
 @login_required
 def file_list(request, folder_id=None):
     """File list with folder support and enhanced filtering"""
@@ -327,23 +396,12 @@ def file_list(request, folder_id=None):
     if folder_id:
         current_folder = get_object_or_404(Folder, id=folder_id, owner=request.user)
     
-    # Get base queryset
+    # Get base queryset, with the file type, date and starred filters applied
     files = File.objects.filter(owner=request.user, folder=current_folder, is_deleted=False)
-    
-    # Apply file type filter
+    files = filter_listed_files(files, request.GET)
     file_type_filter = request.GET.get('file_type', '')
-    if file_type_filter:
-        files = filter_files_by_type(files, file_type_filter)
-    
-    # Apply date filter
     date_filter = request.GET.get('date_filter', '')
-    if date_filter:
-        files = filter_files_by_date(files, date_filter)
-    
-    # Apply starred filter
     starred_filter = request.GET.get('starred', '')
-    if starred_filter == 'true':
-        files = files.filter(is_starred=True)
     
     # Order files
     files = files.order_by('-uploaded_at')
@@ -358,7 +416,7 @@ def file_list(request, folder_id=None):
     folder_form = FolderCreateForm()
     
     # Get filter counts for UI
-    filter_counts = get_filter_counts(File.objects.filter(owner=request.user, folder=current_folder))
+    filter_counts = facet_counts(request.user, current_folder)
     
     context = {
         'files': files,
@@ -373,30 +431,26 @@ def file_list(request, folder_id=None):
     }
     return render(request, 'file_list.html', context)
 
+def filter_listed_files(files_queryset, params):
+    """Apply file_list's file_type, date_filter and starred filters from ``params``"""
+    file_type_filter = params.get('file_type', '')
+    if file_type_filter:
+        files_queryset = filter_files_by_type(files_queryset, file_type_filter)
+    date_filter = params.get('date_filter', '')
+    if date_filter:
+        files_queryset = filter_files_by_date(files_queryset, date_filter)
+    if params.get('starred', '') == 'true':
+        files_queryset = files_queryset.filter(is_starred=True)
+    return files_queryset
+
 def filter_files_by_type(files_queryset, file_type):
     """Filter files by file type category"""
-    file_type_groups = {
-        'image': ['.jpg', '.jpeg', '.png', '.gif', '.bmp', '.svg', '.webp'],
-        'document': ['.doc', '.docx', '.txt', '.rtf', '.odt'],
-        'pdf': ['.pdf'],
-        'spreadsheet': ['.xls', '.xlsx', '.csv', '.ods'],
-        'presentation': ['.ppt', '.pptx', '.odp'],
-        'video': ['.mp4', '.avi', '.mov', '.wmv', '.flv', '.webm', '.mkv'],
-        'audio': ['.mp3', '.wav', '.ogg', '.m4a', '.flac'],
-        'archive': ['.zip', '.rar', '.7z', '.tar', '.gz'],
-        'code': ['.html', '.css', '.js', '.py', '.java', '.cpp', '.c', '.php', '.xml', '.json'],
-    }
-    
-    if file_type in file_type_groups:
-        extensions = file_type_groups[file_type]
-        query = models.Q()
-        for ext in extensions:
-            query |= models.Q(file_type__iexact=ext)
-        return files_queryset.filter(query)
+    if file_type in CATEGORIES:
+        return files_queryset.filter(category=file_type)
     
-    # If specific extension is provided
+    # If specific extension is provided (stored lower case)
     elif file_type.startswith('.'):
-        return files_queryset.filter(file_type__iexact=file_type)
+        return files_queryset.filter(file_type=file_type.lower())
     
     return files_queryset
 
@@ -425,66 +479,6 @@ def filter_files_by_date(files_queryset, date_filter):
     
     return files_queryset
 
-def get_filter_counts(files_queryset):
-    """Get counts for each filter category"""
-    from django.db.models import Count
-    from django.utils import timezone
-    from datetime import timedelta
-    
-    now = timezone.now()
-    
-    # Date filter counts
-    today_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
-    week_start = now - timedelta(days=7)
-    month_start = now - timedelta(days=30)
-    year_start = now - timedelta(days=365)
-    
-    date_counts = {
-        'today': files_queryset.filter(uploaded_at__gte=today_start).count(),
-        'week': files_queryset.filter(uploaded_at__gte=week_start).count(),
-        'month': files_queryset.filter(uploaded_at__gte=month_start).count(),
-        'year': files_queryset.filter(uploaded_at__gte=year_start).count(),
-        'all': files_queryset.count(),
-    }
-    
-    # File type counts
-    file_type_groups = {
-        'image': ['.jpg', '.jpeg', '.png', '.gif', '.bmp', '.svg', '.webp'],
-        'document': ['.doc', '.docx', '.txt', '.rtf', '.odt'],
-        'pdf': ['.pdf'],
-        'spreadsheet': ['.xls', '.xlsx', '.csv', '.ods'],
-        'presentation': ['.ppt', '.pptx', '.odp'],
-        'video': ['.mp4', '.avi', '.mov', '.wmv', '.flv', '.webm', '.mkv'],
-        'audio': ['.mp3', '.wav', '.ogg', '.m4a', '.flac'],
-        'archive': ['.zip', '.rar', '.7z', '.tar', '.gz'],
-        'code': ['.html', '.css', '.js', '.py', '.java', '.cpp', '.c', '.php', '.xml', '.json'],
-    }
-    
-    file_type_counts = {}
-    for file_type, extensions in file_type_groups.items():
-        query = models.Q()
-        for ext in extensions:
-            query |= models.Q(file_type__iexact=ext)
-        file_type_counts[file_type] = files_queryset.filter(query).count()
-    
-    # Count for "other" file types
-    all_extensions = []
-    for extensions in file_type_groups.values():
-        all_extensions.extend(extensions)
-    
-    file_type_counts['other'] = files_queryset.exclude(
-        file_type__in=all_extensions
-    ).count()
-    
-    # Starred count
-    starred_count = files_queryset.filter(is_starred=True).count()
-    
-    return {
-        'date': date_counts,
-        'file_type': file_type_counts,
-        'starred': starred_count,  # Add starred count
-    }
-
 @login_required
 def create_folder(request):
     """Create a new folder"""
@@ -493,7 +487,9 @@ def create_folder(request):
         if form.is_valid():
             folder = form.save(commit=False)
             folder.owner = request.user
-            folder.save()
+            with transaction.atomic():
+                folder.save()
+                record_subfolder(folder.parent_folder_id, 1)
             return JsonResponse({'success': True, 'folder_id': folder.id, 'folder_name': folder.name})
         else:
             return JsonResponse({'success': False, 'error': form.errors})
@@ -508,8 +504,13 @@ def move_file(request, file_id):
         
         if form.is_valid():
             folder = form.cleaned_data['folder']
-            file_obj.folder = folder
-            file_obj.save()
+            with transaction.atomic():
+                file_obj = File.objects.select_for_update().get(pk=file_obj.pk)
+                old_folder_id = file_obj.folder_id
+                file_obj.folder = folder
+                file_obj.save()
+                record_move(file_obj, old_folder_id)
+            invalidate_facets(request.user.pk)
             return JsonResponse({'success': True})
         else:
             return JsonResponse({'success': False, 'error': form.errors})
@@ -528,7 +529,9 @@ def delete_folder(request, folder_id):
                 'error': 'Folder is not empty. Please delete all files and subfolders first.'
             })
         
-        folder.delete()
+        with transaction.atomic():
+            folder.delete()
+            record_subfolder(folder.parent_folder_id, -1)
         return JsonResponse({'success': True})
     return JsonResponse({'success': False, 'error': 'Invalid request'})
 
@@ -552,60 +555,53 @@ def toggle_file_visibility(request, file_id):
     
     return JsonResponse({'success': False, 'error': 'Invalid request method'})
 
+def _public_page_file(request, file_id):
+    """The public file ``file_id`` (memoized on the request), or None"""
+    if not hasattr(request, '_public_file'):
+        request._public_file = File.objects.select_related('owner').filter(id=file_id, is_public=True).first()
+    return request._public_file
+
+
+def _public_page_etag(request, file_id):
+    file_obj = _public_page_file(request, file_id)
+    if file_obj is None:
+        return None
+    return _page_etag(
+        file_obj.id, file_obj.name, file_obj.size, file_obj.uploaded_at.timestamp(),
+        file_obj.is_public, _page_viewer(request), read_cache is not None,
+    )
+
+
+def _public_page_last_modified(request, file_id):
+    file_obj = _public_page_file(request, file_id)
+    return _page_last_modified(request, file_obj.uploaded_at) if file_obj else None
+
+
+@condition(etag_func=_public_page_etag, last_modified_func=_public_page_last_modified)
 def public_file_access(request, file_id):
     """Direct access to public files without authentication"""
     try:
-        file_obj = get_object_or_404(File, id=file_id, is_public=True)
-        
-        # Generate a fresh signed URL for public access
-        from django.conf import settings
-        import boto3
-        from botocore.client import Config
-        
-        s3_client = boto3.client(
-            's3',
-            endpoint_url=settings.AWS_S3_ENDPOINT_URL,
-            aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
-            aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
-            config=Config(signature_version='s3v4')
-        )
-        
-        # Find the correct file key
-        file_key = file_obj.file.name
-        possible_keys = [
-            file_key,
-            f"media/{file_key}",
-        ]
+        file_obj = _public_page_file(request, file_id)
+        if file_obj is None:
+            raise Http404('File is not public')
         
-        actual_key = file_key
-        for test_key in possible_keys:
-            try:
-                s3_client.head_object(Bucket=settings.AWS_STORAGE_BUCKET_NAME, Key=test_key)
-                actual_key = test_key
-                break
-            except:
-                continue
-        
-        # Generate presigned URL valid for 1 hour
-        presigned_url = s3_client.generate_presigned_url(
-            'get_object',
-            Params={
-                'Bucket': settings.AWS_STORAGE_BUCKET_NAME,
-                'Key': actual_key,
-                'ResponseContentDisposition': f'attachment; filename="{file_obj.name}"'
-            },
-            ExpiresIn=3600
-        )
+        if read_cache is not None:
+            # Downloads go through the local read cache
+            presigned_url = reverse('public_file_download', args=[file_obj.id])
+        else:
+            # Signed URL for public access, reused within the time window
+            presigned_url = presigned_get_url(file_obj.storage_key, 'attachment', file_obj.name)
         
         # Get public URL for sharing
         public_url = request.build_absolute_uri(f'/public/file/{file_obj.id}/')
         
         # Render a simple public file page
-        return render(request, 'public_file.html', {
+        response = render(request, 'public_file.html', {
             'file': file_obj,
             'download_url': presigned_url,
             'public_url': public_url
         })
+        return _cache_page(response, request)
         
     except Http404:
         return render(request, 'public_file_error.html', {
@@ -617,8 +613,18 @@ def public_file_access(request, file_id):
         })
     
 
-from django.views.decorators.csrf import csrf_exempt
-from django.views.decorators.http import require_POST
+def public_file_download(request, file_id):
+    """Download a public file, from the read cache when it is enabled"""
+    file_obj = get_object_or_404(File, id=file_id, is_public=True)
+    return serve_cached(file_obj) or redirect(presigned_get_url(file_obj.storage_key, 'attachment', file_obj.name))
+
+@login_required
+def storage_health(request):
+    """Circuit breaker state and B2 latency histograms for this worker (staff only)"""
+    if not request.user.is_staff:
+        raise Http404()
+    return JsonResponse({'success': True, **storage_health_snapshot()})
+
 
 # Initialize Stripe
 stripe.api_key = settings.STRIPE_SECRET_KEY
@@ -1026,36 +1032,520 @@ def handle_subscription_deleted(subscription):
         pass
 
 # Update your existing upload_file view to use the new storage check
+@csrf_exempt
 @login_required
 def upload_file(request):
+    # The streaming handler has to be installed before the body is parsed,
+    # so CSRF is checked by _upload_file (csrf_protect) once it is in place
+    if request.method != 'POST':
+        return _upload_file(request)
+
+    user_profile = UserProfile.objects.get(user=request.user)
+
+    # Refuse obviously oversized uploads before any bytes reach B2
+    # (multipart framing adds a little on top of the file itself)
+    content_length = int(request.META.get('CONTENT_LENGTH') or 0)
+    if not user_profile.can_upload_file(max(0, content_length - UPLOAD_FRAMING_ALLOWANCE)):
+        return JsonResponse({
+            'success': False,
+            'error': f'Storage limit exceeded. Upgrade your plan to upload more files.'
+        })
+
+    handler = B2StreamingUploadHandler(request)
+    request.upload_handlers.insert(0, handler)
+    try:
+        response = _upload_file(request)
+    except Exception:
+        # Django skips the handler's own hooks when parsing fails part-way
+        handler.discard()
+        raise
+    if response.status_code == 403:
+        # Rejected by the CSRF check, after the body was streamed to B2
+        handler.discard()
+    return response
+
+@csrf_protect
+def _upload_file(request):
     if request.method == 'POST':
         form = FileUploadForm(request.POST, request.FILES)
+        uploaded = request.FILES.get('file')
         if form.is_valid():
-            file_obj = form.save(commit=False)
-            file_obj.owner = request.user
-            file_obj.size = file_obj.file.size
-            file_obj.name = file_obj.file.name
-            file_obj.file_type = os.path.splitext(file_obj.file.name)[1].lower()
-            
             # Check storage limit using new method
             user_profile = UserProfile.objects.get(user=request.user)
-            if not user_profile.can_upload_file(file_obj.size):
+            if not user_profile.can_upload_file(uploaded.size):
+                discard_streamed_upload(uploaded)
                 return JsonResponse({
                     'success': False,
                     'error': f'Storage limit exceeded. Upgrade your plan to upload more files.'
                 })
-            
-            file_obj.save()
-            
-            # Update used storage
-            user_profile.used_storage += file_obj.size
-            user_profile.save()
-            
+
+            try:
+                store_uploaded_file(request, user_profile, uploaded, form.cleaned_data['is_public'])
+            except QuotaExceeded:
+                discard_streamed_upload(uploaded)
+                return JsonResponse({
+                    'success': False,
+                    'error': 'Storage limit exceeded. Upgrade your plan to upload more files.'
+                })
+            except Exception:
+                # No row references the streamed object
+                discard_streamed_upload(uploaded)
+                raise
             return JsonResponse({'success': True})
         else:
+            discard_streamed_upload(uploaded)
             return JsonResponse({'success': False, 'error': 'Invalid file'})
     return JsonResponse({'success': False, 'error': 'Invalid request'})
 
+def store_uploaded_file(request, user_profile, uploaded, is_public):
+    """Create the File row for a form upload, storing its content unless it is already in B2"""
+    if isinstance(uploaded, B2StreamedFile):
+        # Already in B2, only the row is missing
+        create_uploaded_file(
+            user_profile, uploaded.storage_name, uploaded.object_key,
+            uploaded.name, uploaded.size, is_public,
+            sha256=uploaded.sha256, content_type=uploaded.content_type,
+        )
+        return
+
+    # Content that is already stored only needs a new row
+    sha256 = hash_file(uploaded)
+    with transaction.atomic():
+        blob = find_claimable_blob(sha256, uploaded.size, request.user)
+        if blob is not None:
+            create_uploaded_file(
+                user_profile, blob.storage_name, blob.object_key,
+                uploaded.name, uploaded.size, is_public,
+                sha256=sha256, content_type=uploaded.content_type,
+            )
+            return
+
+    storage_name = cloud_storage.save(new_object_name(request.user, uploaded.name), uploaded)
+    create_uploaded_file(
+        user_profile, storage_name, cloud_storage.object_key(storage_name),
+        uploaded.name, uploaded.size, is_public,
+        sha256=sha256, content_type=uploaded.content_type,
+    )
+
+def discard_streamed_upload(uploaded):
+    """Delete an object that was streamed to B2 for an upload that was then rejected"""
+    if isinstance(uploaded, B2StreamedFile):
+        get_s3_client().delete_object(Bucket=settings.AWS_STORAGE_BUCKET_NAME, Key=uploaded.object_key)
+
+
+@login_required
+@require_POST
+def initiate_direct_upload(request):
+    """Check the quota and hand out a presigned PUT so the browser uploads straight to B2"""
+    try:
+        payload = json.loads(request.body or '{}')
+        filename = str(payload['name'])
+        size = int(payload['size'])
+    except (ValueError, TypeError, KeyError):
+        return JsonResponse({'success': False, 'error': 'Invalid request'}, status=400)
+
+    if not filename or size < 0:
+        return JsonResponse({'success': False, 'error': 'Invalid file'}, status=400)
+
+    user_profile = UserProfile.objects.get(user=request.user)
+    if not user_profile.can_upload_file(size):
+        return JsonResponse({
+            'success': False,
+            'error': 'Storage limit exceeded. Upgrade your plan to upload more files.'
+        })
+
+    storage_name = new_object_name(request.user, filename)
+    object_key = File._meta.get_field('file').storage.object_key(storage_name)
+
+    # The completion step trusts only what is inside this signed token
+    token = signing.dumps({
+        'user': request.user.id,
+        'name': upload_display_name(filename),
+        'storage_name': storage_name,
+        'size': size,
+        'is_public': bool(payload.get('is_public')),
+        'content_type': str(payload.get('type') or ''),
+    }, salt=DIRECT_UPLOAD_SALT)
+
+    return JsonResponse({
+        'success': True,
+        'method': 'PUT',
+        'upload_url': presign('PUT', object_key, expires_in=DIRECT_UPLOAD_EXPIRES),
+        'token': token,
+    })
+
+@login_required
+@require_POST
+def complete_direct_upload(request):
+    """Verify a direct upload landed in B2 and create its File row"""
+    try:
+        payload = json.loads(request.body or '{}')
+        upload = signing.loads(payload['token'], salt=DIRECT_UPLOAD_SALT, max_age=DIRECT_UPLOAD_EXPIRES)
+    except (ValueError, TypeError, KeyError, signing.BadSignature):
+        return JsonResponse({'success': False, 'error': 'Invalid or expired upload token'}, status=400)
+
+    if upload['user'] != request.user.id:
+        return JsonResponse({'success': False, 'error': 'Invalid upload token'}, status=403)
+
+    storage = File._meta.get_field('file').storage
+    object_key = storage.object_key(upload['storage_name'])
+
+    # A retry after the row was created, even if it was deduplicated since
+    existing = File.objects.filter(owner=request.user, upload_key=object_key).first()
+    if existing:
+        return JsonResponse({'success': True, 'file_id': str(existing.id)})
+
+    s3_client = get_s3_client()
+    try:
+        head = s3_client.head_object(Bucket=settings.AWS_STORAGE_BUCKET_NAME, Key=object_key)
+    except ClientError:
+        return JsonResponse({'success': False, 'error': 'Upload not found in storage'}, status=400)
+
+    expected_etag = payload.get('etag')
+    if head['ContentLength'] != upload['size'] or (expected_etag and expected_etag.strip('"') != head['ETag'].strip('"')):
+        s3_client.delete_object(Bucket=settings.AWS_STORAGE_BUCKET_NAME, Key=object_key)
+        return JsonResponse({'success': False, 'error': 'Uploaded file does not match the upload request'}, status=400)
+
+    user_profile = UserProfile.objects.get(user=request.user)
+    if not user_profile.can_upload_file(upload['size']):
+        s3_client.delete_object(Bucket=settings.AWS_STORAGE_BUCKET_NAME, Key=object_key)
+        return JsonResponse({
+            'success': False,
+            'error': 'Storage limit exceeded. Upgrade your plan to upload more files.'
+        })
+
+    # With the browser's hash the content is shared like form uploads are
+    try:
+        sha256 = verified_upload_hash(payload.get('sha256'), object_key, upload['size'])
+    except ContentMismatch:
+        s3_client.delete_object(Bucket=settings.AWS_STORAGE_BUCKET_NAME, Key=object_key)
+        return JsonResponse({'success': False, 'error': 'Uploaded file does not match its checksum'}, status=400)
+
+    try:
+        file_obj = create_uploaded_file(
+            user_profile, upload['storage_name'], object_key, upload['name'], upload['size'], upload['is_public'],
+            sha256=sha256, content_type=upload.get('content_type'),
+        )
+    except QuotaExceeded:
+        return JsonResponse({
+            'success': False,
+            'error': 'Storage limit exceeded. Upgrade your plan to upload more files.'
+        })
+    return JsonResponse({'success': True, 'file_id': str(file_obj.id)})
+
+def create_uploaded_file(user_profile, storage_name, object_key, name, size, is_public, sha256=None,
+                         content_type=None):
+    """
+    Create the File row for an object that is already stored in B2 and
+    charge it to the owner's quota. ``content_type`` is the uploader's
+    claimed type, a hint for the category. With a ``sha256`` the file references
+    the shared blob for that content, and a freshly uploaded duplicate
+    object is deleted again. Raises QuotaExceeded, after deleting the
+    uploaded object, when the file no longer fits the owner's plan.
+    """
+    uploaded_key = object_key
+    stored = True
+    try:
+        with transaction.atomic():
+            blob = None
+            if sha256:
+                blob, created = register_blob(sha256, storage_name, object_key, size)
+                if not created:
+                    # The content was already stored (and counted) before
+                    stored = False
+                    storage_name, object_key = blob.storage_name, blob.object_key
+
+            file_obj = File.objects.create(
+                owner=user_profile.user,
+                file=storage_name,
+                object_key=object_key,
+                upload_key=uploaded_key,
+                blob=blob,
+                name=name,
+                size=size,
+                file_type=os.path.splitext(name)[1].lower(),
+                category=categorize(name, content_type),
+                is_public=is_public,
+            )
+            schedule_thumbnails(file_obj)
+
+            if stored:
+                record_objects([(object_key, size)])
+            record_user_files(user_profile.user_id, size)
+            invalidate_facets(user_profile.user_id)
+            record_files(file_obj.folder_id, 1, size)
+            charge(user_profile.user_id, size)
+    except QuotaExceeded:
+        # A concurrent upload took the space after the view's check. Nothing
+        # references the uploaded object now, unless it was claimed content.
+        if stored or uploaded_key != object_key:
+            get_s3_client().delete_object(Bucket=settings.AWS_STORAGE_BUCKET_NAME, Key=uploaded_key)
+        raise
+
+    if uploaded_key != object_key:
+        get_s3_client().delete_object(Bucket=settings.AWS_STORAGE_BUCKET_NAME, Key=uploaded_key)
+    return file_obj
+
+@login_required
+@require_POST
+def claim_upload(request):
+    """
+    Finish an upload without transferring any bytes when its content is
+    already stored. The browser sends the SHA-256 it computed locally.
+    """
+    try:
+        payload = json.loads(request.body or '{}')
+        sha256 = str(payload['sha256']).lower()
+        size = int(payload['size'])
+        name = upload_display_name(str(payload['name']))
+    except (ValueError, KeyError, TypeError):
+        return JsonResponse({'success': False, 'error': 'Invalid request'}, status=400)
+
+    if len(sha256) != 64 or not name:
+        return JsonResponse({'success': False, 'error': 'Invalid request'}, status=400)
+
+    user_profile = UserProfile.objects.get(user=request.user)
+    if not user_profile.can_upload_file(size):
+        return JsonResponse({
+            'success': False,
+            'error': 'Storage limit exceeded. Upgrade your plan to upload more files.'
+        })
+
+    try:
+        with transaction.atomic():
+            blob = find_claimable_blob(sha256, size, request.user)
+            if blob is None:
+                return JsonResponse({'success': True, 'claimed': False})
+            file_obj = create_uploaded_file(
+                user_profile, blob.storage_name, blob.object_key, name, size,
+                bool(payload.get('is_public')), sha256=sha256, content_type=payload.get('type'),
+            )
+    except QuotaExceeded:
+        return JsonResponse({
+            'success': False,
+            'error': 'Storage limit exceeded. Upgrade your plan to upload more files.'
+        })
+    return JsonResponse({'success': True, 'claimed': True, 'file_id': str(file_obj.id)})
+
+def multipart_part_size(size):
+    """Part size for a multipart upload, respecting B2's 5 MB minimum and 10,000 part limit"""
+    part_size = max(MULTIPART_PART_SIZE, 5 * 1024 * 1024)
+    return max(part_size, -(-size // 10000))
+
+@login_required
+@require_POST
+def create_multipart_upload(request):
+    """Start a resumable multipart upload and return its part layout"""
+    try:
+        payload = json.loads(request.body or '{}')
+        filename = str(payload['name'])
+        size = int(payload['size'])
+    except (ValueError, TypeError, KeyError):
+        return JsonResponse({'success': False, 'error': 'Invalid request'}, status=400)
+
+    if not filename or size <= 0:
+        return JsonResponse({'success': False, 'error': 'Invalid file'}, status=400)
+
+    user_profile = UserProfile.objects.get(user=request.user)
+    if not user_profile.can_upload_file(size):
+        return JsonResponse({
+            'success': False,
+            'error': 'Storage limit exceeded. Upgrade your plan to upload more files.'
+        })
+
+    storage_name = new_object_name(request.user, filename)
+    object_key = File._meta.get_field('file').storage.object_key(storage_name)
+
+    response = get_s3_client().create_multipart_upload(
+        Bucket=settings.AWS_STORAGE_BUCKET_NAME,
+        Key=object_key,
+    )
+    upload = MultipartUpload.objects.create(
+        owner=request.user,
+        upload_id=response['UploadId'],
+        storage_name=storage_name,
+        object_key=object_key,
+        name=upload_display_name(filename),
+        size=size,
+        part_size=multipart_part_size(size),
+        is_public=bool(payload.get('is_public')),
+    )
+
+    return JsonResponse({
+        'success': True,
+        'upload_id': str(upload.id),
+        'part_size': upload.part_size,
+        'part_count': upload.part_count,
+    })
+
+@login_required
+def multipart_upload_part(request, upload_id, part_number):
+    """GET a presigned URL for one part, or POST the ETag of a part once uploaded"""
+    upload = get_object_or_404(MultipartUpload, id=upload_id, owner=request.user, status='pending')
+    if not 1 <= part_number <= upload.part_count:
+        return JsonResponse({'success': False, 'error': 'Invalid part number'}, status=400)
+
+    if request.method == 'POST':
+        try:
+            payload = json.loads(request.body or '{}')
+            etag = str(payload['etag']).strip('"')
+            size = int(payload['size'])
+        except (ValueError, TypeError, KeyError):
+            return JsonResponse({'success': False, 'error': 'Invalid request'}, status=400)
+
+        MultipartUploadPart.objects.update_or_create(
+            upload=upload,
+            part_number=part_number,
+            defaults={'etag': etag, 'size': size},
+        )
+        return JsonResponse({'success': True})
+
+    # Each part gets its own URL, so parts can go up in parallel and be retried alone
+    upload_url = presign(
+        'PUT',
+        upload.object_key,
+        {'partNumber': part_number, 'uploadId': upload.upload_id},
+        expires_in=DIRECT_UPLOAD_EXPIRES,
+    )
+    return JsonResponse({'success': True, 'method': 'PUT', 'upload_url': upload_url})
+
+@login_required
+def multipart_upload_status(request, upload_id):
+    """Parts recorded so far, so a client can resume after a restart"""
+    upload = get_object_or_404(MultipartUpload, id=upload_id, owner=request.user)
+    return JsonResponse({
+        'success': True,
+        'status': upload.status,
+        'name': upload.name,
+        'size': upload.size,
+        'part_size': upload.part_size,
+        'part_count': upload.part_count,
+        'parts': [
+            {'part_number': part.part_number, 'etag': part.etag, 'size': part.size}
+            for part in upload.parts.all()
+        ],
+    })
+
+def sync_multipart_parts(upload):
+    """Refresh the recorded parts from B2, which is authoritative for ETags and sizes"""
+    s3_client = get_s3_client()
+    parts = []
+    marker = 0
+    while True:
+        response = s3_client.list_parts(
+            Bucket=settings.AWS_STORAGE_BUCKET_NAME,
+            Key=upload.object_key,
+            UploadId=upload.upload_id,
+            PartNumberMarker=marker,
+        )
+        parts.extend(response.get('Parts', []))
+        if not response.get('IsTruncated'):
+            break
+        marker = response['NextPartNumberMarker']
+
+    upload.parts.all().delete()
+    MultipartUploadPart.objects.bulk_create([
+        MultipartUploadPart(
+            upload=upload,
+            part_number=part['PartNumber'],
+            etag=part['ETag'].strip('"'),
+            size=part['Size'],
+        )
+        for part in parts
+    ])
+    return parts
+
+@login_required
+@require_POST
+def complete_multipart_upload(request, upload_id):
+    """Assemble the uploaded parts and create the File row"""
+    upload = get_object_or_404(
+        MultipartUpload, id=upload_id, owner=request.user, status__in=['pending', 'completed']
+    )
+    if upload.status == 'completed':
+        # A retry after the first call assembled the object
+        existing = File.objects.filter(owner=request.user, upload_key=upload.object_key).first()
+        if existing is None:
+            return JsonResponse({'success': False, 'error': 'Upload is no longer pending'}, status=400)
+        return JsonResponse({'success': True, 'file_id': str(existing.id)})
+
+    try:
+        parts = sync_multipart_parts(upload)
+    except ClientError as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+
+    uploaded_size = sum(part['Size'] for part in parts)
+    if len(parts) != upload.part_count or uploaded_size != upload.size:
+        missing = sorted(set(range(1, upload.part_count + 1)) - {part['PartNumber'] for part in parts})
+        return JsonResponse({
+            'success': False,
+            'error': 'Upload is incomplete',
+            'missing_parts': missing,
+        }, status=400)
+
+    user_profile = UserProfile.objects.get(user=request.user)
+    if not user_profile.can_upload_file(upload.size):
+        return JsonResponse({
+            'success': False,
+            'error': 'Storage limit exceeded. Upgrade your plan to upload more files.'
+        })
+
+    get_s3_client().complete_multipart_upload(
+        Bucket=settings.AWS_STORAGE_BUCKET_NAME,
+        Key=upload.object_key,
+        UploadId=upload.upload_id,
+        MultipartUpload={
+            'Parts': [{'PartNumber': part['PartNumber'], 'ETag': part['ETag']} for part in parts]
+        },
+    )
+
+    upload.status = 'completed'
+    upload.save()
+
+    try:
+        payload = json.loads(request.body or '{}')
+    except ValueError:
+        payload = {}
+    try:
+        sha256 = verified_upload_hash(payload.get('sha256'), upload.object_key, upload.size)
+    except ContentMismatch:
+        get_s3_client().delete_object(Bucket=settings.AWS_STORAGE_BUCKET_NAME, Key=upload.object_key)
+        upload.status = 'aborted'
+        upload.save()
+        return JsonResponse({'success': False, 'error': 'Uploaded file does not match its checksum'}, status=400)
+
+    try:
+        file_obj = create_uploaded_file(
+            user_profile, upload.storage_name, upload.object_key, upload.name, upload.size, upload.is_public,
+            sha256=sha256,
+        )
+    except QuotaExceeded:
+        return JsonResponse({
+            'success': False,
+            'error': 'Storage limit exceeded. Upgrade your plan to upload more files.'
+        })
+    return JsonResponse({'success': True, 'file_id': str(file_obj.id)})
+
+@login_required
+@require_POST
+def abort_multipart_upload(request, upload_id):
+    """Abort a multipart upload so its parts stop accruing storage"""
+    upload = get_object_or_404(MultipartUpload, id=upload_id, owner=request.user, status='pending')
+    try:
+        get_s3_client().abort_multipart_upload(
+            Bucket=settings.AWS_STORAGE_BUCKET_NAME,
+            Key=upload.object_key,
+            UploadId=upload.upload_id,
+        )
+    except ClientError as e:
+        if e.response.get('Error', {}).get('Code') != 'NoSuchUpload':
+            return JsonResponse({'success': False, 'error': str(e)}, status=400)
+
+    upload.status = 'aborted'
+    upload.save()
+    upload.parts.all().delete()
+    return JsonResponse({'success': True})
+
 
 @login_required
 def debug_plans(request):
@@ -1169,6 +1659,7 @@ def toggle_star_file(request, file_id):
             file_obj = get_object_or_404(File, id=file_id, owner=request.user)
             file_obj.is_starred = not file_obj.is_starred
             file_obj.save()
+            invalidate_facets(request.user.pk)
             
             return JsonResponse({
                 'success': True, 
@@ -1187,7 +1678,7 @@ def starred_files(request):
     folders = Folder.objects.filter(owner=request.user, parent_folder=None).order_by('name')
     
     # Get filter counts for UI
-    filter_counts = get_filter_counts(File.objects.filter(owner=request.user))
+    filter_counts = facet_counts(request.user, ALL_FOLDERS)
     
     context = {
         'files': files,
@@ -1209,61 +1700,11 @@ def preview_file(request, file_id):
     try:
         file_obj = get_object_or_404(File, id=file_id, owner=request.user)
         
-        # Generate a fresh signed URL for preview (inline display)
-        import boto3
-        from botocore.client import Config
-        
-        s3_client = boto3.client(
-            's3',
-            endpoint_url=settings.AWS_S3_ENDPOINT_URL,
-            aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
-            aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
-            config=Config(signature_version='s3v4')
-        )
-        
-        # Find the correct file key
-        file_key = file_obj.file.name
-        possible_keys = [
-            file_key,
-            f"media/{file_key}",
-        ]
-        
-        actual_key = file_key
-        for test_key in possible_keys:
-            try:
-                s3_client.head_object(Bucket=settings.AWS_STORAGE_BUCKET_NAME, Key=test_key)
-                actual_key = test_key
-                break
-            except:
-                continue
-        
-        # Generate presigned URL for inline viewing (not download)
-        presigned_url = s3_client.generate_presigned_url(
-            'get_object',
-            Params={
-                'Bucket': settings.AWS_STORAGE_BUCKET_NAME,
-                'Key': actual_key,
-                'ResponseContentDisposition': 'inline'  # This makes it open in browser
-            },
-            ExpiresIn=3600  # 1 hour
-        )
+        # Signed URL for inline display, reused within the time window
+        presigned_url = presigned_get_url(file_obj.storage_key, 'inline')
         
         # Determine file category for appropriate preview
-        file_type = file_obj.file_type.lower()
-        
-        # Files that can be previewed directly in browser
-        previewable_types = {
-            'image': ['.jpg', '.jpeg', '.png', '.gif', '.bmp', '.svg', '.webp'],
-            'pdf': ['.pdf'],
-            'text': ['.txt', '.csv', '.log'],
-            'code': ['.html', '.css', '.js', '.py', '.java', '.cpp', '.c', '.php', '.xml', '.json'],
-        }
-        
-        file_category = 'other'
-        for category, extensions in previewable_types.items():
-            if file_type in extensions:
-                file_category = category
-                break
+        file_category = preview_category(file_obj)
         
         context = {
             'file': file_obj,
@@ -1277,6 +1718,48 @@ def preview_file(request, file_id):
         return JsonResponse({'success': False, 'error': str(e)})
     
 
+@login_required
+def download_zip(request):
+    """
+    Stream a folder (recursively), the root listing (with its filters) or a
+    selection of files as one ZIP archive
+    """
+    params = request.POST if request.method == 'POST' else request.GET
+    folder_id = params.get('folder')
+    file_ids = params.getlist('file_ids' if request.method == 'POST' else 'file')
+
+    try:
+        if folder_id:
+            folder = get_object_or_404(Folder, id=uuid.UUID(folder_id), owner=request.user)
+            entries = collect_folder_files(folder)
+            archive_name = f'{folder.name}.zip'
+        elif params.get('root'):
+            # Resolved here rather than posted id by id, which would overflow
+            # DATA_UPLOAD_MAX_NUMBER_FIELDS for a large root
+            files = File.objects.filter(owner=request.user, folder=None, is_deleted=False)
+            files = filter_listed_files(files, params).order_by('name')
+            entries = [(file_obj.name, file_obj) for file_obj in files]
+            archive_name = 'files.zip'
+        else:
+            ids = [uuid.UUID(file_id) for file_id in file_ids]
+            files = File.objects.filter(owner=request.user, is_deleted=False, id__in=ids).order_by('name')
+            entries = [(file_obj.name, file_obj) for file_obj in files]
+            archive_name = 'files.zip'
+    except ValueError:
+        return JsonResponse({'success': False, 'error': 'Invalid request'}, status=400)
+
+    if not entries:
+        return JsonResponse({'success': False, 'error': 'No files to download'}, status=404)
+    if len(entries) > ZIP_MAX_FILES:
+        return JsonResponse({
+            'success': False,
+            'error': f'Too many files ({len(entries)}); at most {ZIP_MAX_FILES} can be downloaded at once'
+        }, status=400)
+
+    response = StreamingHttpResponse(stream_zip(entries), content_type='application/zip')
+    response['Content-Disposition'] = content_disposition_header(True, archive_name)
+    return response
+
 @login_required
 def trash_view(request):
     """View to show all files in trash"""
@@ -1295,19 +1778,25 @@ def move_to_trash(request, file_id):
     """Move file to trash instead of permanent deletion"""
     if request.method == 'POST':
         try:
-            file_obj = get_object_or_404(File, id=file_id, owner=request.user)
-            
-            # Create trash record
-            Trash.objects.create(
-                user=request.user,
-                file=file_obj,
-                original_folder=file_obj.folder,
-                scheduled_permanent_deletion=timezone.now() + timezone.timedelta(days=30)  # 30 days retention
-            )
-            
-            # Mark file as deleted
-            file_obj.is_deleted = True
-            file_obj.save()
+            # The row is locked so the folder counters change with it, once
+            with transaction.atomic():
+                file_obj = get_object_or_404(File.objects.select_for_update(), id=file_id, owner=request.user)
+
+                # Create trash record
+                Trash.objects.create(
+                    user=request.user,
+                    file=file_obj,
+                    original_folder=file_obj.folder,
+                    scheduled_permanent_deletion=timezone.now() + timezone.timedelta(days=30)  # 30 days retention
+                )
+
+                # Mark file as deleted
+                was_deleted = file_obj.is_deleted
+                file_obj.is_deleted = True
+                file_obj.save()
+                if not was_deleted:
+                    record_files(file_obj.folder_id, -1, -file_obj.size)
+            invalidate_facets(request.user.pk)
             
             return JsonResponse({
                 'success': True,
@@ -1324,15 +1813,20 @@ def restore_file(request, file_id):
     """Restore file from trash"""
     if request.method == 'POST':
         try:
-            file_obj = get_object_or_404(File, id=file_id, owner=request.user, is_deleted=True)
-            trash_item = get_object_or_404(Trash, file=file_obj, user=request.user)
-            
-            # Restore file
-            file_obj.is_deleted = False
-            file_obj.save()
-            
-            # Remove from trash
-            trash_item.delete()
+            with transaction.atomic():
+                file_obj = get_object_or_404(
+                    File.objects.select_for_update(), id=file_id, owner=request.user, is_deleted=True
+                )
+                trash_item = get_object_or_404(Trash, file=file_obj, user=request.user)
+
+                # Restore file
+                file_obj.is_deleted = False
+                file_obj.save()
+                record_files(file_obj.folder_id, 1, file_obj.size)
+
+                # Remove from trash
+                trash_item.delete()
+            invalidate_facets(request.user.pk)
             
             return JsonResponse({
                 'success': True,
@@ -1353,12 +1847,18 @@ def restore_all_files(request):
             restored_count = 0
             
             for trash_item in trash_items:
-                file_obj = trash_item.file
-                file_obj.is_deleted = False
-                file_obj.save()
-                trash_item.delete()
+                with transaction.atomic():
+                    file_obj = File.objects.select_for_update().get(pk=trash_item.file_id)
+                    was_deleted = file_obj.is_deleted
+                    file_obj.is_deleted = False
+                    file_obj.save()
+                    if was_deleted:
+                        record_files(file_obj.folder_id, 1, file_obj.size)
+                    trash_item.delete()
                 restored_count += 1
             
+            invalidate_facets(request.user.pk)
+            
             return JsonResponse({
                 'success': True,
                 'message': f'Successfully restored {restored_count} files',
@@ -1376,14 +1876,12 @@ def permanent_delete_file(request, file_id):
     if request.method == 'POST':
         try:
             file_obj = get_object_or_404(File, id=file_id, owner=request.user, is_deleted=True)
-            trash_item = get_object_or_404(Trash, file=file_obj, user=request.user)
+            get_object_or_404(Trash, file=file_obj, user=request.user)
             
-            # Delete the actual file from storage
-            file_obj.file.delete(save=False)
-            
-            # Delete the database records
-            trash_item.delete()
-            file_obj.delete()
+            # Deletes the object, the trash record and the file record
+            result = purge_files(File.objects.filter(pk=file_obj.pk))
+            if result['failed']:
+                return JsonResponse({'success': False, 'error': 'Could not delete the file from storage, please try again'})
             
             return JsonResponse({
                 'success': True,
@@ -1397,27 +1895,24 @@ def permanent_delete_file(request, file_id):
 
 @login_required
 def empty_trash(request):
-    """Permanently delete all files in trash"""
+    """Permanently delete files in trash, a bounded batch per request"""
     if request.method == 'POST':
         try:
-            trash_items = Trash.objects.filter(user=request.user)
-            deleted_count = 0
+            files = trashed_files(request.user)
+            result = purge_files(files, max_files=EMPTY_TRASH_MAX_FILES)
+            deleted_count = result['purged']
             
-            for trash_item in trash_items:
-                file_obj = trash_item.file
-                
-                # Delete the actual file from storage
-                file_obj.file.delete(save=False)
-                
-                # Delete the database records
-                trash_item.delete()
-                file_obj.delete()
-                deleted_count += 1
+            # Anything left (or failed) is picked up by the next request
+            remaining = files.count()
+            has_more = remaining > 0 and deleted_count > 0
             
             return JsonResponse({
                 'success': True,
                 'message': f'Successfully deleted {deleted_count} files',
-                'deleted_count': deleted_count
+                'deleted_count': deleted_count,
+                'failed_count': result['failed'],
+                'remaining': remaining,
+                'has_more': has_more,
             })
             
         except Exception as e: